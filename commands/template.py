@@ -3,14 +3,25 @@ from typing import Optional
 import sqlite3
 import os
 import json
-import csv
-import difflib
+import functools
+import inspect
+import io
+import gzip
+import hashlib
+import zlib
+import mmap
 import random
+import re
 import string
 import shutil
+import sys
+import threading
+import time
+import atexit
+from contextlib import redirect_stdout
+from collections import deque
 from datetime import datetime
-
-import yaml
+from itertools import islice
 
 app = typer.Typer()
 
@@ -19,18 +30,197 @@ app = typer.Typer()
 # -----------------------------------------------------
 DB_NAME = "app_data.db"
 
+# Applied to every new connection. WAL lets readers and a writer run
+# concurrently; NORMAL sync is safe with WAL and avoids an fsync per commit.
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,  # negative = KiB, ~20MB page cache
+    "mmap_size": 268435456,  # 256MB memory-mapped I/O
+    "temp_store": "MEMORY",
+}
+DB_BUSY_TIMEOUT_MS = 5000
+
+# Print connection and query timings to stderr (--db-debug or TEMPLATE_DB_DEBUG=1)
+DB_DEBUG = os.getenv("TEMPLATE_DB_DEBUG", "") not in ("", "0")
+
+_local = threading.local()
+# Every cached connection in the process, so shutdown also closes the ones
+# opened by worker threads
+_all_connections = set()
+_all_connections_lock = threading.Lock()
+# Databases whose schema is known to be current in this process
+_schema_ready = set()
+
+
+def _debug(message: str):
+    typer.echo(f"[db] {message}", err=True)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports how long each statement took."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _debug(f"{(time.perf_counter() - start) * 1000:.2f} ms  {' '.join(sql.split())}")
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _debug(f"{(time.perf_counter() - start) * 1000:.2f} ms  (many) {' '.join(sql.split())}")
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def open_connection(path: str) -> sqlite3.Connection:
+    """Open a new connection with the tuned pragmas and busy timeout."""
+    start = time.perf_counter()
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        factory=TimedConnection if DB_DEBUG else sqlite3.Connection,
+        # Each connection is still only used by the thread that opened it;
+        # this lets close_all_connections() close it from another thread
+        check_same_thread=False,
+    )
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    for pragma, value in DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    if DB_DEBUG:
+        _debug(f"opened {path} in {(time.perf_counter() - start) * 1000:.2f} ms")
+    return conn
+
 
 def get_connection():
-    """Return a connection to the SQLite database."""
-    return sqlite3.connect(DB_NAME)
+    """
+    Return this thread's connection to the SQLite database.
+
+    Connections are opened once per thread and reused, so in-process callers
+    and warm workers don't pay the connect + pragma cost per command. Don't
+    close the returned connection; use close_connection() instead. The schema
+    is created or upgraded on first use rather than at import, so commands
+    that never touch the database don't open it.
+    """
+    if DB_NAME not in _schema_ready:
+        create_db_if_not_exists()
+    return _thread_connection()
+
+
+def _thread_connection():
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(DB_NAME)
+    if conn is None:
+        conn = connections[DB_NAME] = open_connection(DB_NAME)
+        with _all_connections_lock:
+            _all_connections.add(conn)
+    elif conn.in_transaction:
+        # A command raised mid-transaction; don't let the next one commit
+        # (or block on) its half-done writes
+        conn.rollback()
+    return conn
+
+
+def _close(conn: sqlite3.Connection):
+    with _all_connections_lock:
+        _all_connections.discard(conn)
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    finally:
+        conn.close()
 
 
-def create_db_if_not_exists():
-    """Create tables if they do not exist and seed them with mock data."""
-    conn = get_connection()
-    cur = conn.cursor()
+def close_connection():
+    """Close this thread's cached connections, rolling back unfinished transactions."""
+    connections = getattr(_local, "connections", {})
+    while connections:
+        _, conn = connections.popitem()
+        _close(conn)
+
+
+def close_all_connections():
+    """Close every cached connection, including those of other (worker) threads."""
+    close_connection()
+    with _all_connections_lock:
+        remaining = list(_all_connections)
+    for conn in remaining:
+        try:
+            _close(conn)
+        except sqlite3.Error:
+            # Still in use by a thread that outlived shutdown
+            pass
+
+
+atexit.register(close_all_connections)
+
+
+@app.callback()
+def main_options(
+    db_debug: bool = typer.Option(
+        False, "--db-debug", help="Print connection and query timings to stderr"
+    ),
+    cache: bool = typer.Option(
+        False, "--cache", help="Reuse results of read-only commands until the data changes"
+    ),
+):
+    global DB_DEBUG, CACHE_ENABLED
+    if cache:
+        CACHE_ENABLED = True
+    if db_debug and not DB_DEBUG:
+        DB_DEBUG = True
+        # Reopen with the timing connection factory
+        close_connection()
+
+
+# Rows per table seeded into a fresh database
+SEED_ROWS = int(os.getenv("TEMPLATE_SEED_ROWS", "25"))
+
 
-    # Create a sample 'users' table
+def seed_table(cur, table: str, count: int):
+    """Seed a table with mock rows in a single executemany."""
+    now = datetime.now().isoformat()
+    if table == "users":
+        roles = ["guest", "admin", "editor", "viewer"]
+        cur.executemany(
+            "INSERT INTO users (username, role, created_at) VALUES (?, ?, ?)",
+            ((f"user_{i}", random.choice(roles), now) for i in range(count)),
+        )
+    elif table == "tasks":
+        statuses = ["pending", "in-progress", "complete"]
+        cur.executemany(
+            "INSERT INTO tasks (task_name, priority, status, created_at) VALUES (?, ?, ?, ?)",
+            (
+                (f"task_{i}", random.randint(1, 5), random.choice(statuses), now)
+                for i in range(count)
+            ),
+        )
+    elif table == "logs":
+        levels = ["INFO", "WARN", "ERROR", "DEBUG"]
+        cur.executemany(
+            "INSERT INTO logs (message, level, created_at) VALUES (?, ?, ?)",
+            ((f"Log entry number {i}", random.choice(levels), now) for i in range(count)),
+        )
+
+
+def _migration_1_base_schema(cur, seed_rows: int):
+    """Create the users/tasks/logs tables and seed them with mock data."""
     cur.execute(
         """
     CREATE TABLE IF NOT EXISTS users (
@@ -41,8 +231,6 @@ def create_db_if_not_exists():
     )
     """
     )
-
-    # Create a sample 'tasks' table
     cur.execute(
         """
     CREATE TABLE IF NOT EXISTS tasks (
@@ -54,89 +242,2113 @@ def create_db_if_not_exists():
     )
     """
     )
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message TEXT NOT NULL,
+        level TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """
+    )
+
+    # Databases created before user_version was tracked already have rows
+    for table in ("users", "tasks", "logs"):
+        if cur.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None:
+            seed_table(cur, table, seed_rows)
+
+
+# Columns indexed for full-text search by filter_records
+FTS_COLUMNS = {"users": "username", "logs": "message", "tasks": "task_name"}
+
+
+def fts5_available(cur) -> bool:
+    return (
+        cur.execute(
+            "SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'"
+        ).fetchone()
+        is not None
+    )
+
+
+def has_fts_index(cur, table: str) -> bool:
+    return (
+        cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (f"{table}_fts",),
+        ).fetchone()
+        is not None
+    )
+
+
+def to_fts_query(query: str) -> str:
+    """
+    Turn user input into a safe FTS5 MATCH expression.
+
+    Every word is quoted so FTS5 operators in the input can't break the
+    query; "quoted phrases" stay phrases and a trailing * keeps prefix search.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        text = phrase if phrase else word.rstrip("*")
+        text = text.replace('"', '""').strip()
+        if not text:
+            continue
+        prefix = "*" if word.endswith("*") else ""
+        terms.append(f'"{text}"{prefix}')
+    return " ".join(terms)
+
+
+def _migration_2_full_text_search(cur, seed_rows: int):
+    """External-content FTS5 indexes kept in sync with triggers (skipped without FTS5)."""
+    if not fts5_available(cur):
+        return
+
+    for table, column in FTS_COLUMNS.items():
+        fts = f"{table}_fts"
+        cur.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+            f"USING fts5({column}, content='{table}', content_rowid='id')"
+        )
+        cur.execute(
+            f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END
+        """
+        )
+        cur.execute(
+            f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END
+        """
+        )
+        cur.execute(
+            f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END
+        """
+        )
+        cur.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+# Sortable columns for list_users/list_tasks and how to read a cursor value
+# back. Only these names are ever interpolated into ORDER BY.
+USER_SORT_COLUMNS = {"username": str, "role": str, "created_at": str}
+TASK_SORT_COLUMNS = {"priority": int, "status": str, "created_at": str}
+
+
+def _migration_3_sort_indexes(cur, seed_rows: int):
+    """Index every sortable column; the implicit rowid makes them (column, id) keysets."""
+    for table, columns in (("users", USER_SORT_COLUMNS), ("tasks", TASK_SORT_COLUMNS)):
+        for column in columns:
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})"
+            )
+    # list_users --role filters on role and still pages in sort order
+    for column in ("username", "created_at"):
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_users_role_{column} ON users(role, {column})"
+        )
+
+
+def _migration_4_task_scheduler(cur, seed_rows: int):
+    """Scheduling columns on tasks, a task_events log and the due-task index."""
+    existing = {row[1] for row in cur.execute("PRAGMA table_info(tasks)")}
+    for column in (
+        "run_at TEXT",
+        "started_at TEXT",
+        "finished_at TEXT",
+        "attempts INTEGER NOT NULL DEFAULT 0",
+        "worker TEXT",
+        "error TEXT",
+    ):
+        if column.split()[0] not in existing:
+            cur.execute(f"ALTER TABLE tasks ADD COLUMN {column}")
+    cur.execute("UPDATE tasks SET run_at = created_at WHERE run_at IS NULL")
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS task_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        worker TEXT,
+        detail TEXT,
+        created_at TEXT NOT NULL
+    )
+    """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_task_events_task ON task_events(task_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks(status, run_at, priority)")
+
+
+# Tables whose changes invalidate cached command results
+CACHE_TRACKED_TABLES = ("users", "tasks", "logs", "task_events")
+
+
+def install_version_triggers(cur) -> bool:
+    """
+    Keep table_versions counting writes to the tracked tables. Installed the
+    first time the cache is used, so databases that never enable it don't
+    pay an extra UPDATE per written row. Returns True if they were missing.
+    """
+    names = [
+        f"{table}_version_{event.lower()}"
+        for table in CACHE_TRACKED_TABLES
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+    placeholders = ", ".join("?" for _ in names)
+    present = cur.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})",
+        names,
+    ).fetchone()[0]
+    if present == len(names):
+        return False
+    for table in CACHE_TRACKED_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(
+                f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+            END
+            """
+            )
+    # Writes made while the triggers were off went uncounted, so nothing
+    # cached before now can be trusted
+    cur.execute("UPDATE table_versions SET version = version + 1")
+    return True
+
+
+def _migration_5_result_cache(cur, seed_rows: int):
+    """Per-table change counters (see install_version_triggers), plus the command result cache."""
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """
+    )
+    for table in CACHE_TRACKED_TABLES:
+        cur.execute("INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)", (table,))
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS command_cache (
+        key TEXT PRIMARY KEY,
+        command TEXT NOT NULL,
+        versions TEXT NOT NULL,
+        output TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    )
+    """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_command_cache_last_used ON command_cache(last_used)")
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS cache_stats (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    """
+    )
+
+
+def _migration_6_task_leases(cur, seed_rows: int):
+    """
+    Lease expiry for claimed tasks, so a crashed worker's task can be reclaimed.
+    Tasks claimed before leases existed count as expired.
+    """
+    existing = {row[1] for row in cur.execute("PRAGMA table_info(tasks)")}
+    if "lease_until" not in existing:
+        cur.execute("ALTER TABLE tasks ADD COLUMN lease_until TEXT")
+    cur.execute(
+        """
+        UPDATE tasks SET lease_until = COALESCE(started_at, created_at)
+        WHERE status = 'in-progress' AND lease_until IS NULL
+        """
+    )
+
+
+def _migration_7_on_demand_version_triggers(cur, seed_rows: int):
+    """Drop version triggers installed by earlier schemas; the cache reinstalls them."""
+    for table in CACHE_TRACKED_TABLES:
+        for event in ("insert", "update", "delete"):
+            cur.execute(f'DROP TRIGGER IF EXISTS "{table}_version_{event}"')
+
+
+def _migration_8_runnable_tasks(cur, seed_rows: int):
+    """
+    Only tasks queued as commands are run by the scheduler. Rows without a
+    task_events history (the seeded mock tasks) are kept for listing but
+    marked not runnable.
+    """
+    existing = {row[1] for row in cur.execute("PRAGMA table_info(tasks)")}
+    if "runnable" not in existing:
+        cur.execute("ALTER TABLE tasks ADD COLUMN runnable INTEGER NOT NULL DEFAULT 1")
+    cur.execute(
+        """
+        UPDATE tasks SET runnable = 0
+        WHERE NOT EXISTS (SELECT 1 FROM task_events WHERE task_events.task_id = tasks.id)
+        """
+    )
+
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# have run, so an up-to-date database costs a single pragma read.
+MIGRATIONS = [
+    _migration_1_base_schema,
+    _migration_2_full_text_search,
+    _migration_3_sort_indexes,
+    _migration_4_task_scheduler,
+    _migration_5_result_cache,
+    _migration_6_task_leases,
+    _migration_7_on_demand_version_triggers,
+    _migration_8_runnable_tasks,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def create_db_if_not_exists(seed_rows: int = None):
+    """Create or upgrade the schema (and seed a fresh database) if needed."""
+    conn = _thread_connection()
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        _schema_ready.add(DB_NAME)
+        return
+
+    seed_rows = SEED_ROWS if seed_rows is None else seed_rows
+    cur = conn.cursor()
+    # IMMEDIATE takes the write lock up front so concurrent first runs
+    # serialize here instead of both migrating
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        for migration in MIGRATIONS[version:]:
+            migration(cur, seed_rows)
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _schema_ready.add(DB_NAME)
+
+
+# -----------------------------------------------------
+# Cipher helpers: chunked Caesar and AES-GCM streams
+# -----------------------------------------------------
+CIPHER_CHUNK_BYTES = 1024 * 1024
+# AES files: magic, salt, nonce prefix and chunk size, then one sealed
+# record (ciphertext + 16-byte tag) per chunk. Each record's nonce is the
+# prefix, a 32-bit counter and a last-chunk flag (the STREAM construction),
+# so reordered, dropped or truncated chunks fail authentication.
+AES_MAGIC = b"TPLAES1\0"
+AES_SALT_BYTES = 16
+AES_NONCE_PREFIX_BYTES = 7
+AES_TAG_BYTES = 16
+SCRYPT_PARAMS = {"n": 2**14, "r": 8, "p": 1}
+
+
+def caesar_table(shift: int) -> bytes:
+    """bytes.translate table shifting ASCII letters, leaving everything else alone."""
+    lower = string.ascii_lowercase
+    upper = string.ascii_uppercase
+    shift %= 26
+    return bytes.maketrans(
+        (lower + upper).encode(),
+        (lower[shift:] + lower[:shift] + upper[shift:] + upper[:shift]).encode(),
+    )
+
+
+def caesar_cipher_encrypt(plaintext: str, shift: int = 3) -> str:
+    """A simple Caesar cipher encryption function."""
+    return plaintext.encode("utf-8", "surrogatepass").translate(caesar_table(shift)).decode(
+        "utf-8", "surrogatepass"
+    )
+
+
+def caesar_cipher_decrypt(ciphertext: str, shift: int = 3) -> str:
+    """A simple Caesar cipher decryption function."""
+    return caesar_cipher_encrypt(ciphertext, -shift)
+
+
+def caesar_stream(src, dst, shift: int, chunk_size: int = CIPHER_CHUNK_BYTES) -> int:
+    """Shift src into dst chunk by chunk; returns the number of bytes processed."""
+    table = caesar_table(shift)
+    total = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return total
+        dst.write(chunk.translate(table))
+        total += len(chunk)
+
+
+def load_aesgcm():
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise RuntimeError("AES needs the 'cryptography' package (pip install cryptography)")
+    return AESGCM
+
+
+def derive_key(password: str, salt: bytes) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, dklen=32, **SCRYPT_PARAMS)
+
+
+def stream_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    return prefix + counter.to_bytes(4, "big") + (b"\1" if last else b"\0")
+
+
+def aes_encrypt_stream(src, dst, password: str, chunk_size: int = CIPHER_CHUNK_BYTES) -> int:
+    """Encrypt src into dst with AES-256-GCM in sealed chunks; returns plaintext bytes."""
+    AESGCM = load_aesgcm()
+    salt = os.urandom(AES_SALT_BYTES)
+    prefix = os.urandom(AES_NONCE_PREFIX_BYTES)
+    header = AES_MAGIC + salt + prefix + chunk_size.to_bytes(4, "big")
+    aead = AESGCM(derive_key(password, salt))
+    dst.write(header)
+
+    total = 0
+    counter = 0
+    chunk = src.read(chunk_size)
+    while True:
+        # Read one chunk ahead so the final record can be flagged as last
+        following = src.read(chunk_size) if chunk else b""
+        last = not following
+        dst.write(aead.encrypt(stream_nonce(prefix, counter, last), chunk, header))
+        total += len(chunk)
+        if last:
+            return total
+        chunk = following
+        counter += 1
+
+
+def aes_decrypt_stream(src, dst, password: str) -> int:
+    """Verify and decrypt an aes_encrypt_stream file; raises ValueError if tampered."""
+    AESGCM = load_aesgcm()
+    from cryptography.exceptions import InvalidTag
+
+    header = src.read(len(AES_MAGIC) + AES_SALT_BYTES + AES_NONCE_PREFIX_BYTES + 4)
+    if not header.startswith(AES_MAGIC):
+        raise ValueError("not an AES encrypted file")
+    salt = header[len(AES_MAGIC) : len(AES_MAGIC) + AES_SALT_BYTES]
+    prefix = header[len(AES_MAGIC) + AES_SALT_BYTES : -4]
+    record_size = int.from_bytes(header[-4:], "big") + AES_TAG_BYTES
+    aead = AESGCM(derive_key(password, salt))
+
+    total = 0
+    counter = 0
+    record = src.read(record_size)
+    while True:
+        following = src.read(record_size)
+        last = not following
+        try:
+            chunk = aead.decrypt(stream_nonce(prefix, counter, last), record, header)
+        except InvalidTag:
+            raise ValueError("wrong key or corrupted/truncated data")
+        dst.write(chunk)
+        total += len(chunk)
+        if last:
+            return total
+        record = following
+        counter += 1
+
+
+def is_aes_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(AES_MAGIC)) == AES_MAGIC
+
+
+def run_cipher(input_path: str, output_path: str, transform) -> tuple:
+    """
+    Stream input_path through transform(src, dst) into output_path.
+    Output is written to a .part file and only renamed into place on success.
+    Returns (bytes processed, seconds).
+    """
+    part_path = output_path + ".part"
+    start = time.perf_counter()
+    try:
+        with open(input_path, "rb") as src, open(part_path, "wb") as dst:
+            total = transform(src, dst)
+        os.replace(part_path, output_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return total, time.perf_counter() - start
+
+
+def throughput(total: int, seconds: float) -> str:
+    megabytes = total / (1024 * 1024)
+    rate = megabytes / seconds if seconds > 0 else 0.0
+    return f"{megabytes:.2f} MB in {seconds:.2f}s, {rate:.1f} MB/s"
+
+
+# -----------------------------------------------------
+# Backup helpers: online snapshot + content-addressed segments
+# -----------------------------------------------------
+# A backup is a manifest listing, for every fixed-size segment of the
+# database file, its sha256 and where its zlib-compressed bytes live
+# (pack file, offset, length). Segments already stored by the previous
+# backup are referenced instead of written again.
+BACKUP_SEGMENT_PAGES = 256
+BACKUP_MANIFEST_SUFFIX = ".manifest.json"
+
+
+def snapshot_database(dest_path: str, pages: int = 1024, progress=None):
+    """Copy the live database with the SQLite backup API, `pages` at a time."""
+    dest = sqlite3.connect(dest_path)
+    try:
+        get_connection().backup(dest, pages=pages, progress=progress)
+    finally:
+        dest.close()
+
+
+def latest_backup_manifest(directory: str) -> Optional[dict]:
+    manifests = sorted(
+        f for f in os.listdir(directory) if f.startswith("backup_") and f.endswith(BACKUP_MANIFEST_SUFFIX)
+    )
+    if not manifests:
+        return None
+    with open(os.path.join(directory, manifests[-1]), "r") as f:
+        return json.load(f)
+
+
+def store_backup(snapshot_path: str, directory: str, name: str, previous: Optional[dict]):
+    """Split a snapshot into segments and store the ones not already backed up."""
+    with open(snapshot_path, "rb") as f:
+        header = f.read(100)
+    page_size = int.from_bytes(header[16:18], "big")
+    page_size = 65536 if page_size == 1 else page_size
+    segment_size = page_size * BACKUP_SEGMENT_PAGES
+
+    known = {}
+    if previous:
+        known = {entry["sha256"]: entry for entry in previous["segments"]}
+
+    pack_name = f"{name}.pack"
+    pack_path = os.path.join(directory, pack_name)
+    whole = hashlib.sha256()
+    segments = []
+    written = 0
+    with open(snapshot_path, "rb") as src, open(pack_path, "wb") as pack:
+        while True:
+            data = src.read(segment_size)
+            if not data:
+                break
+            whole.update(data)
+            digest = hashlib.sha256(data).hexdigest()
+            entry = known.get(digest)
+            if entry is None:
+                blob = zlib.compress(data, 6)
+                entry = {
+                    "sha256": digest,
+                    "pack": pack_name,
+                    "offset": pack.tell(),
+                    "length": len(blob),
+                }
+                pack.write(blob)
+                known[digest] = entry
+                written += 1
+            segments.append(entry)
+        bytes_written = pack.tell()
+
+    if bytes_written == 0:
+        os.remove(pack_path)
+
+    manifest = {
+        "version": 1,
+        "type": "incremental" if previous else "full",
+        "created_at": datetime.now().isoformat(),
+        "database": DB_NAME,
+        "page_size": page_size,
+        "segment_size": segment_size,
+        "size": os.path.getsize(snapshot_path),
+        "sha256": whole.hexdigest(),
+        "segments_written": written,
+        "bytes_written": bytes_written,
+        "segments": segments,
+    }
+    manifest_path = os.path.join(directory, name + BACKUP_MANIFEST_SUFFIX)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest_path, manifest
+
+
+def rebuild_backup(manifest_path: str, dest_path: str):
+    """Reassemble a backup into dest_path, verifying every segment and the whole file."""
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(manifest_path)
+
+    whole = hashlib.sha256()
+    packs = {}
+    try:
+        with open(dest_path, "wb") as dest:
+            for entry in manifest["segments"]:
+                pack = packs.get(entry["pack"])
+                if pack is None:
+                    pack = packs[entry["pack"]] = open(os.path.join(directory, entry["pack"]), "rb")
+                pack.seek(entry["offset"])
+                data = zlib.decompress(pack.read(entry["length"]))
+                if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                    raise ValueError(f"checksum mismatch in segment {entry['sha256'][:12]}")
+                whole.update(data)
+                dest.write(data)
+    except zlib.error as e:
+        raise ValueError(f"corrupt segment: {e}")
+    finally:
+        for pack in packs.values():
+            pack.close()
+
+    if whole.hexdigest() != manifest["sha256"]:
+        raise ValueError("checksum mismatch for the restored database")
+
+
+# -----------------------------------------------------
+# Log helpers: streaming filters for summarize_logs
+# -----------------------------------------------------
+LOG_LEVEL_RE = re.compile(
+    r"\b(DEBUG|INFO|NOTICE|WARN(?:ING)?|ERR(?:OR)?|CRIT(?:ICAL)?|ALERT|EMERG|FATAL)\b",
+    re.IGNORECASE,
+)
+LOG_LEVEL_ALIASES = {"WARN": "WARNING", "ERR": "ERROR", "CRIT": "CRITICAL"}
+ISO_TIME_RE = re.compile(r"(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}(?::\d{2})?)")
+# pfSense / BSD syslog: "Jan  5 12:34:56"
+SYSLOG_TIME_RE = re.compile(r"\b([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}:\d{2}:\d{2})\b")
+
+
+def parse_log_level(line: str) -> Optional[str]:
+    match = LOG_LEVEL_RE.search(line)
+    if not match:
+        return None
+    level = match.group(1).upper()
+    return LOG_LEVEL_ALIASES.get(level, level)
+
+
+def parse_log_time(line: str) -> Optional[datetime]:
+    match = ISO_TIME_RE.search(line)
+    if match:
+        return datetime.fromisoformat(f"{match.group(1)} {match.group(2)}")
+    match = SYSLOG_TIME_RE.search(line)
+    if match:
+        try:
+            return datetime.strptime(
+                f"{datetime.now().year} {match.group(1)} {match.group(2)} {match.group(3)}",
+                "%Y %b %d %H:%M:%S",
+            )
+        except ValueError:
+            return None
+    return None
+
+
+def parse_filter_time(value: str) -> datetime:
+    """
+    Parse a --since/--until value. Log timestamps carry no zone and are
+    read as local time, so a value with an offset is converted to naive local time.
+    """
+    when = datetime.fromisoformat(value)
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+
+class LogFilter:
+    def __init__(self, levels=None, since=None, until=None):
+        self.levels = (
+            {LOG_LEVEL_ALIASES.get(l.strip().upper(), l.strip().upper()) for l in levels}
+            if levels
+            else None
+        )
+        self.since = since
+        self.until = until
+
+    def matches(self, line: str) -> bool:
+        if self.levels is not None and parse_log_level(line) not in self.levels:
+            return False
+        if self.since or self.until:
+            when = parse_log_time(line)
+            if when is None:
+                return False
+            if self.since and when < self.since:
+                return False
+            if self.until and when >= self.until:
+                return False
+        return True
+
+
+class LogStats:
+    """Per-level and per-minute line counts, built in the same pass as the output."""
+
+    def __init__(self, max_minutes: int = 60):
+        self.max_minutes = max_minutes
+        self.total = 0
+        self.levels = {}
+        self.minutes = {}
+
+    def add(self, line: str):
+        self.total += 1
+        level = parse_log_level(line) or "OTHER"
+        self.levels[level] = self.levels.get(level, 0) + 1
+        when = parse_log_time(line)
+        if when is not None:
+            minute = self.minutes.setdefault(when.strftime("%Y-%m-%d %H:%M"), {})
+            minute[level] = minute.get(level, 0) + 1
+
+    def render(self) -> str:
+        out = f"\nMatched {self.total} lines. Levels: " + ", ".join(
+            f"{level}={count}" for level, count in sorted(self.levels.items())
+        )
+        recent = sorted(self.minutes)[-self.max_minutes :]
+        if recent:
+            out += f"\nPer minute (last {len(recent)}):\n"
+            for minute in recent:
+                counts = self.minutes[minute]
+                out += f"  {minute}  " + " ".join(
+                    f"{level}={count}" for level, count in sorted(counts.items())
+                ) + "\n"
+        return out
+
+
+def reverse_lines(path: str):
+    """Yield the lines of a file from last to first using mmap, without reading it all."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            if mm[end - 1 : end] == b"\n":
+                end -= 1
+            while end > 0:
+                newline = mm.rfind(b"\n", 0, end)
+                yield mm[newline + 1 : end].decode("utf-8", errors="replace").rstrip("\r")
+                end = newline
+            if end == 0:
+                yield ""
+
+
+def follow_file(path: str, position: int, log_filter: LogFilter, emit, poll_interval: float = 0.5, stop=None):
+    """Emit matching lines appended after `position` until stop() is true (or forever)."""
+    buffered = ""
+    while stop is None or not stop():
+        size = os.path.getsize(path)
+        if size < position:  # truncated or rotated in place
+            position, buffered = 0, ""
+        if size > position:
+            with open(path, "r", errors="replace") as f:
+                f.seek(position)
+                buffered += f.read()
+                position = f.tell()
+            *complete, buffered = buffered.split("\n")
+            for line in complete:
+                if log_filter.matches(line):
+                    emit(line)
+        else:
+            time.sleep(poll_interval)
+
+
+# -----------------------------------------------------
+# Compare helpers: hashed line blocks over mmap for compare_files
+# -----------------------------------------------------
+# Files are cut into blocks of lines at content-defined boundaries (a line
+# whose crc32 is divisible by COMPARE_BLOCK_LINES), so an insertion only
+# changes the blocks around it. Blocks are matched by hash and the line diff
+# runs only inside the blocks that changed.
+COMPARE_CHUNK_BYTES = 1024 * 1024
+COMPARE_BLOCK_LINES = 8
+COMPARE_MAX_BLOCK_LINES = 64
+COMPARE_CONTEXT = 3
+BINARY_SNIFF_BYTES = 8192
+
+
+def is_binary_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return b"\0" in f.read(BINARY_SNIFF_BYTES)
+
+
+def files_identical(path_a: str, path_b: str, chunk_size: int = COMPARE_CHUNK_BYTES) -> bool:
+    """Equal size first, then compare chunks, stopping at the first mismatch."""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+        while True:
+            chunk_a = fa.read(chunk_size)
+            chunk_b = fb.read(chunk_size)
+            if chunk_a != chunk_b:
+                return False
+            if not chunk_a:
+                return True
+
+
+def map_file(f):
+    """Read-only mmap of an open file; empty files map to b"" (mmap rejects them)."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def line_blocks(data) -> list:
+    """Split data into (digest, byte_start, byte_end, line_start, line_count) blocks."""
+    blocks = []
+    block_start = line_start = position = lines = 0
+    size = len(data)
+    while position < size:
+        newline = data.find(b"\n", position)
+        end = size if newline == -1 else newline + 1
+        lines += 1
+        boundary = zlib.crc32(data[position:end]) % COMPARE_BLOCK_LINES == 0
+        position = end
+        if boundary or lines >= COMPARE_MAX_BLOCK_LINES or position == size:
+            digest = hashlib.blake2b(data[block_start:position], digest_size=16).digest()
+            blocks.append((digest, block_start, position, line_start, lines))
+            block_start, line_start, lines = position, line_start + lines, 0
+    return blocks
+
+
+def block_lines(data, blocks: list, first_line: int, last_line: int, starts: list = None) -> list:
+    """
+    Decoded lines [first_line, last_line) using the block index to find their
+    bytes. `starts` is the blocks' sorted line_start values; pass it in when
+    calling repeatedly so each lookup is a bisect rather than a scan.
+    """
+    import bisect
+
+    if starts is None:
+        starts = [b[3] for b in blocks]
+    # The block containing first_line, through the last one starting before last_line
+    lo = max(bisect.bisect_right(starts, first_line) - 1, 0)
+    hi = bisect.bisect_left(starts, last_line)
+    covering = [b for b in blocks[lo:hi] if b[3] + b[4] > first_line]
+    if not covering:
+        return []
+    text = bytes(data[covering[0][1] : covering[-1][2]]).decode("utf-8", errors="replace")
+    lines = text.splitlines(keepends=True)
+    offset = first_line - covering[0][3]
+    return lines[offset : offset + last_line - first_line]
+
+
+def changed_windows(blocks_a: list, blocks_b: list, context: int = COMPARE_CONTEXT) -> list:
+    """Line ranges (a_lo, a_hi, b_lo, b_hi) around the blocks that differ, merged when close."""
+
+    def line_at(blocks, index):
+        if index < len(blocks):
+            return blocks[index][3]
+        return blocks[-1][3] + blocks[-1][4] if blocks else 0
+
+    import difflib
+
+    matcher = difflib.SequenceMatcher(
+        None, [b[0] for b in blocks_a], [b[0] for b in blocks_b], autojunk=False
+    )
+    windows = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        window = [line_at(blocks_a, i1), line_at(blocks_a, i2), line_at(blocks_b, j1), line_at(blocks_b, j2)]
+        if windows and window[0] - windows[-1][1] <= 2 * context:
+            windows[-1][1], windows[-1][3] = window[1], window[3]
+        else:
+            windows.append(window)
+
+    total_a, total_b = line_at(blocks_a, len(blocks_a)), line_at(blocks_b, len(blocks_b))
+    expanded = []
+    for a_lo, a_hi, b_lo, b_hi in windows:
+        before = min(context, a_lo, b_lo)
+        after = min(context, total_a - a_hi, total_b - b_hi)
+        expanded.append((a_lo - before, a_hi + after, b_lo - before, b_hi + after))
+    return expanded
+
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@")
+
+
+def shift_hunk_header(line: str, offset_a: int, offset_b: int) -> str:
+    """Rebase a hunk header from window-relative to file line numbers."""
+    match = HUNK_HEADER_RE.match(line)
+    if not match:
+        return line
+    start_a, count_a, start_b, count_b = match.groups()
+    return (
+        f"@@ -{int(start_a) + offset_a}{count_a or ''} "
+        f"+{int(start_b) + offset_b}{count_b or ''} @@" + line[match.end() :]
+    )
+
+
+def windowed_diff(path_a: str, path_b: str, data_a, data_b, blocks_a, blocks_b):
+    """Yield unified diff lines, diffing only the changed windows."""
+    import difflib
+
+    yield f"--- {path_a}\n"
+    yield f"+++ {path_b}\n"
+    starts_a = [b[3] for b in blocks_a]
+    starts_b = [b[3] for b in blocks_b]
+    for a_lo, a_hi, b_lo, b_hi in changed_windows(blocks_a, blocks_b):
+        lines_a = block_lines(data_a, blocks_a, a_lo, a_hi, starts_a)
+        lines_b = block_lines(data_b, blocks_b, b_lo, b_hi, starts_b)
+        diff = difflib.unified_diff(lines_a, lines_b, n=COMPARE_CONTEXT)
+        for line in islice(diff, 2, None):  # skip the window's own ---/+++ header
+            yield shift_hunk_header(line, a_lo, b_lo)
+
+
+def byte_summary(path_a: str, path_b: str, data_a, data_b, blocks_a, blocks_b) -> str:
+    import difflib
+
+    matcher = difflib.SequenceMatcher(
+        None, [b[0] for b in blocks_a], [b[0] for b in blocks_b], autojunk=False
+    )
+    removed = added = regions = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        regions += 1
+        removed += sum(b[2] - b[1] for b in blocks_a[i1:i2])
+        added += sum(b[2] - b[1] for b in blocks_b[j1:j2])
+
+    first = 0
+    step = COMPARE_CHUNK_BYTES
+    while first < min(len(data_a), len(data_b)) and data_a[first : first + step] == data_b[first : first + step]:
+        first += step
+    chunk_a, chunk_b = bytes(data_a[first : first + step]), bytes(data_b[first : first + step])
+    first += len(os.path.commonprefix([chunk_a, chunk_b]))
+
+    return (
+        f"{path_a}: {len(data_a)} bytes, {path_b}: {len(data_b)} bytes\n"
+        f"First difference at byte {first}\n"
+        f"{regions} changed region(s): ~{removed} bytes removed, ~{added} bytes added"
+    )
+
+
+# -----------------------------------------------------
+# Listing helpers: keyset pages streamed as text, json or ndjson
+# -----------------------------------------------------
+LIST_FORMATS = ("text", "json", "ndjson")
+
+
+def keyset_page(cur, table: str, columns: list, sort: str, cast, where: list, params: list, after: str, limit: int):
+    """
+    Run one page query ordered by (sort, id), fetching one extra row so the
+    caller can tell whether another page exists. `after` is "value:id".
+    """
+    clauses = list(where)
+    params = list(params)
+    if after:
+        value, last_id = after.rsplit(":", 1)
+        clauses.append(f"({sort}, id) > (?, ?)")
+        params += [cast(value), int(last_id)]
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {sort}, id LIMIT ?"
+    return cur.execute(sql, params + [limit + 1])
+
+
+def emit_page(rows, columns: list, sort: str, limit: int, fmt: str, key: str, title: str, render_text) -> str:
+    """Echo rows as they are read from the cursor; returns everything written."""
+    written = []
+
+    def write(line: str):
+        typer.echo(line)
+        written.append(line)
+
+    sort_index = columns.index(sort)
+    count = 0
+    next_cursor = None
+    pending = None  # json rows are held back one step to place the commas
+    for row in rows:
+        if count == limit:
+            next_cursor = f"{previous[sort_index]}:{previous[0]}"
+            break
+        record = dict(zip(columns, row))
+        if fmt == "text":
+            if count == 0:
+                write(title)
+            write(render_text(record))
+        elif fmt == "ndjson":
+            write(json.dumps(record))
+        else:
+            if count == 0:
+                write(f'{{"{key}": [')
+            elif pending is not None:
+                write(pending + ",")
+            pending = "  " + json.dumps(record)
+        previous = row
+        count += 1
+
+    if fmt == "text":
+        if count == 0:
+            write(f"No {key} found.")
+        elif next_cursor:
+            write(f"Next page: --after {next_cursor}")
+    elif fmt == "ndjson":
+        if next_cursor:
+            write(json.dumps({"next_cursor": next_cursor}))
+    else:
+        if count == 0:
+            write(f'{{"{key}": [')
+        elif pending is not None:
+            write(pending)
+        write(f"], \"next_cursor\": {json.dumps(next_cursor)}}}")
+    return "\n".join(written) + "\n"
+
+
+def check_list_options(sort: str, sort_columns: dict, fmt: str, limit: int, after: str):
+    """Return an error message for invalid list options, or None."""
+    if sort not in sort_columns:
+        return f"Invalid sort field. Must be one of {list(sort_columns)}."
+    if fmt not in LIST_FORMATS:
+        return f"Invalid format '{fmt}'. Must be one of {', '.join(LIST_FORMATS)}."
+    if limit < 1:
+        return "--limit must be at least 1."
+    if after:
+        value, _, last_id = after.rpartition(":")
+        try:
+            sort_columns[sort](value)
+            int(last_id)
+        except ValueError:
+            return f"Invalid cursor '{after}'."
+    return None
+
+
+# -----------------------------------------------------
+# Scheduler helpers: claim, run and finish queued tasks
+# -----------------------------------------------------
+# A task's name is the template command it runs, e.g. "summarize-logs app.log".
+# Due tasks (status pending, run_at <= now) are claimed lowest priority value
+# first; the claim is a single UPDATE ... RETURNING, so two workers can never
+# take the same task. A claim is a lease: if the worker dies, the task stays
+# in-progress only until lease_until and is then claimed again.
+TASK_TIMEOUT_SECONDS = 300
+TASK_RETRY_DELAY_SECONDS = 30
+# Lease beyond the run timeout, so a live worker always finishes first
+TASK_LEASE_GRACE_SECONDS = 60
+# Longest wait between retries after a database error (e.g. a busy timeout)
+TASK_ERROR_BACKOFF_SECONDS = 30
+
+
+def record_task_event(cur, task_id: int, status: str, worker: str = None, detail: str = None):
+    cur.execute(
+        "INSERT INTO task_events (task_id, status, worker, detail, created_at) VALUES (?, ?, ?, ?, ?)",
+        (task_id, status, worker, detail, datetime.now().isoformat()),
+    )
+
+
+def claim_task(
+    worker: str, lease_seconds: float = TASK_TIMEOUT_SECONDS + TASK_LEASE_GRACE_SECONDS
+) -> Optional[dict]:
+    """
+    Atomically move the next due task to in-progress and return it.
+    In-progress tasks whose lease has expired are due again.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    now = datetime.now()
+    lease_until = datetime.fromtimestamp(now.timestamp() + lease_seconds).isoformat()
+    now = now.isoformat()
+    try:
+        cur.execute(
+            """
+            UPDATE tasks
+            SET status = 'in-progress', started_at = ?, lease_until = ?, worker = ?,
+                attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM tasks
+                WHERE runnable = 1
+                  AND ((status = 'pending' AND run_at <= ?)
+                   OR (status = 'in-progress' AND lease_until <= ?))
+                ORDER BY priority, run_at, id
+                LIMIT 1
+            )
+            RETURNING id, task_name, priority, attempts
+            """,
+            (now, lease_until, worker, now, now),
+        )
+        row = cur.fetchone()
+        if row is not None:
+            record_task_event(cur, row[0], "in-progress", worker)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if row is None:
+        return None
+    return {"id": row[0], "task_name": row[1], "priority": row[2], "attempts": row[3]}
+
+
+def run_task_command(task_name: str, timeout: float = TASK_TIMEOUT_SECONDS) -> tuple:
+    """Run a task as a template command in a subprocess; returns (ok, detail)."""
+    import shlex
+    import subprocess
+
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *shlex.split(task_name)],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return False, f"timed out after {timeout}s"
+    except ValueError as e:
+        return False, f"invalid task command: {e}"
+    output = (completed.stdout + completed.stderr).strip()
+    return completed.returncode == 0, output[-2000:]
+
+
+def finish_task(task: dict, worker: str, ok: bool, detail: str, max_attempts: int = 1, retry_delay: float = TASK_RETRY_DELAY_SECONDS) -> str:
+    """
+    Record the outcome; failed tasks with attempts left go back to pending later.
+    Returns "lost" (and records nothing) if the lease expired and another
+    worker has claimed the task since.
+    """
+    conn = get_connection()
+    now = datetime.now()
+    if ok:
+        status, run_at = "complete", None
+    elif task["attempts"] < max_attempts:
+        status = "pending"
+        run_at = datetime.fromtimestamp(now.timestamp() + retry_delay * task["attempts"]).isoformat()
+    else:
+        status, run_at = "failed", None
+
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE tasks
+        SET status = ?, finished_at = ?, error = ?, run_at = COALESCE(?, run_at), lease_until = NULL
+        WHERE id = ? AND status = 'in-progress' AND worker = ? AND attempts = ?
+        """,
+        (status, now.isoformat(), None if ok else detail, run_at, task["id"], worker, task["attempts"]),
+    )
+    if not cur.rowcount:
+        conn.commit()
+        return "lost"
+    record_task_event(cur, task["id"], status, worker, detail)
+    conn.commit()
+    return status
+
+
+def task_queue_stats() -> dict:
+    """Queue depth by state plus recent throughput and timings."""
+    cur = get_connection().cursor()
+    now = datetime.now()
+    now_iso = now.isoformat()
+    minute_ago = datetime.fromtimestamp(now.timestamp() - 60).isoformat()
+    hour_ago = datetime.fromtimestamp(now.timestamp() - 3600).isoformat()
+
+    stats = {
+        "due": cur.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status = 'pending' AND runnable = 1 AND run_at <= ?",
+            (now_iso,),
+        ).fetchone()[0],
+        "delayed": cur.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status = 'pending' AND runnable = 1 AND run_at > ?",
+            (now_iso,),
+        ).fetchone()[0],
+    }
+    for status, count in cur.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"):
+        stats[status] = count
+
+    finished_minute, finished_hour, avg_run, avg_wait = cur.execute(
+        """
+        SELECT
+            SUM(finished_at >= ?),
+            COUNT(*),
+            AVG((julianday(finished_at) - julianday(started_at)) * 86400),
+            AVG((julianday(started_at) - julianday(run_at)) * 86400)
+        FROM tasks
+        WHERE status IN ('complete', 'failed') AND finished_at >= ?
+        """,
+        (minute_ago, hour_ago),
+    ).fetchone()
+    stats["finished_last_minute"] = finished_minute or 0
+    stats["finished_last_hour"] = finished_hour or 0
+    stats["avg_run_seconds"] = round(avg_run, 3) if avg_run is not None else None
+    stats["avg_wait_seconds"] = round(avg_wait, 3) if avg_wait is not None else None
+    return stats
+
+
+# -----------------------------------------------------
+# Migration helpers: schema-aware, batched, resumable copies
+# -----------------------------------------------------
+# A mapping file (YAML or JSON) renames or drops tables and columns:
+#
+#   tables:
+#     users:
+#       target: accounts        # optional, defaults to the source name
+#       columns:
+#         username: login       # rename
+#         created_at: null      # drop; unlisted columns are copied as-is
+#     logs: null                # skip the table
+#
+# Progress is checkpointed per table in the target database, in the same
+# transaction as each batch, so an interrupted run resumes where it stopped.
+MIGRATE_BATCH_ROWS = 5000
+MIGRATE_CHECKPOINT_TABLE = "_migration_checkpoint"
+
+
+def load_migration_mapping(path: str) -> dict:
+    import yaml
+
+    with open(path, "r") as f:
+        mapping = yaml.safe_load(f) or {}
+    return mapping.get("tables", {})
+
+
+def copyable_tables(src) -> list:
+    """User tables of the source, minus virtual tables and their shadow tables."""
+    rows = src.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    virtual = [name for name, sql in rows if sql.upper().startswith("CREATE VIRTUAL TABLE")]
+    return [
+        (name, sql)
+        for name, sql in rows
+        if name not in virtual
+        and name != MIGRATE_CHECKPOINT_TABLE
+        and not any(name.startswith(f"{v}_") for v in virtual)
+    ]
+
+
+def plan_migration(src, mapping: dict) -> list:
+    """Describe how every source table is copied: target name, column pairs, DDL."""
+    plans = []
+    for table, create_sql in copyable_tables(src):
+        if table in mapping and mapping[table] is None:
+            continue
+        table_mapping = mapping.get(table) or {}
+        column_mapping = table_mapping.get("columns") or {}
+        info = src.execute(f'PRAGMA table_info("{table}")').fetchall()
+        names = [column[1] for column in info]
+        unknown = set(column_mapping) - set(names)
+        if unknown:
+            raise ValueError(f"Mapping for '{table}' names unknown columns: {sorted(unknown)}")
+
+        target = table_mapping.get("target") or table
+        columns = [
+            (column[1], column_mapping.get(column[1], column[1]), column)
+            for column in info
+            if column_mapping.get(column[1], column[1]) is not None
+        ]
+        renamed = target != table or any(source != dest for source, dest, _ in columns)
+        if renamed or len(columns) != len(info):
+            pk = [c for c in info if c[5]]
+            definitions = []
+            for _, dest, (_, _, col_type, notnull, default, is_pk) in columns:
+                definition = f'"{dest}" {col_type}'.rstrip()
+                if is_pk and len(pk) == 1:
+                    definition += " PRIMARY KEY"
+                if notnull:
+                    definition += " NOT NULL"
+                if default is not None:
+                    definition += f" DEFAULT {default}"
+                definitions.append(definition)
+            create_sql = f'CREATE TABLE "{target}" ({", ".join(definitions)})'
+            # Index definitions refer to source column names; only kept for plain copies
+            indexes = []
+        else:
+            indexes = [
+                sql
+                for (sql,) in src.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                    (table,),
+                )
+            ]
+
+        has_rowid = True
+        try:
+            src.execute(f'SELECT rowid FROM "{table}" LIMIT 1')
+        except sqlite3.OperationalError:
+            has_rowid = False  # WITHOUT ROWID table
+
+        plans.append(
+            {
+                "source": table,
+                "target": target,
+                "columns": [(source, dest) for source, dest, _ in columns],
+                "create_sql": create_sql,
+                "indexes": indexes,
+                "has_rowid": has_rowid,
+            }
+        )
+    return plans
+
+
+def read_checkpoint(dst, table: str) -> tuple:
+    """(last_rowid, rows_copied, done) for a source table, zeros if not started."""
+    row = dst.execute(
+        f"SELECT last_rowid, rows_copied, done FROM {MIGRATE_CHECKPOINT_TABLE} WHERE source_table = ?",
+        (table,),
+    ).fetchone()
+    return row if row else (0, 0, 0)
+
+
+def write_checkpoint(dst, table: str, last_rowid: int, rows_copied: int, done: int = 0):
+    dst.execute(
+        f"""
+        INSERT INTO {MIGRATE_CHECKPOINT_TABLE} (source_table, last_rowid, rows_copied, done)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(source_table) DO UPDATE SET
+            last_rowid = excluded.last_rowid, rows_copied = excluded.rows_copied, done = excluded.done
+        """,
+        (table, last_rowid, rows_copied, done),
+    )
+
+
+def source_batches(src, plan: dict, after_rowid: int, batch_size: int):
+    """Yield (last_rowid, rows) batches in rowid order, starting after after_rowid."""
+    columns = ", ".join(f'"{source}"' for source, _ in plan["columns"])
+    if not plan["has_rowid"]:
+        cur = src.execute(f'SELECT {columns} FROM "{plan["source"]}"')
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield 0, rows
+    sql = f'SELECT rowid, {columns} FROM "{plan["source"]}" WHERE rowid > ? ORDER BY rowid LIMIT ?'
+    while True:
+        rows = src.execute(sql, (after_rowid, batch_size)).fetchall()
+        if not rows:
+            return
+        after_rowid = rows[-1][0]
+        yield after_rowid, [row[1:] for row in rows]
+
+
+def insert_sql(plan: dict) -> str:
+    columns = ", ".join(f'"{dest}"' for _, dest in plan["columns"])
+    placeholders = ", ".join("?" for _ in plan["columns"])
+    return f'INSERT INTO "{plan["target"]}" ({columns}) VALUES ({placeholders})'
+
+
+def copy_table(src, dst, plan: dict, batch_size: int, progress=None) -> int:
+    """Copy one table in executemany batches, checkpointing each batch. Returns rows copied."""
+    last_rowid, copied, done = read_checkpoint(dst, plan["source"])
+    if done:
+        return copied
+
+    exists = dst.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (plan["target"],)
+    ).fetchone()
+    if not exists:
+        dst.execute(plan["create_sql"])
+        dst.commit()
+
+    insert = insert_sql(plan)
+    # WITHOUT ROWID tables can't be resumed mid-way, so they copy in one transaction
+    commit_each_batch = plan["has_rowid"]
+    for batch_last_rowid, rows in source_batches(src, plan, last_rowid, batch_size):
+        dst.executemany(insert, rows)
+        copied += len(rows)
+        if commit_each_batch:
+            write_checkpoint(dst, plan["source"], batch_last_rowid, copied)
+            dst.commit()
+        if progress:
+            progress(plan["source"], copied)
+
+    for index_sql in plan["indexes"]:
+        dst.execute(re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX IF NOT EXISTS ", index_sql))
+    write_checkpoint(dst, plan["source"], 0, copied, done=1)
+    dst.commit()
+    return copied
+
+
+def estimate_rows_per_second(src, plan: dict, batch_size: int) -> Optional[float]:
+    """Time one real batch read from the source and written to an in-memory copy."""
+    scratch = sqlite3.connect(":memory:")
+    try:
+        scratch.execute(plan["create_sql"])
+        start = time.perf_counter()
+        batch = next(source_batches(src, plan, 0, batch_size), None)
+        if not batch:
+            return None
+        scratch.executemany(insert_sql(plan), batch[1])
+        scratch.commit()
+        seconds = time.perf_counter() - start
+        return len(batch[1]) / seconds if seconds > 0 else None
+    finally:
+        scratch.close()
+
+
+# -----------------------------------------------------
+# Import helpers: stream CSV/NDJSON rows into a table in batches
+# -----------------------------------------------------
+IMPORT_BATCH_ROWS = 10000
+# column -> (type, default); a default of ... marks a required column and
+# None means the import time (timestamps)
+IMPORT_COLUMNS = {
+    "users": {"username": (str, ...), "role": (str, "guest"), "created_at": (str, None)},
+    "tasks": {
+        "task_name": (str, ...),
+        "priority": (int, 1),
+        "status": (str, "pending"),
+        "created_at": (str, None),
+        "run_at": (str, None),
+    },
+    "logs": {"message": (str, ...), "level": (str, "INFO"), "created_at": (str, None)},
+}
+
+
+def read_import_records(path: str, fmt: str = None):
+    """Yield (line_number, record, error) from a CSV or NDJSON file."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    with open(path, "r", newline="") as f:
+        if fmt == "csv":
+            import csv
+
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record, None
+            return
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, line.rstrip("\n"), f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, record, "expected a JSON object"
+                continue
+            yield line_number, record, None
+
+
+def import_row(table: str, record: dict, now: str) -> tuple:
+    """Validate a record against IMPORT_COLUMNS and return the row to insert."""
+    row = []
+    for column, (cast, default) in IMPORT_COLUMNS[table].items():
+        value = record.get(column)
+        if value is None or value == "":
+            if default is ...:
+                raise ValueError(f"missing required column '{column}'")
+            value = now if default is None else default
+        try:
+            row.append(cast(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid {cast.__name__} for '{column}': {value!r}")
+    return tuple(row)
+
+
+def defer_table_indexes(cur, table: str) -> list:
+    """Drop a table's indexes and FTS insert trigger, returning what to restore."""
+    deferred = cur.execute(
+        """
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND sql IS NOT NULL
+          AND (type = 'index' OR (type = 'trigger' AND name = ?))
+        """,
+        (table, f"{table}_fts_ai"),
+    ).fetchall()
+    for kind, name, _ in deferred:
+        cur.execute(f'DROP {kind.upper()} "{name}"')
+    return deferred
+
+
+def restore_table_indexes(cur, table: str, deferred: list, first_new_id: int):
+    """Recreate deferred indexes and index the rows loaded while the FTS trigger was off."""
+    for kind, _, sql in deferred:
+        if kind == "trigger":
+            column = FTS_COLUMNS[table]
+            cur.execute(
+                f"INSERT INTO {table}_fts(rowid, {column}) "
+                f"SELECT id, {column} FROM {table} WHERE id >= ?",
+                (first_new_id,),
+            )
+        cur.execute(sql)
+
+
+def defer_version_triggers(cur, table: str) -> list:
+    """Drop a table's table_versions triggers, returning their SQL to restore."""
+    names = [f"{table}_version_{event}" for event in ("insert", "update", "delete")]
+    deferred = [
+        sql
+        for (sql,) in cur.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?, ?)", names
+        ).fetchall()
+    ]
+    for name in names:
+        cur.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    return deferred
+
+
+def restore_version_triggers(cur, table: str, deferred: list, changed: bool):
+    """Recreate the triggers and bump the table's version once for the whole load."""
+    for sql in deferred:
+        cur.execute(sql)
+    if deferred and changed:
+        cur.execute(
+            "UPDATE table_versions SET version = version + 1 WHERE table_name = ?", (table,)
+        )
+
+
+def import_records(
+    table: str,
+    input_path: str,
+    fmt: str = None,
+    batch_size: int = IMPORT_BATCH_ROWS,
+    errors_path: str = None,
+    defer_indexes: bool = True,
+) -> str:
+    """
+    Stream a CSV/NDJSON file into `table` with executemany, one transaction
+    per batch. Invalid rows are written to an NDJSON side file instead.
+    """
+    if not os.path.isfile(input_path):
+        msg = f"File {input_path} not found."
+        typer.echo(msg)
+        return msg
+    if fmt not in (None, "csv", "ndjson"):
+        msg = f"Invalid format '{fmt}'. Must be csv or ndjson."
+        typer.echo(msg)
+        return msg
+
+    errors_path = errors_path or f"{input_path}.errors.ndjson"
+    columns = list(IMPORT_COLUMNS[table])
+    insert = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+    now = datetime.now().isoformat()
+
+    conn = get_connection()
+    cur = conn.cursor()
+    first_new_id = cur.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+    deferred = defer_table_indexes(cur, table) if defer_indexes else []
+    # One version bump at the end instead of a trigger-driven UPDATE per row
+    deferred_triggers = defer_version_triggers(cur, table)
+    conn.commit()
+
+    imported = 0
+    rejected = 0
+    errors_file = None
+
+    def reject(line_number: int, error: str, record):
+        nonlocal rejected, errors_file
+        if errors_file is None:
+            errors_file = open(errors_path, "w")
+        errors_file.write(json.dumps({"line": line_number, "error": error, "record": record}) + "\n")
+        rejected += 1
+
+    def flush(batch: list):
+        nonlocal imported
+        try:
+            cur.executemany(insert, [row for _, row, _ in batch])
+            conn.commit()
+            imported += len(batch)
+        except sqlite3.Error:
+            # Retry row by row so one bad row doesn't sink the whole batch
+            conn.rollback()
+            for line_number, row, record in batch:
+                try:
+                    cur.execute(insert, row)
+                    imported += 1
+                except sqlite3.Error as e:
+                    reject(line_number, str(e), record)
+            conn.commit()
+
+    start = time.perf_counter()
+    try:
+        batch = []
+        for line_number, record, error in read_import_records(input_path, fmt):
+            if error is None:
+                try:
+                    batch.append((line_number, import_row(table, record, now), record))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                reject(line_number, error, record)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        # Indexes and triggers come back even if the load was interrupted part-way
+        if deferred:
+            restore_table_indexes(cur, table, deferred, first_new_id)
+        restore_version_triggers(cur, table, deferred_triggers, imported > 0)
+        conn.commit()
+        if errors_file is not None:
+            errors_file.close()
+    seconds = time.perf_counter() - start
+
+    result = (
+        f"Imported {imported} {table} from {input_path} in {seconds:.2f}s "
+        f"({imported / seconds if seconds else 0:.0f} rows/s)."
+    )
+    if rejected:
+        result += f" {rejected} rows rejected, see {errors_path}."
+    typer.echo(result)
+    return result
+
+
+# -----------------------------------------------------
+# Cache helpers: opt-in result cache for read-only commands
+# -----------------------------------------------------
+# Enabled with --cache or TEMPLATE_CACHE=1. An entry stores the command's
+# stdout and return value together with the table_versions counters it was
+# computed from; it is served only while those counters are unchanged.
+# Within one process, an unchanged PRAGMA data_version (no commits from other
+# connections) and total_changes (no writes on ours) skip even that check.
+# Lookups never write: hit/miss counts and last-used times are kept in memory
+# and written with the next store, by cache_stats or at exit.
+CACHE_ENABLED = os.getenv("TEMPLATE_CACHE", "") not in ("", "0")
+CACHE_MAX_ENTRIES = int(os.getenv("TEMPLATE_CACHE_MAX_ENTRIES", "200"))
+CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+
+_cache_memo = {}
+_cache_pending_stats = {}
+_cache_pending_last_used = {}
+_cache_pending_lock = threading.Lock()
+# Databases whose version triggers are known to be installed
+_cache_ready = set()
+
+
+class _Tee(io.TextIOBase):
+    """Pass writes through to a stream while keeping a copy."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    @property
+    def encoding(self):
+        return getattr(self.stream, "encoding", "utf-8")
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def getvalue(self) -> str:
+        return self.copy.getvalue()
+
+
+def _write_signature(conn) -> tuple:
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+
+def _bump_cache_stat(cur, name: str, amount: int = 1):
+    cur.execute(
+        "INSERT INTO cache_stats (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount),
+    )
+
+
+def _write_pending_cache_stats(cur):
+    """Write the hit/miss counts and last-used times gathered since the last write."""
+    with _cache_pending_lock:
+        stats = dict(_cache_pending_stats)
+        last_used = list(_cache_pending_last_used.items())
+        _cache_pending_stats.clear()
+        _cache_pending_last_used.clear()
+    for name, amount in stats.items():
+        _bump_cache_stat(cur, name, amount)
+    if last_used:
+        cur.executemany(
+            "UPDATE command_cache SET last_used = MAX(last_used, ?) WHERE key = ?",
+            [(used, key) for key, used in last_used],
+        )
+
+
+def flush_cache_stats():
+    """Write pending cache bookkeeping in one transaction (registered with atexit)."""
+    if not (_cache_pending_stats or _cache_pending_last_used):
+        return
+    conn = get_connection()
+    try:
+        _write_pending_cache_stats(conn.cursor())
+        conn.commit()
+    except sqlite3.Error:
+        # Bookkeeping only; never fail a command (or exit) over it
+        conn.rollback()
+
+
+atexit.register(flush_cache_stats)
+
+
+def table_versions(cur, tables: list) -> dict:
+    placeholders = ", ".join("?" for _ in tables)
+    return dict(
+        cur.execute(
+            f"SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})",
+            list(tables),
+        )
+    )
+
+
+def cache_lookup(key: str, tables: list):
+    """Return ((output, result) or None, current versions)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    if DB_NAME not in _cache_ready:
+        if install_version_triggers(cur):
+            conn.commit()
+            _cache_memo.clear()
+        _cache_ready.add(DB_NAME)
+    memo = _cache_memo.get(key)
+    if memo is not None and memo[0] == _write_signature(conn):
+        versions, entry = memo[1], memo[2]
+    else:
+        versions = table_versions(cur, tables)
+        row = cur.execute(
+            "SELECT versions, output, result FROM command_cache WHERE key = ?", (key,)
+        ).fetchone()
+        entry = None
+        if row is not None and json.loads(row[0]) == versions:
+            entry = (row[1], json.loads(row[2]))
+
+    name = "hits" if entry else "misses"
+    with _cache_pending_lock:
+        _cache_pending_stats[name] = _cache_pending_stats.get(name, 0) + 1
+        if entry:
+            _cache_pending_last_used[key] = time.time()
+    if entry:
+        _cache_memo[key] = (_write_signature(conn), versions, entry)
+    return entry, versions
+
+
+def cache_store(key: str, command: str, versions: dict, output: str, result):
+    if len(output) > CACHE_MAX_ENTRY_BYTES:
+        return
+    try:
+        result_json = json.dumps(result)
+    except (TypeError, ValueError):
+        return
+    conn = get_connection()
+    cur = conn.cursor()
+    now = time.time()
+    # This commit is a write anyway; bring last_used up to date before evicting
+    _write_pending_cache_stats(cur)
+    cur.execute(
+        "INSERT OR REPLACE INTO command_cache (key, command, versions, output, result, created_at, last_used) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (key, command, json.dumps(versions), output, result_json, now, now),
+    )
+    cur.execute(
+        "DELETE FROM command_cache WHERE key IN ("
+        "SELECT key FROM command_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+        (CACHE_MAX_ENTRIES,),
+    )
+    if cur.rowcount > 0:
+        _bump_cache_stat(cur, "evictions", cur.rowcount)
+    conn.commit()
+    _cache_memo[key] = (_write_signature(conn), versions, (output, result))
+
+
+def cached_command(tables, skip=None):
+    """
+    Cache a read-only command's stdout and return value, keyed on its name and
+    arguments. `tables` lists the tables it reads (or computes them from the
+    arguments); `skip(arguments)` opts individual calls out.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            names = tables(arguments) if callable(tables) else list(tables)
+            if not names or (skip and skip(arguments)):
+                return func(*args, **kwargs)
+
+            key = f"{func.__name__}:{json.dumps(arguments, sort_keys=True, default=str)}"
+            entry, versions = cache_lookup(key, names)
+            if entry is not None:
+                output, result = entry
+                sys.stdout.write(output)
+                sys.stdout.flush()
+                return result
+
+            tee = _Tee(sys.stdout)
+            with redirect_stdout(tee):
+                result = func(*args, **kwargs)
+            cache_store(key, func.__name__, versions, tee.getvalue(), result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# -----------------------------------------------------
+# Download helpers: resumable, retrying, optionally parallel HTTP GET
+# -----------------------------------------------------
+# Data lands in <file>.part and is renamed into place only once it is
+# complete (and matches --sha256). A parallel download keeps per-range
+# progress in <file>.part.json so it can resume as well. The state file also
+# records the server's validator (ETag or Last-Modified): a resume sends it
+# as If-Range, and a partial file of an older version is started over.
+DOWNLOAD_CHUNK_BYTES = 256 * 1024
+DOWNLOAD_TIMEOUT_SECONDS = 30
+DOWNLOAD_BACKOFF_SECONDS = 1.0
+# Below this size a parallel download isn't worth the extra connections
+DOWNLOAD_MIN_PARALLEL_BYTES = 8 * 1024 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+def is_retryable(error: Exception) -> bool:
+    import http.client
+    import urllib.error
+
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code in (408, 429)
+    # URLError, timeouts and dropped connections are OSErrors
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+def with_retries(action, retries: int, on_retry=None):
+    """Call action(attempt) until it succeeds, backing off exponentially between tries."""
+    attempt = 0
+    while True:
+        try:
+            return action(attempt)
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(DOWNLOAD_BACKOFF_SECONDS * 2**attempt)
+            attempt += 1
+
+
+def probe_download(url: str, timeout: float) -> tuple:
+    """
+    (size or None, accepts ranges, validator or None) from a HEAD request;
+    (None, False, None) if unsupported. The validator is a strong ETag, else
+    Last-Modified; weak ETags can't be used with If-Range.
+    """
+    import urllib.error
+    import urllib.request
 
-    # Create a sample 'logs' table
-    cur.execute(
-        """
-    CREATE TABLE IF NOT EXISTS logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        message TEXT NOT NULL,
-        level TEXT NOT NULL,
-        created_at TEXT NOT NULL
-    )
+    try:
+        with urllib.request.urlopen(
+            urllib.request.Request(url, method="HEAD"), timeout=timeout
+        ) as response:
+            length = response.headers.get("Content-Length")
+            ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            etag = response.headers.get("ETag")
+            if etag and etag.startswith("W/"):
+                etag = None
+            validator = etag or response.headers.get("Last-Modified")
+            return (int(length) if length is not None else None), ranges, validator
+    except urllib.error.HTTPError as e:
+        if e.code in (405, 501):
+            return None, False, None
+        raise
+
+
+def fetch_to_file(url: str, f, offset: int, end: Optional[int], timeout: float, chunk_size: int, progress=None, validator: str = None) -> int:
     """
-    )
+    GET url from `offset` (to `end`, inclusive) and write it at the same
+    offset in f. Returns the offset reached; the server may ignore the Range
+    header (or, with If-Range, send the whole file because it changed), in
+    which case writing restarts from zero.
+    """
+    import urllib.request
+
+    request = urllib.request.Request(url)
+    if offset or end is not None:
+        request.add_header("Range", f"bytes={offset}-{'' if end is None else end}")
+        if validator:
+            request.add_header("If-Range", validator)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if end is not None and response.status != 206:
+            raise DownloadError("server ignored the Range request or the file changed")
+        if offset and response.status != 206:
+            offset = 0
+            f.truncate(0)
+        length = response.headers.get("Content-Length")
+        expected = offset + int(length) if length is not None else None
+        while True:
+            chunk = response.read(chunk_size if end is None else min(chunk_size, end + 1 - offset))
+            if not chunk:
+                break
+            os.pwrite(f.fileno(), chunk, offset)
+            offset += len(chunk)
+            if progress:
+                progress(len(chunk))
+            if end is not None and offset > end:
+                break
+    if end is not None and offset <= end:
+        raise ConnectionError(f"range ended early at byte {offset}")
+    if expected is not None and offset < expected:
+        raise ConnectionError(f"connection closed at byte {offset} of {expected}")
+    return offset
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_single(url, part_path, size, ranges, validator, retries, timeout, chunk_size, stats) -> None:
+    state_path = part_path + ".json"
+    state = {"validator": validator}
+    saved = {"validator": None}
+    if os.path.exists(state_path):
+        with open(state_path, "r") as f:
+            saved = json.load(f)
+    # Only resume a single-stream download of the same version of the file
+    if saved != state and os.path.exists(part_path):
+        os.remove(part_path)
+    with open(state_path, "w") as f:
+        json.dump(state, f)
+
+    def attempt(_):
+        offset = os.path.getsize(part_path) if ranges and os.path.exists(part_path) else 0
+        if size is not None and offset >= size:
+            return
+        with open(part_path, "r+b" if offset else "wb") as f:
+            # fetch_to_file checks the body against its Content-Length; the
+            # probed size is stale if the file changed and was sent in full
+            fetch_to_file(url, f, offset, None, timeout, chunk_size, stats.add, validator)
+
+    with_retries(attempt, retries, stats.retry)
+    os.remove(state_path)
+
+
+def download_parallel(url, part_path, size, validator, parallel, retries, timeout, chunk_size, stats) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    state_path = part_path + ".json"
+    state = None
+    if os.path.exists(state_path) and os.path.exists(part_path):
+        with open(state_path, "r") as f:
+            state = json.load(f)
+        if state.get("size") != size or state.get("validator") != validator or "ranges" not in state:
+            state = None
+    if state is None:
+        step = -(-size // parallel)
+        state = {
+            "size": size,
+            "validator": validator,
+            "ranges": [[start, min(start + step, size) - 1, start] for start in range(0, size, step)],
+        }
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+
+    lock = threading.Lock()
+
+    def save_state():
+        with lock:
+            with open(state_path, "w") as f:
+                json.dump(state, f)
+
+    def fetch_range(entry):
+        def attempt(_):
+            start, end, done = entry
+            if done > end:
+                return
+            with open(part_path, "r+b") as f:
+
+                def progress(count):
+                    entry[2] += count
+                    stats.add(count)
+
+                fetch_to_file(url, f, done, end, timeout, chunk_size, progress, validator)
+
+        with_retries(attempt, retries, stats.retry)
 
-    # Check if 'users' table has data; if not, seed 25 rows
-    cur.execute("SELECT COUNT(*) FROM users")
-    user_count = cur.fetchone()[0]
-    if user_count == 0:
-        roles = ["guest", "admin", "editor", "viewer"]
-        for i in range(25):
-            username = f"user_{i}"
-            role = random.choice(roles)
-            created_at = datetime.now().isoformat()
-            cur.execute(
-                "INSERT INTO users (username, role, created_at) VALUES (?, ?, ?)",
-                (username, role, created_at),
-            )
+    try:
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            for future in [pool.submit(fetch_range, entry) for entry in state["ranges"]]:
+                future.result()
+    except BaseException:
+        save_state()
+        raise
+    if os.path.exists(state_path):
+        os.remove(state_path)
 
-    # Seed 'tasks' table
-    cur.execute("SELECT COUNT(*) FROM tasks")
-    task_count = cur.fetchone()[0]
-    if task_count == 0:
-        statuses = ["pending", "in-progress", "complete"]
-        for i in range(25):
-            task_name = f"task_{i}"
-            priority = random.randint(1, 5)
-            status = random.choice(statuses)
-            created_at = datetime.now().isoformat()
-            cur.execute(
-                "INSERT INTO tasks (task_name, priority, status, created_at) VALUES (?, ?, ?, ?)",
-                (task_name, priority, status, created_at),
-            )
 
-    # Seed 'logs' table
-    cur.execute("SELECT COUNT(*) FROM logs")
-    logs_count = cur.fetchone()[0]
-    if logs_count == 0:
-        levels = ["INFO", "WARN", "ERROR", "DEBUG"]
-        for i in range(25):
-            message = f"Log entry number {i}"
-            level = random.choice(levels)
-            created_at = datetime.now().isoformat()
-            cur.execute(
-                "INSERT INTO logs (message, level, created_at) VALUES (?, ?, ?)",
-                (message, level, created_at),
-            )
+class TransferStats:
+    """Bytes moved and retries, shared by transfer worker threads."""
 
-    conn.commit()
-    conn.close()
+    def __init__(self):
+        self.bytes = 0
+        self.retries = 0
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
 
+    def add(self, count: int):
+        with self._lock:
+            self.bytes += count
 
-# Ensure the database and tables exist before we do anything
-create_db_if_not_exists()
+    def retry(self, attempt: int, error: Exception):
+        with self._lock:
+            self.retries += 1
+        typer.echo(f"Retrying after error: {error}", err=True)
+
+    def summary(self) -> str:
+        return f"{throughput(self.bytes, time.perf_counter() - self.start)}, {self.retries} retries"
 
 
 # -----------------------------------------------------
-# Simple Caesar cipher for “encryption/decryption” demo
+# Upload helpers: chunked, checksummed, resumable uploads
 # -----------------------------------------------------
-def caesar_cipher_encrypt(plaintext: str, shift: int = 3) -> str:
-    """A simple Caesar cipher encryption function."""
-    result = []
-    for ch in plaintext:
-        if ch.isalpha():
-            start = ord("A") if ch.isupper() else ord("a")
-            offset = (ord(ch) - start + shift) % 26
-            result.append(chr(start + offset))
-        else:
-            result.append(ch)
-    return "".join(result)
+# A file is sent as numbered parts, each with its SHA-256, through a
+# transport. HttpTransport speaks a small session protocol:
+#
+#   POST {base}/uploads                      {"name", "size", "chunk_size"} -> {"session"}
+#   GET  {base}/uploads/{session}            -> {"parts": [index, ...]}
+#   PUT  {base}/uploads/{session}/parts/{i}  body, X-Part-SHA256 header
+#   POST {base}/uploads/{session}/complete   {"parts": [{"index", "sha256"}]} -> {"location"}
+#
+# DirectoryTransport does the same against a local (or mounted) directory.
+# The session is remembered in <file>.upload.json, so rerunning an
+# interrupted upload only sends the parts the destination is missing.
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+UPLOAD_STATE_SUFFIX = ".upload.json"
+
+
+class HttpTransport:
+    def __init__(self, base_url: str, timeout: float = DOWNLOAD_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: bytes = None, headers: dict = None) -> dict:
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method, headers=headers or {}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = response.read()
+        return json.loads(payload) if payload else {}
 
+    def _json(self, method: str, path: str, data: dict) -> dict:
+        return self._request(
+            method, path, json.dumps(data).encode(), {"Content-Type": "application/json"}
+        )
 
-def caesar_cipher_decrypt(ciphertext: str, shift: int = 3) -> str:
-    """A simple Caesar cipher decryption function."""
-    return caesar_cipher_encrypt(ciphertext, -shift)
+    def start(self, name: str, size: int, chunk_size: int) -> str:
+        return self._json("POST", "/uploads", {"name": name, "size": size, "chunk_size": chunk_size})["session"]
+
+    def uploaded_parts(self, session: str) -> set:
+        import urllib.error
+
+        try:
+            return set(self._request("GET", f"/uploads/{session}")["parts"])
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise KeyError(session)
+            raise
+
+    def upload_part(self, session: str, index: int, data: bytes, sha256: str):
+        self._request(
+            "PUT",
+            f"/uploads/{session}/parts/{index}",
+            data,
+            {"Content-Type": "application/octet-stream", "X-Part-SHA256": sha256},
+        )
+
+    def complete(self, session: str, parts: list) -> str:
+        return self._json("POST", f"/uploads/{session}/complete", {"parts": parts})["location"]
+
+
+class DirectoryTransport:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _session_dir(self, session: str) -> str:
+        return os.path.join(self.root, ".uploads", session)
+
+    def start(self, name: str, size: int, chunk_size: int) -> str:
+        session = hashlib.sha256(f"{name}:{size}:{time.time()}".encode()).hexdigest()[:16]
+        os.makedirs(self._session_dir(session))
+        with open(os.path.join(self._session_dir(session), "session.json"), "w") as f:
+            json.dump({"name": name, "size": size, "chunk_size": chunk_size}, f)
+        return session
+
+    def uploaded_parts(self, session: str) -> set:
+        directory = self._session_dir(session)
+        if not os.path.isdir(directory):
+            raise KeyError(session)
+        return {
+            int(name.split("-")[1])
+            for name in os.listdir(directory)
+            if name.startswith("part-") and not name.endswith(".tmp")
+        }
+
+    def upload_part(self, session: str, index: int, data: bytes, sha256: str):
+        if hashlib.sha256(data).hexdigest() != sha256:
+            raise ValueError(f"part {index} checksum mismatch")
+        path = os.path.join(self._session_dir(session), f"part-{index:06d}")
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def complete(self, session: str, parts: list) -> str:
+        directory = self._session_dir(session)
+        with open(os.path.join(directory, "session.json"), "r") as f:
+            name = json.load(f)["name"]
+        target = os.path.join(self.root, name)
+        with open(target + ".tmp", "wb") as out:
+            for part in sorted(parts, key=lambda p: p["index"]):
+                with open(os.path.join(directory, f"part-{part['index']:06d}"), "rb") as f:
+                    data = f.read()
+                if hashlib.sha256(data).hexdigest() != part["sha256"]:
+                    raise ValueError(f"stored part {part['index']} is corrupt")
+                out.write(data)
+        os.replace(target + ".tmp", target)
+        shutil.rmtree(directory)
+        return target
+
+
+def make_transport(destination: str, secure: bool = True):
+    """HTTP(S) URLs use HttpTransport; anything else is a local directory."""
+    from urllib.parse import urlparse
+
+    parsed = urlparse(destination)
+    if parsed.scheme in ("http", "https"):
+        if secure and parsed.scheme != "https" and parsed.hostname not in ("localhost", "127.0.0.1", "::1"):
+            raise ValueError("secure upload needs an https:// destination (or pass --no-secure)")
+        return HttpTransport(destination)
+    root = parsed.path if parsed.scheme == "file" else destination
+    if not os.path.isdir(root):
+        raise ValueError(f"destination directory {root} does not exist")
+    return DirectoryTransport(root)
+
+
+def load_upload_state(file_path: str, destination: str, chunk_size: int) -> Optional[dict]:
+    """The saved session for this file, if the file and settings are unchanged."""
+    state_path = file_path + UPLOAD_STATE_SUFFIX
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "r") as f:
+        state = json.load(f)
+    stat = os.stat(file_path)
+    expected = {
+        "destination": destination,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "chunk_size": chunk_size,
+    }
+    if any(state.get(key) != value for key, value in expected.items()):
+        return None
+    return state
 
 
 # -----------------------------------------------------
@@ -169,6 +2381,7 @@ def show_config(
     Shows the current configuration from modules/assistant_config.py.
     """
     try:
+        import yaml
 
         config = ""
 
@@ -216,43 +2429,41 @@ def list_files(
 # 3.5) list_users
 # -----------------------------------------------------
 @app.command()
+@cached_command(["users"])
 def list_users(
     role: str = typer.Option(None, "--role", help="Filter users by role"),
     sort: str = typer.Option(
         "username", "--sort", help="Sort by field (username, role, created_at)"
     ),
+    limit: int = typer.Option(100, "--limit", help="Users per page"),
+    after: str = typer.Option(None, "--after", help="Cursor printed by the previous page"),
+    fmt: str = typer.Option("text", "--format", help="Output format: text, json or ndjson"),
 ):
     """
     Lists all users, optionally filtered by role and sorted by specified field.
+    Results are paged; pass the printed cursor as --after to get the next page.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    query = "SELECT username, role, created_at FROM users"
-    params = []
-
-    if role:
-        query += " WHERE role = ?"
-        params.append(role)
-
-    query += f" ORDER BY {sort}"
-
-    cur.execute(query, params)
-    users = cur.fetchall()
-    conn.close()
-
-    if not users:
-        result = "No users found."
-        typer.echo(result)
-        return result
-
-    # Format output
-    result = "Users:\n"
-    for user in users:
-        result += f"- {user[0]} (Role: {user[1]}, Created: {user[2]})\n"
-
-    typer.echo(result)
-    return result
+    error = check_list_options(sort, USER_SORT_COLUMNS, fmt, limit, after)
+    if error:
+        typer.echo(error)
+        return error
+
+    cur = get_connection().cursor()
+    columns = ["id", "username", "role", "created_at"]
+    where, params = ([], []) if not role else (["role = ?"], [role])
+    rows = keyset_page(
+        cur, "users", columns, sort, USER_SORT_COLUMNS[sort], where, params, after, limit
+    )
+    return emit_page(
+        rows,
+        columns,
+        sort,
+        limit,
+        fmt,
+        "users",
+        "Users:",
+        lambda u: f"- {u['username']} (Role: {u['role']}, Created: {u['created_at']})",
+    )
 
 
 # -----------------------------------------------------
@@ -274,12 +2485,86 @@ def create_user(
         (username, role, now),
     )
     conn.commit()
-    conn.close()
     result = f"User '{username}' created with role '{role}'."
     typer.echo(result)
     return result
 
 
+# -----------------------------------------------------
+# import_users
+# -----------------------------------------------------
+@app.command()
+def import_users(
+    input_path: str = typer.Argument(..., help="CSV or NDJSON file of users"),
+    fmt: str = typer.Option(
+        None, "--format", help="csv or ndjson (default: from the file extension)"
+    ),
+    batch_size: int = typer.Option(
+        IMPORT_BATCH_ROWS, "--batch-size", help="Rows inserted per transaction"
+    ),
+    errors_path: str = typer.Option(
+        None, "--errors", help="Where rejected rows are written (default: <input>.errors.ndjson)"
+    ),
+    defer_indexes: bool = typer.Option(
+        True, "--defer-indexes/--keep-indexes", help="Rebuild indexes after the load"
+    ),
+):
+    """
+    Bulk-imports users (username, role, created_at) from a CSV or NDJSON file.
+    """
+    return import_records("users", input_path, fmt, batch_size, errors_path, defer_indexes)
+
+
+# -----------------------------------------------------
+# import_tasks
+# -----------------------------------------------------
+@app.command()
+def import_tasks(
+    input_path: str = typer.Argument(..., help="CSV or NDJSON file of tasks"),
+    fmt: str = typer.Option(
+        None, "--format", help="csv or ndjson (default: from the file extension)"
+    ),
+    batch_size: int = typer.Option(
+        IMPORT_BATCH_ROWS, "--batch-size", help="Rows inserted per transaction"
+    ),
+    errors_path: str = typer.Option(
+        None, "--errors", help="Where rejected rows are written (default: <input>.errors.ndjson)"
+    ),
+    defer_indexes: bool = typer.Option(
+        True, "--defer-indexes/--keep-indexes", help="Rebuild indexes after the load"
+    ),
+):
+    """
+    Bulk-imports tasks (task_name, priority, status, created_at, run_at) from a CSV or NDJSON file.
+    """
+    return import_records("tasks", input_path, fmt, batch_size, errors_path, defer_indexes)
+
+
+# -----------------------------------------------------
+# import_logs
+# -----------------------------------------------------
+@app.command()
+def import_logs(
+    input_path: str = typer.Argument(..., help="CSV or NDJSON file of logs"),
+    fmt: str = typer.Option(
+        None, "--format", help="csv or ndjson (default: from the file extension)"
+    ),
+    batch_size: int = typer.Option(
+        IMPORT_BATCH_ROWS, "--batch-size", help="Rows inserted per transaction"
+    ),
+    errors_path: str = typer.Option(
+        None, "--errors", help="Where rejected rows are written (default: <input>.errors.ndjson)"
+    ),
+    defer_indexes: bool = typer.Option(
+        True, "--defer-indexes/--keep-indexes", help="Rebuild indexes after the load"
+    ),
+):
+    """
+    Bulk-imports logs (message, level, created_at) from a CSV or NDJSON file.
+    """
+    return import_records("logs", input_path, fmt, batch_size, errors_path, defer_indexes)
+
+
 # -----------------------------------------------------
 # 5) delete_user
 # -----------------------------------------------------
@@ -301,7 +2586,6 @@ def delete_user(
     cur.execute("DELETE FROM users WHERE id = ?", (user_id,))
     conn.commit()
     changes = cur.rowcount
-    conn.close()
 
     if changes > 0:
         msg = f"User with ID {user_id} deleted."
@@ -318,42 +2602,96 @@ def delete_user(
 def generate_report(
     table_name: str = typer.Argument(..., help="Name of table to generate report from"),
     output_file: str = typer.Option("report.json", "--output", help="Output file name"),
+    fmt: str = typer.Option("json", "--format", help="Output format: json, ndjson or csv"),
+    compress: bool = typer.Option(False, "--gzip", help="Gzip the output file"),
+    batch_size: int = typer.Option(
+        1000, "--batch-size", help="Rows fetched from the database per batch"
+    ),
+    print_data: bool = typer.Option(
+        False, "--print-data", help="Also echo every row to stdout as JSON"
+    ),
 ):
     """
     Generates a report from an existing database table and saves it to a file.
+    Rows are streamed in batches, so memory stays flat for large tables.
     """
+    if fmt not in ("json", "ndjson", "csv"):
+        msg = f"Invalid format '{fmt}'. Must be one of json, ndjson, csv."
+        typer.echo(msg)
+        return msg
+
     conn = get_connection()
     cur = conn.cursor()
 
-    # Get all data from the specified table
-    cur.execute(f"SELECT * FROM {table_name}")
-    rows = cur.fetchall()
+    # Only real tables can be reported on; the name is interpolated below
+    cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    )
+    if cur.fetchone() is None:
+        msg = f"Table '{table_name}' not found."
+        typer.echo(msg)
+        return msg
 
-    # Get column names from cursor description
-    columns = [description[0] for description in cur.description]
+    if compress and not output_file.endswith(".gz"):
+        output_file += ".gz"
 
-    # Convert rows to list of dicts with column names
-    data = []
-    for row in rows:
-        data.append(dict(zip(columns, row)))
+    start = time.perf_counter()
+    cur.execute(f'SELECT * FROM "{table_name}"')
+    columns = [description[0] for description in cur.description]
 
-    report_data = {
+    opener = gzip.open if compress else open
+    row_count = 0
+    with opener(output_file, "wt", newline="") as f:
+        if fmt == "json":
+            header = {
+                "table": table_name,
+                "timestamp": datetime.now().isoformat(),
+                "columns": columns,
+            }
+            # Stream the data array, then close the object with the row count
+            f.write(json.dumps(header, indent=2)[:-2] + ',\n  "data": [')
+        elif fmt == "csv":
+            import csv
+
+            writer = csv.writer(f)
+            writer.writerow(columns)
+
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if fmt == "csv":
+                    writer.writerow(row)
+                else:
+                    line = json.dumps(dict(zip(columns, row)))
+                    if fmt == "json":
+                        f.write(("\n    " if row_count == 0 else ",\n    ") + line)
+                    else:
+                        f.write(line + "\n")
+                if print_data:
+                    typer.echo(json.dumps(dict(zip(columns, row))))
+                row_count += 1
+
+        if fmt == "json":
+            f.write(f'\n  ],\n  "row_count": {row_count}\n}}\n')
+
+    seconds = time.perf_counter() - start
+    summary = {
         "table": table_name,
-        "timestamp": datetime.now().isoformat(),
-        "columns": columns,
-        "row_count": len(rows),
-        "data": data,
+        "output": output_file,
+        "format": fmt,
+        "row_count": row_count,
+        "bytes": os.path.getsize(output_file),
+        "seconds": round(seconds, 3),
     }
 
-    with open(output_file, "w") as f:
-        json.dump(report_data, f, indent=2)
-
-    conn.close()
-
-    result = f"Report for table '{table_name}' generated and saved to {output_file}."
+    result = (
+        f"Report for table '{table_name}' generated and saved to {output_file} "
+        f"({row_count} rows, {fmt}{', gzip' if compress else ''}, {seconds:.2f}s)."
+    )
     typer.echo(result)
-    typer.echo(json.dumps(report_data, indent=2))
-    return report_data
+    return summary
 
 
 # -----------------------------------------------------
@@ -362,21 +2700,35 @@ def generate_report(
 @app.command()
 def backup_data(
     directory: str = typer.Argument(..., help="Directory to store backups"),
-    full: bool = typer.Option(False, "--full", help="Perform a full backup"),
+    full: bool = typer.Option(
+        False, "--full", help="Take a full snapshot instead of an incremental backup"
+    ),
 ):
     """
-    Back up data to a specified directory, optionally performing a full backup.
+    Back up data to a specified directory. By default only the segments that
+    changed since the last backup are stored; --full takes a self-contained snapshot.
     """
-    if not os.path.isdir(directory):
-        os.makedirs(directory)
+    os.makedirs(directory, exist_ok=True)
 
-    backup_file = os.path.join(
-        directory, f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-    )
-    shutil.copy(DB_NAME, backup_file)
+    previous = None if full else latest_backup_manifest(directory)
+    name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+    snapshot_path = os.path.join(directory, f".{name}.snapshot")
+
+    def progress(status, remaining, total):
+        typer.echo(f"Copied {total - remaining}/{total} pages", err=True)
+
+    start = time.perf_counter()
+    try:
+        snapshot_database(snapshot_path, progress=progress)
+        manifest_path, manifest = store_backup(snapshot_path, directory, name, previous)
+    finally:
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
 
     result = (
-        f"{'Full' if full else 'Partial'} backup completed. Saved to {backup_file}."
+        f"{manifest['type'].capitalize()} backup completed. Saved to {manifest_path} "
+        f"({manifest['segments_written']}/{len(manifest['segments'])} segments written, "
+        f"{manifest['bytes_written']} bytes compressed, {time.perf_counter() - start:.2f}s)."
     )
     typer.echo(result)
     return result
@@ -387,13 +2739,16 @@ def backup_data(
 # -----------------------------------------------------
 @app.command()
 def restore_data(
-    file_path: str = typer.Argument(..., help="File path of backup to restore"),
+    file_path: str = typer.Argument(
+        ..., help="Backup manifest (backup_*.manifest.json) or plain .db file to restore"
+    ),
     overwrite: bool = typer.Option(
         False, "--overwrite", help="Overwrite existing data"
     ),
 ):
     """
-    Restores data from a backup file.
+    Restores data from a backup file. The backup is rebuilt and verified
+    before it replaces the live database in a single transaction.
     """
     if not os.path.isfile(file_path):
         msg = f"Backup file {file_path} does not exist."
@@ -405,7 +2760,31 @@ def restore_data(
         typer.echo(msg)
         return msg
 
-    shutil.copy(file_path, DB_NAME)
+    restore_path = f"{DB_NAME}.restore-tmp"
+    try:
+        if file_path.endswith(BACKUP_MANIFEST_SUFFIX):
+            rebuild_backup(file_path, restore_path)
+        else:
+            shutil.copy(file_path, restore_path)
+
+        source = sqlite3.connect(restore_path)
+        try:
+            check = source.execute("PRAGMA integrity_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"integrity check failed: {check}")
+            # The backup API replaces the live database's content in one
+            # transaction, so readers never see a half-restored file
+            source.backup(get_connection())
+        finally:
+            source.close()
+    except (ValueError, OSError, sqlite3.DatabaseError) as e:
+        msg = f"Restore from {file_path} failed, live data unchanged: {e}"
+        typer.echo(msg)
+        return msg
+    finally:
+        if os.path.exists(restore_path):
+            os.remove(restore_path)
+
     msg = f"Data restored from {file_path} to {DB_NAME}."
     typer.echo(msg)
     return msg
@@ -418,21 +2797,67 @@ def restore_data(
 def summarize_logs(
     logs_path: str = typer.Argument(..., help="Path to log files"),
     lines: int = typer.Option(100, "--lines", help="Number of lines to summarize"),
+    tail: bool = typer.Option(False, "--tail", help="Show the last lines instead of the first"),
+    level: str = typer.Option(
+        None, "--level", help="Only lines at these levels, comma separated (e.g. ERROR,WARNING)"
+    ),
+    since: str = typer.Option(None, "--since", help="Only lines at or after this time (ISO format)"),
+    until: str = typer.Option(None, "--until", help="Only lines before this time (ISO format)"),
+    stats: bool = typer.Option(False, "--stats", help="Add per-level and per-minute counts"),
+    follow: bool = typer.Option(False, "--follow", help="Keep printing new matching lines"),
 ):
     """
     Summarizes log data from a specified path, limiting lines.
+    Files are streamed, so memory stays constant regardless of file size.
     """
     if not os.path.isfile(logs_path):
         msg = f"Log file {logs_path} not found."
         typer.echo(msg)
         return msg
 
-    with open(logs_path, "r") as f:
-        all_lines = f.readlines()
+    try:
+        log_filter = LogFilter(
+            levels=level.split(",") if level else None,
+            since=parse_filter_time(since) if since else None,
+            until=parse_filter_time(until) if until else None,
+        )
+    except ValueError as e:
+        msg = f"Invalid filter: {e}"
+        typer.echo(msg)
+        return msg
 
-    snippet = all_lines[:lines]
-    result = f"Showing first {lines} lines from {logs_path}:\n" + "".join(snippet)
+    aggregate = LogStats() if stats else None
+    if tail and aggregate is None:
+        # Walk backwards from the end; only the requested lines are decoded
+        snippet = list(islice(filter(log_filter.matches, reverse_lines(logs_path)), lines))
+        snippet.reverse()
+    else:
+        snippet = deque(maxlen=lines) if tail else []
+        with open(logs_path, "r", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not log_filter.matches(line):
+                    continue
+                if aggregate is not None:
+                    aggregate.add(line)
+                elif len(snippet) >= lines:
+                    break  # head without stats: nothing left to compute
+                if tail or len(snippet) < lines:
+                    snippet.append(line)
+
+    where = "last" if tail else "first"
+    result = f"Showing {where} {lines} lines from {logs_path}:\n" + "".join(
+        line + "\n" for line in snippet
+    )
+    if aggregate is not None:
+        result += aggregate.render()
     typer.echo(result)
+
+    if follow:
+        try:
+            follow_file(logs_path, os.path.getsize(logs_path), log_filter, typer.echo)
+        except KeyboardInterrupt:
+            pass
     return result
 
 
@@ -443,20 +2868,101 @@ def summarize_logs(
 def upload_file(
     file_path: str = typer.Argument(..., help="Path of file to upload"),
     destination: str = typer.Option(
-        "remote", "--destination", help="Destination label"
+        ..., "--destination", help="Upload endpoint URL or destination directory"
     ),
-    secure: bool = typer.Option(True, "--secure", help="Use secure upload"),
+    secure: bool = typer.Option(True, "--secure/--no-secure", help="Use secure upload"),
+    chunk_size: int = typer.Option(
+        UPLOAD_CHUNK_BYTES, "--chunk-size", help="Bytes per uploaded part"
+    ),
+    concurrency: int = typer.Option(4, "--concurrency", help="Parts uploaded in parallel"),
+    retry: int = typer.Option(3, "--retry", help="Retries per part"),
 ):
     """
     Uploads a file to a destination, optionally enforcing secure upload.
+    The file is sent in checksummed parts; rerunning an interrupted upload
+    resumes it.
     """
+    from concurrent.futures import ThreadPoolExecutor
+
     if not os.path.isfile(file_path):
         msg = f"File {file_path} not found."
         typer.echo(msg)
         return msg
 
-    # Mock upload
-    result = f"File '{file_path}' uploaded to '{destination}' using {'secure' if secure else 'insecure'} mode."
+    stats = TransferStats()
+    state_path = file_path + UPLOAD_STATE_SUFFIX
+    try:
+        transport = make_transport(destination, secure)
+        size = os.path.getsize(file_path)
+        part_count = max(1, -(-size // chunk_size))
+
+        state = load_upload_state(file_path, destination, chunk_size)
+        done = set()
+        if state is not None:
+            try:
+                done = with_retries(
+                    lambda _: transport.uploaded_parts(state["session"]), retry, stats.retry
+                )
+            except KeyError:
+                state = None  # the destination no longer knows the session
+        if state is None:
+            session = with_retries(
+                lambda _: transport.start(os.path.basename(file_path), size, chunk_size),
+                retry,
+                stats.retry,
+            )
+            stat = os.stat(file_path)
+            state = {
+                "destination": destination,
+                "size": size,
+                "mtime": stat.st_mtime,
+                "chunk_size": chunk_size,
+                "session": session,
+            }
+            with open(state_path, "w") as f:
+                json.dump(state, f)
+
+        checksums = {}
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+
+            def send_part(index: int):
+                # Each worker reads only its own part, so memory stays at
+                # concurrency x chunk_size however large the file is
+                data = os.pread(fd, chunk_size, index * chunk_size)
+                checksums[index] = hashlib.sha256(data).hexdigest()
+                if index in done:
+                    return
+                with_retries(
+                    lambda _: transport.upload_part(state["session"], index, data, checksums[index]),
+                    retry,
+                    stats.retry,
+                )
+                stats.add(len(data))
+
+            with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+                for future in [pool.submit(send_part, i) for i in range(part_count)]:
+                    future.result()
+        finally:
+            os.close(fd)
+
+        parts = [{"index": i, "sha256": checksums[i]} for i in range(part_count)]
+        location = with_retries(
+            lambda _: transport.complete(state["session"], parts), retry, stats.retry
+        )
+        os.remove(state_path)
+    except Exception as e:
+        msg = f"Upload of {file_path} failed: {e}"
+        if os.path.exists(state_path):
+            msg += " Run the command again to resume."
+        typer.echo(msg)
+        return msg
+
+    result = (
+        f"File '{file_path}' uploaded to '{destination}' as {location} using "
+        f"{'secure' if secure else 'insecure'} mode ({part_count} parts, "
+        f"{len(done)} already uploaded; {stats.summary()})."
+    )
     typer.echo(result)
     return result
 
@@ -469,16 +2975,53 @@ def download_file(
     url: str = typer.Argument(..., help="URL of file to download"),
     output_path: str = typer.Option(".", "--output", help="Local output path"),
     retry: int = typer.Option(3, "--retry", help="Number of times to retry"),
+    sha256: str = typer.Option(None, "--sha256", help="Expected SHA-256 of the file"),
+    parallel: int = typer.Option(
+        1, "--parallel", help="Fetch large files as this many concurrent ranges"
+    ),
+    timeout: float = typer.Option(
+        DOWNLOAD_TIMEOUT_SECONDS, "--timeout", help="Seconds before a stalled connection is retried"
+    ),
 ):
     """
     Downloads a file from a URL with a specified number of retries.
+    Interrupted downloads resume from the partial file when run again.
     """
-    # In real scenario, you'd do requests, etc. We'll just mock it.
-    filename = os.path.join(output_path, os.path.basename(url))
-    with open(filename, "w") as f:
-        f.write("Downloaded data from " + url)
+    from urllib.parse import unquote, urlparse
+
+    if os.path.isdir(output_path):
+        name = os.path.basename(unquote(urlparse(url).path)) or "download"
+        filename = os.path.join(output_path, name)
+    else:
+        filename = output_path
+    part_path = filename + ".part"
+    stats = TransferStats()
+
+    try:
+        size, ranges, validator = with_retries(
+            lambda _: probe_download(url, timeout), retry, stats.retry
+        )
+        if parallel > 1 and ranges and size and size >= DOWNLOAD_MIN_PARALLEL_BYTES:
+            download_parallel(
+                url, part_path, size, validator, parallel, retry, timeout, DOWNLOAD_CHUNK_BYTES, stats
+            )
+        else:
+            download_single(
+                url, part_path, size, ranges, validator, retry, timeout, DOWNLOAD_CHUNK_BYTES, stats
+            )
+
+        if sha256:
+            actual = file_sha256(part_path)
+            if actual != sha256.lower():
+                os.remove(part_path)
+                raise DownloadError(f"checksum mismatch: expected {sha256}, got {actual}")
+        os.replace(part_path, filename)
+    except Exception as e:
+        msg = f"Download of {url} failed: {e}"
+        typer.echo(msg)
+        return msg
 
-    result = f"File downloaded from {url} to {filename} with {retry} retries allowed."
+    result = f"File downloaded from {url} to {filename} ({stats.summary()})."
     typer.echo(result)
     return result
 
@@ -487,51 +3030,76 @@ def download_file(
 # 12) filter_records
 # -----------------------------------------------------
 @app.command()
+@cached_command(lambda arguments: [arguments["source"]] if arguments["source"] in FTS_COLUMNS else [])
 def filter_records(
     source: str = typer.Argument(..., help="Data source to filter"),
-    query: str = typer.Option("", "--query", help="Filtering query string"),
+    query: str = typer.Option(
+        "",
+        "--query",
+        help='Words to match; "quoted phrase" for phrases, word* for prefixes',
+    ),
     limit: int = typer.Option(10, "--limit", help="Limit the number of results"),
+    after: str = typer.Option(
+        None, "--after", help="Cursor printed by the previous page"
+    ),
 ):
     """
     Filters records from a data source using a query, limiting the number of results.
+    Results are ranked full-text matches when FTS5 is available, otherwise substring matches.
     Example usage: filter_records table_name --query "admin" --limit 5
     """
+    if source not in FTS_COLUMNS:
+        typer.echo(f"Unknown table: {source}")
+        return f"Table '{source}' not recognized."
+
     conn = get_connection()
     cur = conn.cursor()
+    column = FTS_COLUMNS[source]
+    fts_query = to_fts_query(query)
 
-    # For demonstration, we'll assume the 'source' is a table name in the DB
-    # and the 'query' is a substring to match against username or message, etc.
-    # This is just a simple example.
     try:
-        sql = f"SELECT * FROM {source} WHERE "
-        if source == "users":
-            sql += "username LIKE ?"
-        elif source == "logs":
-            sql += "message LIKE ?"
-        elif source == "tasks":
-            sql += "task_name LIKE ?"
+        if fts_query and has_fts_index(cur, source):
+            # bm25() is lower for better matches; page on (score, id)
+            score, last_id = (float("-inf"), 0)
+            if after:
+                raw_score, raw_id = after.rsplit(":", 1)
+                score, last_id = float(raw_score), int(raw_id)
+            cur.execute(
+                f"""
+                SELECT t.*, f.score FROM (
+                    SELECT rowid AS id, bm25({source}_fts) AS score
+                    FROM {source}_fts WHERE {source}_fts MATCH ?
+                ) AS f JOIN {source} AS t ON t.id = f.id
+                WHERE f.score > ? OR (f.score = ? AND f.id > ?)
+                ORDER BY f.score, f.id
+                LIMIT ?
+                """,
+                (fts_query, score, score, last_id, limit),
+            )
+            ranked = cur.fetchall()
+            rows = [row[:-1] for row in ranked]
+            next_cursor = f"{ranked[-1][-1]!r}:{ranked[-1][0]}" if ranked else None
         else:
-            typer.echo(f"Unknown table: {source}")
-            return f"Table '{source}' not recognized."
-
-        sql += f" LIMIT {limit}"
-
-        wildcard_query = f"%{query}%"
-        cur.execute(sql, (wildcard_query,))
-        rows = cur.fetchall()
+            # Substring fallback (no FTS5, or an empty query) pages on id
+            cur.execute(
+                f"SELECT * FROM {source} WHERE {column} LIKE ? AND id > ? ORDER BY id LIMIT ?",
+                (f"%{query}%", int(after or 0), limit),
+            )
+            rows = cur.fetchall()
+            next_cursor = str(rows[-1][0]) if rows else None
 
         result = (
             f"Found {len(rows)} records in '{source}' with query '{query}'.\n{rows}"
         )
+        if len(rows) == limit and next_cursor:
+            result += f"\nNext page: --after {next_cursor}"
         typer.echo(result)
         return result
 
-    except sqlite3.OperationalError as e:
+    except (sqlite3.OperationalError, ValueError) as e:
         msg = f"SQL error: {e}"
         typer.echo(msg)
         return msg
-    finally:
-        conn.close()
 
 
 # -----------------------------------------------------
@@ -544,6 +3112,12 @@ def compare_files(
     diff_only: bool = typer.Option(
         False, "--diff-only", help="Show only the differences"
     ),
+    summary: bool = typer.Option(
+        False, "--summary", help="Report byte-level differences instead of a line diff"
+    ),
+    max_lines: int = typer.Option(
+        2000, "--max-lines", help="Stop the diff after this many lines (0 = unlimited)"
+    ),
 ):
     """
     Compares two files, optionally showing only differences.
@@ -553,22 +3127,40 @@ def compare_files(
         typer.echo(msg)
         return msg
 
-    with open(file_a, "r") as fa, open(file_b, "r") as fb:
-        lines_a = fa.readlines()
-        lines_b = fb.readlines()
-
-    diff = difflib.unified_diff(lines_a, lines_b, fromfile=file_a, tofile=file_b)
+    if files_identical(file_a, file_b):
+        typer.echo("Files are identical.")
+        return ""
+
+    binary = is_binary_file(file_a) or is_binary_file(file_b)
+    with open(file_a, "rb") as fa, open(file_b, "rb") as fb:
+        data_a, data_b = map_file(fa), map_file(fb)
+        try:
+            blocks_a, blocks_b = line_blocks(data_a), line_blocks(data_b)
+            if summary or binary:
+                result = byte_summary(file_a, file_b, data_a, data_b, blocks_a, blocks_b)
+                if binary:
+                    result = "Binary files differ.\n" + result
+                typer.echo(result)
+                return result
+
+            diff = windowed_diff(file_a, file_b, data_a, data_b, blocks_a, blocks_b)
+            if diff_only:
+                # Show only differences
+                diff = (line for line in diff if line.startswith("+") or line.startswith("-"))
+            output = list(islice(diff, max_lines)) if max_lines > 0 else list(diff)
+            truncated = max_lines > 0 and next(diff, None) is not None
+        finally:
+            for data in (data_a, data_b):
+                if isinstance(data, mmap.mmap):
+                    data.close()
 
     if diff_only:
-        # Show only differences
-        differences = []
-        for line in diff:
-            if line.startswith("+") or line.startswith("-"):
-                differences.append(line)
-        result = "\n".join(differences)
+        result = "\n".join(line.rstrip("\n") for line in output)
     else:
         # Show entire unified diff
-        result = "".join(diff)
+        result = "".join(output)
+    if truncated:
+        result += f"\n... diff truncated after {max_lines} lines"
 
     typer.echo(result if result.strip() else "Files are identical.")
     return result
@@ -581,26 +3173,42 @@ def compare_files(
 def encrypt_data(
     input_path: str = typer.Argument(..., help="Path of the file to encrypt"),
     output_path: str = typer.Option("encrypted.bin", "--output", help="Output file"),
-    algorithm: str = typer.Option("AES", "--algorithm", help="Encryption algorithm"),
+    algorithm: str = typer.Option("caesar", "--algorithm", help="Encryption algorithm (caesar or AES)"),
+    key: str = typer.Option(None, "--key", help="Password for AES"),
 ):
     """
-    Encrypts data using a specified algorithm (mocked by Caesar cipher here).
+    Encrypts data using a specified algorithm (Caesar demo or AES-256-GCM).
     """
     if not os.path.isfile(input_path):
         msg = f"File {input_path} not found."
         typer.echo(msg)
         return msg
 
-    with open(input_path, "r") as f:
-        data = f.read()
-
-    # We'll just mock the encryption using Caesar cipher
-    encrypted = caesar_cipher_encrypt(data, 3)
+    algorithm = algorithm.lower()
+    if algorithm == "caesar":
+        transform = lambda src, dst: caesar_stream(src, dst, 3)
+    elif algorithm == "aes":
+        if not key:
+            msg = "AES encryption needs --key."
+            typer.echo(msg)
+            return msg
+        transform = lambda src, dst: aes_encrypt_stream(src, dst, key)
+    else:
+        msg = f"Unsupported algorithm: {algorithm}"
+        typer.echo(msg)
+        return msg
 
-    with open(output_path, "w") as f:
-        f.write(encrypted)
+    try:
+        total, seconds = run_cipher(input_path, output_path, transform)
+    except (OSError, RuntimeError) as e:
+        msg = f"Encryption failed: {e}"
+        typer.echo(msg)
+        return msg
 
-    result = f"Data from {input_path} encrypted with {algorithm} (mock) and saved to {output_path}."
+    result = (
+        f"Data from {input_path} encrypted with {algorithm} and saved to {output_path} "
+        f"({throughput(total, seconds)})."
+    )
     typer.echo(result)
     return result
 
@@ -615,23 +3223,32 @@ def decrypt_data(
     output_path: str = typer.Option("decrypted.txt", "--output", help="Output file"),
 ):
     """
-    Decrypts an encrypted file using a key (ignored in this mock Caesar cipher).
+    Decrypts an encrypted file. AES files are detected by their header;
+    anything else is treated as Caesar (where the key is ignored).
     """
     if not os.path.isfile(encrypted_file):
         msg = f"Encrypted file {encrypted_file} not found."
         typer.echo(msg)
         return msg
 
-    with open(encrypted_file, "r") as f:
-        encrypted_data = f.read()
-
-    # Key is ignored in this Caesar cipher demo
-    decrypted = caesar_cipher_decrypt(encrypted_data, 3)
+    if is_aes_file(encrypted_file):
+        algorithm = "aes"
+        transform = lambda src, dst: aes_decrypt_stream(src, dst, key)
+    else:
+        algorithm = "caesar"
+        transform = lambda src, dst: caesar_stream(src, dst, -3)
 
-    with open(output_path, "w") as f:
-        f.write(decrypted)
+    try:
+        total, seconds = run_cipher(encrypted_file, output_path, transform)
+    except (OSError, RuntimeError, ValueError) as e:
+        msg = f"Decryption failed: {e}"
+        typer.echo(msg)
+        return msg
 
-    result = f"Data from {encrypted_file} decrypted and saved to {output_path}."
+    result = (
+        f"Data from {encrypted_file} decrypted ({algorithm}) and saved to {output_path} "
+        f"({throughput(total, seconds)})."
+    )
     typer.echo(result)
     return result
 
@@ -646,22 +3263,116 @@ def migrate_database(
     dry_run: bool = typer.Option(
         False, "--dry-run", help="Perform a trial run without changing data"
     ),
+    mapping_file: str = typer.Option(
+        None, "--mapping", help="YAML/JSON file renaming or dropping tables and columns"
+    ),
+    batch_size: int = typer.Option(
+        MIGRATE_BATCH_ROWS, "--batch-size", help="Rows copied per transaction"
+    ),
 ):
     """
     Migrates data from an old database to a new one, optionally doing a dry run.
+    Rows are copied in batches and checkpointed, so rerunning after an
+    interruption resumes where it stopped.
     """
+    import yaml
+
     if not os.path.isfile(old_db):
         msg = f"Old database '{old_db}' not found."
         typer.echo(msg)
         return msg
 
+    src = sqlite3.connect(f"file:{old_db}?mode=ro", uri=True)
+    try:
+        mapping = load_migration_mapping(mapping_file) if mapping_file else {}
+        plans = plan_migration(src, mapping)
+    except (OSError, ValueError, yaml.YAMLError, sqlite3.Error) as e:
+        src.close()
+        msg = f"Migration failed: {e}"
+        typer.echo(msg)
+        return msg
+
+    checkpoints = {}
+    if os.path.isfile(new_db):
+        dst = sqlite3.connect(new_db)
+        if dst.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (MIGRATE_CHECKPOINT_TABLE,)
+        ).fetchone():
+            checkpoints = {plan["source"]: read_checkpoint(dst, plan["source"]) for plan in plans}
+        dst.close()
+
     if dry_run:
-        result = f"Dry run: would migrate {old_db} to {new_db}."
+        lines = [f"Dry run: would migrate {old_db} to {new_db}."]
+        total_seconds = 0.0
+        for plan in plans:
+            count = src.execute(f'SELECT COUNT(*) FROM "{plan["source"]}"').fetchone()[0]
+            _, copied, done = checkpoints.get(plan["source"], (0, 0, 0))
+            remaining = 0 if done else max(count - copied, 0)
+            rate = estimate_rows_per_second(src, plan, batch_size) if remaining else None
+            seconds = remaining / rate if rate else 0.0
+            total_seconds += seconds
+            renamed = ", ".join(f"{a}->{b}" for a, b in plan["columns"] if a != b)
+            lines.append(
+                f"  {plan['source']} -> {plan['target']}: {count} rows, {remaining} to copy, "
+                f"~{seconds:.1f}s" + (f" (renames {renamed})" if renamed else "")
+            )
+        lines.append(f"Estimated time: ~{total_seconds:.1f}s")
+        src.close()
+        result = "\n".join(lines)
         typer.echo(result)
         return result
 
-    shutil.copy(old_db, new_db)
-    result = f"Database migrated from {old_db} to {new_db}."
+    dst = sqlite3.connect(new_db)
+    dst.execute("PRAGMA journal_mode = WAL")
+    dst.execute("PRAGMA synchronous = NORMAL")
+    dst.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATE_CHECKPOINT_TABLE} (
+            source_table TEXT PRIMARY KEY,
+            last_rowid INTEGER NOT NULL,
+            rows_copied INTEGER NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    dst.commit()
+
+    start = time.perf_counter()
+    last_report = [start]
+
+    def progress(table: str, copied: int):
+        now = time.perf_counter()
+        if now - last_report[0] >= 1.0:
+            last_report[0] = now
+            typer.echo(f"  {table}: {copied} rows ({copied / (now - start):.0f} rows/s overall)")
+
+    total = 0
+    try:
+        for plan in plans:
+            table_start = time.perf_counter()
+            resumed = read_checkpoint(dst, plan["source"])[1]
+            copied = copy_table(src, dst, plan, batch_size, progress)
+            total += copied - resumed
+            seconds = time.perf_counter() - table_start
+            typer.echo(
+                f"  {plan['source']} -> {plan['target']}: {copied} rows"
+                + (f" ({resumed} already copied)" if resumed else "")
+                + f" in {seconds:.2f}s"
+            )
+    except sqlite3.Error as e:
+        dst.rollback()
+        msg = f"Migration stopped at '{plan['source']}': {e}. Rerun to resume after fixing it."
+        typer.echo(msg)
+        return msg
+    finally:
+        src.close()
+        dst.close()
+
+    seconds = time.perf_counter() - start
+    result = (
+        f"Database migrated from {old_db} to {new_db}: {total} rows in {seconds:.2f}s "
+        f"({total / seconds if seconds else 0:.0f} rows/s)."
+    )
     typer.echo(result)
     return result
 
@@ -672,24 +3383,27 @@ def migrate_database(
 @app.command()
 def queue_task(
     task_name: str = typer.Argument(..., help="Name of the task to queue"),
-    priority: int = typer.Option(1, "--priority", help="Priority of the task"),
+    priority: int = typer.Option(1, "--priority", help="Priority of the task (lower values run first)"),
     delay: int = typer.Option(
         0, "--delay", help="Delay in seconds before starting task"
     ),
 ):
     """
     Queues a task with a specified priority and optional delay.
+    The task name is the template command run-scheduler will execute;
+    lower priority values run first.
     """
     conn = get_connection()
     cur = conn.cursor()
-    now = datetime.now().isoformat()
+    now = datetime.now()
+    run_at = datetime.fromtimestamp(now.timestamp() + max(delay, 0)).isoformat()
     cur.execute(
-        "INSERT INTO tasks (task_name, priority, status, created_at) VALUES (?, ?, ?, ?)",
-        (task_name, priority, "pending", now),
+        "INSERT INTO tasks (task_name, priority, status, created_at, run_at) VALUES (?, ?, ?, ?, ?)",
+        (task_name, priority, "pending", now.isoformat(), run_at),
     )
-    conn.commit()
     task_id = cur.lastrowid
-    conn.close()
+    record_task_event(cur, task_id, "pending", detail=f"queued to run at {run_at}")
+    conn.commit()
 
     result = f"Task '{task_name}' queued with priority {priority}, delay {delay}s, assigned ID {task_id}."
     typer.echo(result)
@@ -714,13 +3428,24 @@ def remove_task(
 
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-    conn.commit()
+    # A running task is left to its worker; deleting it would orphan the
+    # result. Once its lease has expired the worker is presumed dead.
+    cur.execute(
+        """
+        DELETE FROM tasks
+        WHERE id = ? AND (status != 'in-progress' OR lease_until <= ?)
+        """,
+        (task_id, datetime.now().isoformat()),
+    )
     removed = cur.rowcount
-    conn.close()
+    if removed:
+        cur.execute("DELETE FROM task_events WHERE task_id = ?", (task_id,))
+    conn.commit()
 
     if removed:
         msg = f"Task {task_id} removed."
+    elif cur.execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone():
+        msg = f"Task {task_id} is running and cannot be removed until its lease expires."
     else:
         msg = f"Task {task_id} not found."
     typer.echo(msg)
@@ -731,6 +3456,7 @@ def remove_task(
 # 29) list_tasks
 # -----------------------------------------------------
 @app.command()
+@cached_command(["tasks"], skip=lambda arguments: arguments["stats"])
 def list_tasks(
     show_all: bool = typer.Option(
         False, "--all", help="Show all tasks, including completed"
@@ -738,41 +3464,57 @@ def list_tasks(
     sort_by: str = typer.Option(
         "priority", "--sort-by", help="Sort tasks by this field"
     ),
+    limit: int = typer.Option(100, "--limit", help="Tasks per page"),
+    after: str = typer.Option(None, "--after", help="Cursor printed by the previous page"),
+    fmt: str = typer.Option("text", "--format", help="Output format: text, json or ndjson"),
+    stats: bool = typer.Option(
+        False, "--stats", help="Show queue depth and throughput instead of tasks"
+    ),
 ):
     """
     Lists tasks, optionally including completed tasks or sorting by a different field.
+    Results are paged; pass the printed cursor as --after to get the next page.
     """
-    valid_sort_fields = ["priority", "status", "created_at"]
-    if sort_by not in valid_sort_fields:
-        msg = f"Invalid sort field. Must be one of {valid_sort_fields}."
-        typer.echo(msg)
-        return msg
-
-    conn = get_connection()
-    cur = conn.cursor()
-    if show_all:
-        sql = f"SELECT id, task_name, priority, status, created_at FROM tasks ORDER BY {sort_by} ASC"
-    else:
-        sql = f"SELECT id, task_name, priority, status, created_at FROM tasks WHERE status != 'complete' ORDER BY {sort_by} ASC"
-
-    cur.execute(sql)
-    tasks = cur.fetchall()
-    conn.close()
-
-    result = "Tasks:\n"
-    for t in tasks:
-        result += (
-            f"ID={t[0]}, Name={t[1]}, Priority={t[2]}, Status={t[3]}, Created={t[4]}\n"
-        )
+    error = check_list_options(sort_by, TASK_SORT_COLUMNS, fmt, limit, after)
+    if error:
+        typer.echo(error)
+        return error
+
+    if stats:
+        queue = task_queue_stats()
+        if fmt == "text":
+            result = "Task queue:\n" + "\n".join(f"  {k}: {v}" for k, v in queue.items())
+        else:
+            result = json.dumps(queue)
+        typer.echo(result)
+        return result
 
-    typer.echo(result.strip())
-    return result
+    cur = get_connection().cursor()
+    columns = ["id", "task_name", "priority", "status", "created_at"]
+    where = [] if show_all else ["status != 'complete'"]
+    rows = keyset_page(
+        cur, "tasks", columns, sort_by, TASK_SORT_COLUMNS[sort_by], where, [], after, limit
+    )
+    return emit_page(
+        rows,
+        columns,
+        sort_by,
+        limit,
+        fmt,
+        "tasks",
+        "Tasks:",
+        lambda t: (
+            f"ID={t['id']}, Name={t['task_name']}, Priority={t['priority']}, "
+            f"Status={t['status']}, Created={t['created_at']}"
+        ),
+    )
 
 
 # -----------------------------------------------------
 # 30) inspect_task
 # -----------------------------------------------------
 @app.command()
+@cached_command(["tasks", "task_events"])
 def inspect_task(
     task_id: str = typer.Argument(..., help="ID of the task to inspect"),
     json_output: bool = typer.Option(
@@ -784,30 +3526,145 @@ def inspect_task(
     """
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute(
-        "SELECT id, task_name, priority, status, created_at FROM tasks WHERE id = ?",
-        (task_id,),
-    )
+    columns = [
+        "id", "task_name", "priority", "status", "created_at",
+        "run_at", "started_at", "finished_at", "attempts", "worker", "error",
+    ]
+    cur.execute(f"SELECT {', '.join(columns)} FROM tasks WHERE id = ?", (task_id,))
     row = cur.fetchone()
-    conn.close()
 
     if not row:
         msg = f"No task found with ID {task_id}."
         typer.echo(msg)
         return msg
 
-    task_dict = {
-        "id": row[0],
-        "task_name": row[1],
-        "priority": row[2],
-        "status": row[3],
-        "created_at": row[4],
-    }
+    task_dict = dict(zip(columns, row))
+    task_dict["events"] = [
+        {"status": status, "worker": worker, "detail": detail, "at": at}
+        for status, worker, detail, at in cur.execute(
+            "SELECT status, worker, detail, created_at FROM task_events WHERE task_id = ? ORDER BY id",
+            (task_id,),
+        )
+    ]
 
     if json_output:
         result = json.dumps(task_dict, indent=2)
     else:
         result = f"Task ID={task_dict['id']}, Name={task_dict['task_name']}, Priority={task_dict['priority']}, Status={task_dict['status']}, Created={task_dict['created_at']}"
+        result += f", RunAt={task_dict['run_at']}, Attempts={task_dict['attempts']}"
+        if task_dict["error"]:
+            result += f", Error={task_dict['error']}"
+    typer.echo(result)
+    return result
+
+
+# -----------------------------------------------------
+# 31) run_scheduler
+# -----------------------------------------------------
+@app.command()
+def run_scheduler(
+    concurrency: int = typer.Option(2, "--concurrency", help="Tasks run in parallel"),
+    poll_interval: float = typer.Option(
+        1.0, "--poll-interval", help="Seconds to wait when no task is due"
+    ),
+    once: bool = typer.Option(
+        False, "--once", help="Exit once no task is due instead of waiting for more"
+    ),
+    timeout: float = typer.Option(
+        TASK_TIMEOUT_SECONDS, "--timeout", help="Seconds before a running task is killed"
+    ),
+    max_attempts: int = typer.Option(1, "--max-attempts", help="Runs per task before it fails"),
+):
+    """
+    Runs queued tasks when they are due, lowest priority value first, on a worker pool.
+    Tasks left in-progress by a crashed worker are run again once their lease expires.
+    Only tasks added with queue-task are run, not the seeded sample rows.
+    Press Ctrl+C to stop; running tasks are allowed to finish.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    stop = threading.Event()
+    outcomes = {"complete": 0, "failed": 0, "pending": 0, "lost": 0}
+    outcomes_lock = threading.Lock()
+
+    def work(index: int):
+        worker = f"{os.getpid()}-{index}"
+        backoff = poll_interval
+        while not stop.is_set():
+            try:
+                task = claim_task(worker, timeout + TASK_LEASE_GRACE_SECONDS)
+                if task is None:
+                    if once:
+                        return
+                    stop.wait(poll_interval)
+                    continue
+                ok, detail = run_task_command(task["task_name"], timeout)
+                status = finish_task(task, worker, ok, detail, max_attempts)
+            except sqlite3.Error as e:
+                # A busy or locked database must not kill the worker; a task
+                # whose outcome couldn't be recorded is re-run once its lease expires
+                typer.echo(f"[{worker}] database error: {e}; retrying in {backoff:.1f}s", err=True)
+                stop.wait(backoff)
+                backoff = min(max(backoff, 0.1) * 2, TASK_ERROR_BACKOFF_SECONDS)
+                continue
+            backoff = poll_interval
+            with outcomes_lock:
+                outcomes[status] += 1
+            typer.echo(f"[{worker}] task {task['id']} '{task['task_name']}' -> {status}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        futures = [pool.submit(work, i) for i in range(max(concurrency, 1))]
+        try:
+            for future in futures:
+                while not future.done():
+                    stop.wait(0.2)
+                future.result()
+        except KeyboardInterrupt:
+            stop.set()
+    seconds = time.perf_counter() - start
+
+    processed = sum(outcomes.values())
+    result = (
+        f"Scheduler processed {processed} tasks ({outcomes['complete']} complete, "
+        f"{outcomes['failed']} failed, {outcomes['pending']} retrying, "
+        f"{outcomes['lost']} lost to an expired lease) in {seconds:.2f}s "
+        f"({processed / seconds if seconds else 0:.1f} tasks/s)."
+    )
+    typer.echo(result)
+    return result
+
+
+# -----------------------------------------------------
+# 32) cache_stats
+# -----------------------------------------------------
+@app.command()
+def cache_stats(
+    clear: bool = typer.Option(False, "--clear", help="Drop all cached results and counters"),
+):
+    """
+    Shows result cache hits, misses, evictions and size (see --cache).
+    """
+    flush_cache_stats()
+    conn = get_connection()
+    cur = conn.cursor()
+    if clear:
+        cur.execute("DELETE FROM command_cache")
+        cur.execute("DELETE FROM cache_stats")
+        conn.commit()
+        _cache_memo.clear()
+
+    stats = dict(cur.execute("SELECT name, value FROM cache_stats"))
+    entries, size = cur.execute(
+        "SELECT COUNT(*), COALESCE(SUM(LENGTH(output) + LENGTH(result)), 0) FROM command_cache"
+    ).fetchone()
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    lookups = hits + misses
+    result = (
+        f"Cache {'enabled' if CACHE_ENABLED else 'disabled'}: {hits} hits, {misses} misses "
+        f"({hits / lookups * 100 if lookups else 0:.0f}% hit rate), "
+        f"{stats.get('evictions', 0)} evictions, {entries}/{CACHE_MAX_ENTRIES} entries, {size} bytes."
+    )
     typer.echo(result)
     return result
 
@@ -1,11 +1,9 @@
-from RealtimeSTT import AudioToTextRecorder
-from typing import List
-from modules.assistant_config import get_config
-from modules.base_assistant import PlainAssistant
-from modules.utils import create_session_logger_id, setup_logging
 import typer
 import logging
-from modules.execute_python import execute # Corrected import
+from typing import List
+
+# Heavy dependencies (RealtimeSTT, TTS and LLM clients, Playwright, numpy) are
+# imported by the commands that need them, so `ping` and `report` start fast
 
 app = typer.Typer()
 
@@ -16,23 +14,55 @@ def ping():
 
 
 @app.command()
-def chat():
+def chat(
+    audio_source: str = typer.Option(
+        None,
+        "--audio-source",
+        "-a",
+        help="WAV file, directory of WAVs, or '-' for raw 16-bit mono PCM on stdin (default: microphone)",
+    ),
+    fast: bool = typer.Option(
+        False, "--fast", help="Process --audio-source faster than real time"
+    ),
+    pcm_rate: int = typer.Option(
+        16000, "--pcm-rate", help="Sample rate of raw PCM read from stdin"
+    ),
+):
     """Start a chat session with the plain assistant using speech input"""
+    from modules.assistant_config import get_config
+    from modules.audio_source import WhisperTranscriber, run_audio_source
+    from modules.base_assistant import PlainAssistant
+    from modules.stt_profile import get_stt_profile, recorder_options
+    from modules.tracing import Tracer, set_tracer
+    from modules.utils import (
+        build_file_name_session,
+        create_session_logger_id,
+        setup_logging,
+    )
+    from modules.wake_word import WakeWordGate, gated_text
+
     # Create session and logging
     session_id = create_session_logger_id()
     logger = setup_logging(session_id)
     logger.info(f"🚀 Starting chat session {session_id}")
+    set_tracer(Tracer(session_id))
 
     # Create assistant
     assistant = PlainAssistant(logger, session_id)
 
-    # Configure STT recorder
-    recorder = AudioToTextRecorder(
-        spinner=True,
-        model="tiny.en",
-        language="en",
-        print_transcription_time=True,
-    )
+    # Configure STT recorder; the microphone and --audio-source use the same profile
+    profile = get_stt_profile("base_assistant")
+    recorder = None
+    if audio_source is None:
+        from RealtimeSTT import AudioToTextRecorder
+
+        recorder = AudioToTextRecorder(
+            spinner=True,
+            language="en",
+            print_transcription_time=True,
+            on_recording_start=assistant.echo_gate.mark_capture,
+            **recorder_options(profile),
+        )
 
     def process_text(text):
         """Process user speech input"""
@@ -49,10 +79,12 @@ def chat():
                 return False
 
             # Process input and get response
-            recorder.stop()
+            if recorder:
+                recorder.stop()
             response = assistant.process_text(text)
             logger.info(f"🤖 Response: {response}")
-            recorder.start()
+            if recorder:
+                recorder.start()
 
             return True
 
@@ -60,12 +92,36 @@ def chat():
             logger.error(f"❌ Error occurred: {str(e)}")
             raise
 
+    # Cheap wake-word check on short windows before the full transcription
+    gate = WakeWordGate.from_config("base_assistant")
+
+    if audio_source is not None:
+        records_file = build_file_name_session("utterances.jsonl", session_id)
+        logger.info(f"🎧 Reading audio from {audio_source}, records in {records_file}")
+        count = run_audio_source(
+            audio_source,
+            gate,
+            WhisperTranscriber(profile),
+            process_text,
+            records_file,
+            realtime=not fast,
+            pcm_sample_rate=pcm_rate,
+            on_record=lambda record: logger.info(f"📊 {record.model_dump_json()}"),
+        )
+        logger.info(f"📊 {count} utterances processed. {gate.stats.summary()}")
+        return
+
     try:
         print("🎤 Speak now... (say 'exit' or 'quit' to end)")
         while True:
-            recorder.text(process_text)
+            text = gated_text(recorder, gate)
+            if text is None:
+                logger.info("🤖 Wake word not detected - skipped transcription")
+                continue
+            process_text(text)
 
     except KeyboardInterrupt:
+        logger.info(f"📊 {gate.stats.summary()}")
         logger.info("👋 Session ended by user")
         raise KeyboardInterrupt
     except Exception as e:
@@ -73,5 +129,45 @@ def chat():
         raise
 
 
+@app.command()
+def benchmark_recall(
+    turns: List[int] = typer.Option(
+        [10_000, 1_000_000], "--turns", help="Index sizes (stored turns) to benchmark"
+    ),
+    dim: int = typer.Option(256, "--dim", help="Embedding dimension"),
+    k: int = typer.Option(3, "--k", help="Turns recalled per query"),
+):
+    """Benchmarks recall index search latency at the given numbers of stored turns."""
+    from modules.recall import benchmark_search, format_benchmark
+
+    for size in turns:
+        print(format_benchmark(benchmark_search(size, dim, k)))
+
+
+@app.command()
+def benchmark_memory(
+    turns: int = typer.Option(10_000, "--turns", help="Turns to hold in each layout"),
+):
+    """Reports the RAM held by the conversation history in each in-memory layout."""
+    from modules.conversation import footprint_report, format_footprint
+
+    print(format_footprint(footprint_report(turns)))
+
+
+@app.command()
+def report(
+    session: str = typer.Argument(
+        ..., help="Session id (output/<session_id>), session directory or trace.jsonl path"
+    ),
+    utterance: str = typer.Option(
+        None, "--utterance", "-u", help="Utterance id for the waterfall (default: latest)"
+    ),
+):
+    """Prints per-stage p50/p95 latency and an utterance waterfall from a session trace."""
+    from modules.tracing import build_report
+
+    print(build_report(session, utterance))
+
+
 if __name__ == "__main__":
     app()
@@ -1,12 +1,11 @@
-from RealtimeSTT import AudioToTextRecorder
-from modules.assistant_config import get_config
-from modules.typer_agent import TyperAgent
-from modules.utils import create_session_logger_id, setup_logging
 import logging
 import typer
 from typing import List
 import os
 
+# Heavy dependencies (RealtimeSTT, TTS and LLM clients, numpy) are imported by
+# the commands that need them, so `ping`, `config` and `report` start fast
+
 app = typer.Typer()
 
 
@@ -32,70 +31,103 @@ def awaken(
         "-m",
         help="Options: ('default', 'execute', 'execute-no-scratch'). Execution mode: default (no exec), execute (exec + scratch), execute-no-scratch (exec only)",
     ),
+    audio_source: str = typer.Option(
+        None,
+        "--audio-source",
+        "-a",
+        help="WAV file, directory of WAVs, or '-' for raw 16-bit mono PCM on stdin (default: microphone)",
+    ),
+    fast: bool = typer.Option(
+        False, "--fast", help="Process --audio-source faster than real time"
+    ),
+    pcm_rate: int = typer.Option(
+        16000, "--pcm-rate", help="Sample rate of raw PCM read from stdin"
+    ),
 ):
     """Run STT interface that processes speech into typer commands"""
+    from modules.assistant_config import get_config
+    from modules.audio_source import WhisperTranscriber, run_audio_source
+    from modules.stt_profile import get_stt_profile, recorder_options
+    from modules.tracing import Tracer, set_tracer
+    from modules.typer_agent import TyperAgent
+    from modules.utils import build_file_name_session
+    from modules.wake_word import WakeWordGate, gated_text
+
     # Remove the list concatenation - pass scratchpad as a single string
     assistant, typer_file, _ = TyperAgent.build_agent(typer_file, [scratchpad])
-
-    print("🎤 Speak now... (press Ctrl+C to exit)")
-
-    recorder = AudioToTextRecorder(
-        spinner=False,
-        # wake_words="deep" # specific wake words to trigger the assistant using the realtime-stt library. we do this manually below so we can use any word.
-        # realtime_processing_pause=0.3,
-        post_speech_silence_duration=1.5,  # how long to wait after speech ends before processing
-        # compute_type="int8",
-        compute_type="float32",
-        model="tiny.en",  # VERY fast (.5s), but not accurate
-        # model="small.en",  # decent speed (1.5s), improved accuracy
-        # Beam size controls how many alternative transcription paths are explored
-        # Higher values = more accurate but slower, lower values = faster but less accurate
-        # beam_size=3,
-        # beam_size=5,
-        beam_size=8,
-        # Batch size controls how many audio chunks are processed together
-        # Higher values = faster processing but uses more memory, lower values = slower processing but uses less memory
-        batch_size=25,
-        # model="large-v3",  # very slow, but accurate
-        # model="distil-large-v3", # very slow (but faster than large-v3) but accurate
-        # realtime_model_type="tiny.en", # realtime models are used for the on_realtime_transcription_update() callback
-        # realtime_model_type="large-v3",
-        language="en",
-        print_transcription_time=True,
-        # enable_realtime_transcription=True,
-        # on_realtime_transcription_update=lambda text: print(
-        #     f"🎤 on_realtime_transcription_update(): {text}"
-        # ),
-        # on_realtime_transcription_stabilized=lambda text: print(
-        #     f"🎤 on_realtime_transcription_stabilized(): {text}"
-        # ),
-        # on_recorded_chunk=lambda chunk: print(f"🎤 on_recorded_chunk(): {chunk}"),
-        # on_transcription_start=lambda: print("🎤 on_transcription_start()"),
-        # on_recording_stop=lambda: print("🎤 on_transcription_stop()"),
-        # on_recording_start=lambda: print("🎤 on_recording_start()"),
-    )
+    set_tracer(Tracer(assistant.session_id))
+
+    # Model, beam size, batch size and compute type come from the benchmarked
+    # stt_profile in assistant_config.yml (see the benchmark-stt command)
+    profile = get_stt_profile("typer_assistant")
+
+    recorder = None
+    if audio_source is None:
+        from RealtimeSTT import AudioToTextRecorder
+
+        print("🎤 Speak now... (press Ctrl+C to exit)")
+        recorder = AudioToTextRecorder(
+            spinner=False,
+            # wake_words="deep" # specific wake words to trigger the assistant using the realtime-stt library. we do this manually below so we can use any word.
+            # realtime_processing_pause=0.3,
+            language="en",
+            print_transcription_time=True,
+            on_recording_start=assistant.echo_gate.mark_capture,
+            **recorder_options(profile),
+        )
 
     def process_text(text):
-        print(f"
-🎤 Heard: {text}")
+        print(f"\n🎤 Heard: {text}")
         try:
+            if assistant.echo_gate.is_echo(text):
+                print("🤖 Own speech - ignoring")
+                return
+
             assistant_name = get_config("typer_assistant.assistant_name")
             if assistant_name.lower() not in text.lower():
                 print(f"🤖 Not {assistant_name} - ignoring")
                 return
 
-            recorder.stop()
+            if recorder:
+                recorder.stop()
             output = assistant.process_text(
                 text, typer_file, scratchpad, context_files, mode
             )
-            print(f"🤖 Response:
-{output}")
-            recorder.start()
+            print(f"🤖 Response:\n{output}")
+            if recorder:
+                recorder.start()
         except Exception as e:
             print(f"❌ Error: {str(e)}")
 
-    while True:
-        recorder.text(process_text)
+    # Cheap wake-word check on short windows before the full transcription
+    gate = WakeWordGate.from_config("typer_assistant")
+
+    if audio_source is not None:
+        records_file = build_file_name_session("utterances.jsonl", assistant.session_id)
+        print(f"🎧 Reading audio from {audio_source}, records in {records_file}")
+        count = run_audio_source(
+            audio_source,
+            gate,
+            WhisperTranscriber(profile),
+            process_text,
+            records_file,
+            realtime=not fast,
+            pcm_sample_rate=pcm_rate,
+            on_record=lambda record: print(f"📊 {record.model_dump_json()}"),
+        )
+        print(f"📊 {count} utterances processed. {gate.stats.summary()}")
+        return
+
+    try:
+        while True:
+            text = gated_text(recorder, gate)
+            if text is None:
+                print("🤖 Wake word not detected - skipped transcription")
+                continue
+            process_text(text)
+    except KeyboardInterrupt:
+        print(f"\n📊 {gate.stats.summary()}")
+        raise
 
 # Add new commands here
 
@@ -117,9 +149,83 @@ def generate_code(description: str, filename: str = None):
         # TODO: Implement code generation and print to console logic here
         pass
 
+@app.command()
+def benchmark_stt(
+    fixtures_dir: str = typer.Argument(
+        ..., help="Directory of <name>.wav files with <name>.txt reference transcripts"
+    ),
+    models: List[str] = typer.Option(
+        ["tiny.en", "base.en", "small.en"], "--model", help="Whisper models to try"
+    ),
+    beam_sizes: List[int] = typer.Option([1, 3, 5, 8], "--beam-size"),
+    compute_types: List[str] = typer.Option(["int8", "float32"], "--compute-type"),
+    cpu_threads: List[int] = typer.Option([1, 2, 4], "--threads"),
+    batch_sizes: List[int] = typer.Option([0], "--batch-size"),
+    wer_tolerance: float = typer.Option(
+        0.02, "--wer-tolerance", help="Accept profiles this close to the best WER"
+    ),
+    max_rtf: float = typer.Option(
+        None, "--max-rtf", help="Only pick profiles with a real-time factor below this"
+    ),
+    write: bool = typer.Option(
+        True, "--write/--no-write", help="Write the best profile to assistant_config.yml"
+    ),
+):
+    """Benchmarks STT profiles over WAV fixtures and stores the best one."""
+    from modules.stt_benchmark import (
+        build_grid,
+        find_fixtures,
+        format_result,
+        run_benchmark,
+        select_best_profile,
+    )
+    from modules.stt_profile import save_stt_profile
+    from modules.utils import build_file_path, current_date_time_str, to_json_file_pretty
+
+    fixtures = find_fixtures(fixtures_dir)
+    if not fixtures:
+        print(f"❌ No <name>.wav + <name>.txt fixtures found in {fixtures_dir}")
+        raise typer.Exit(1)
+
+    grid = build_grid(models, beam_sizes, compute_types, cpu_threads, batch_sizes)
+    print(f"🏁 Benchmarking {len(grid)} profiles over {len(fixtures)} files")
+    results = run_benchmark(fixtures, grid, on_result=lambda r: print(format_result(r)))
+
+    results_file = build_file_path(f"stt_benchmark_{current_date_time_str()}")
+    to_json_file_pretty(results_file, results)
+    print(f"📄 Results written to {results_file}.json")
+
+    best = select_best_profile(results, wer_tolerance, max_rtf)
+    if best is None:
+        print("❌ No profile completed within the given limits")
+        raise typer.Exit(1)
+
+    print(f"🏆 Best profile: {format_result(best)}")
+    if write:
+        save_stt_profile("typer_assistant", best)
+        print("💾 Saved to typer_assistant.stt_profile in assistant_config.yml")
+
+
+@app.command()
+def report(
+    session: str = typer.Argument(
+        ..., help="Session id (output/<session_id>), session directory or trace.jsonl path"
+    ),
+    utterance: str = typer.Option(
+        None, "--utterance", "-u", help="Utterance id for the waterfall (default: latest)"
+    ),
+):
+    """Prints per-stage p50/p95 latency and an utterance waterfall from a session trace."""
+    from modules.tracing import build_report
+
+    print(build_report(session, utterance))
+
+
 @app.command()
 def config(key: str):
     """Gets a configuration value by key."""
+    from modules.assistant_config import get_config
+
     try:
         value = get_config(key)
         print(f"Config value for '{key}': {value}")
@@ -1,4 +1,5 @@
 import os
+import re
 import yaml
 from dpath import util as dpath_util
 
@@ -35,10 +36,56 @@ def get_config(dot_path_key: str, config_path: str = DEFAULT_CONFIG_PATH) -> str
         raise KeyError(f"Key path '{dot_path_key}' not found in config")
 
 
+def _content_indent(line: str):
+    """Indentation of a key line, or None for blank and comment-only lines."""
+    stripped = line.lstrip()
+    if not stripped or stripped.startswith("#"):
+        return None
+    return len(line) - len(stripped)
+
+
+def _block_end(lines: list, key_line: int, indent: int) -> int:
+    """Index after the last content line nested under the key at key_line."""
+    end = key_line + 1
+    for i in range(key_line + 1, len(lines)):
+        line_indent = _content_indent(lines[i])
+        if line_indent is None:
+            continue
+        if line_indent <= indent:
+            break
+        end = i + 1
+    return end
+
+
+def _dump_lines(key: str, value, indent: int) -> list:
+    dumped = yaml.safe_dump(
+        {key: value}, sort_keys=False, default_flow_style=False, allow_unicode=True
+    )
+    return [" " * indent + line for line in dumped.splitlines()]
+
+
+def _keep_comments(old_lines: list, new_lines: list) -> list:
+    """Carry trailing comments over to rewritten lines that set the same key."""
+    comments = {}
+    for line in old_lines:
+        match = re.match(r"(\s*[^\s#:][^:]*:)(?:\s.*?)?(\s+#\s.*)$", line)
+        if match:
+            comments[match.group(1)] = match.group(2)
+    kept = []
+    for line in new_lines:
+        match = re.match(r"\s*[^\s#:][^:]*:", line)
+        kept.append(line + comments.get(match.group(0), "") if match else line)
+    return kept
+
+
 def set_config(dot_path_key: str, value: any, config_path: str = DEFAULT_CONFIG_PATH):
     """
     Set a field in the YAML config file using dot notation path.
 
+    Only the lines of the key being set are rewritten (missing keys are
+    appended to their parent section), so comments and key order elsewhere
+    in the file are kept.
+
     Args:
         dot_path_key: The key path to set in the config (e.g. 'parent.child.key')
         value: The value to set.
@@ -54,20 +101,54 @@ def set_config(dot_path_key: str, value: any, config_path: str = DEFAULT_CONFIG_
         raise FileNotFoundError(f"Config file not found at {abs_config_path}")
 
     with open(abs_config_path, 'r') as f:
-        config = yaml.safe_load(f)
-
-    if config is None:
-        config = {}
-
+        lines = f.read().splitlines()
+
+    parts = dot_path_key.split(".")
+    start, end, indent = 0, len(lines), -1
+    for depth, part in enumerate(parts):
+        child_indent = None
+        key_line = None
+        for i in range(start, end):
+            line_indent = _content_indent(lines[i])
+            if line_indent is None:
+                continue
+            if child_indent is None:
+                child_indent = line_indent
+            if line_indent == child_indent and re.match(
+                rf"{re.escape(part)}\s*:(\s|$)", lines[i].lstrip()
+            ):
+                key_line = i
+                break
+
+        if key_line is None:
+            # Append the missing keys at the end of the parent section
+            nested = value
+            for missing in reversed(parts[depth + 1 :]):
+                nested = {missing: nested}
+            if child_indent is None:
+                child_indent = indent + 2 if indent >= 0 else 0
+            lines[end:end] = _dump_lines(part, nested, child_indent)
+            break
+
+        indent = child_indent
+        start, end = key_line + 1, _block_end(lines, key_line, indent)
+        if depth == len(parts) - 1:
+            lines[key_line:end] = _keep_comments(
+                lines[key_line:end], _dump_lines(part, value, indent)
+            )
+
+    text = "\n".join(lines) + "\n"
     try:
-        # Use new_keys=True to create keys if they don't exist
-        dpath_util.set(config, dot_path_key, value, separator=".", new_keys=True)
-    except Exception as e:
-        # Catch broader exception as dpath.util.set can raise various errors
+        written = dpath_util.get(yaml.safe_load(text), dot_path_key, separator=".")
+    except (KeyError, yaml.YAMLError) as e:
         raise KeyError(f"Could not set key path '{dot_path_key}' in config: {e}")
+    if written != value:
+        raise KeyError(f"Could not set key path '{dot_path_key}' in config")
 
-    with open(abs_config_path, 'w') as f:
-        yaml.safe_dump(config, f)
+    tmp_path = f"{abs_config_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, abs_config_path)
 
 
 def get_config_file(config_path: str = DEFAULT_CONFIG_PATH) -> str:
@@ -0,0 +1,45 @@
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def pcm16_to_float32(data: bytes, channels: int = 1) -> np.ndarray:
+    """Convert little-endian 16-bit PCM bytes into mono float32 samples in [-1, 1]."""
+    samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels]
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Linear resample, good enough for speech going into whisper."""
+    if source_rate == target_rate or len(audio) == 0:
+        return audio
+    target_length = int(round(len(audio) * target_rate / source_rate))
+    source_positions = np.linspace(0, len(audio) - 1, num=target_length)
+    return np.interp(source_positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def load_wav(path: str, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Load a 16-bit PCM WAV file as mono float32 at the whisper sample rate."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit PCM WAV files are supported: {path}")
+        channels = wav.getnchannels()
+        source_rate = wav.getframerate()
+        data = wav.readframes(wav.getnframes())
+
+    return resample(pcm16_to_float32(data, channels), source_rate, target_rate)
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    """Write mono float32 samples as a 16-bit PCM WAV file."""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
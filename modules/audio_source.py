@@ -0,0 +1,273 @@
+"""
+File and stdin audio sources for headless assistant runs.
+
+Instead of a live microphone, audio can come from a WAV file, a directory of
+WAV files or a raw 16-bit mono PCM stream on stdin ("-"). Audio is split into
+utterances with a simple energy VAD and transcribed with the same
+faster-whisper profile the recorder uses.
+"""
+
+import glob
+import os
+import sys
+import time
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from modules.audio import SAMPLE_RATE, load_wav, pcm16_to_float32, resample
+from modules.data_types import UtteranceRecord
+from modules.tracing import begin_utterance, span
+from modules.wake_word import WakeWordGate
+
+STDIN_SOURCE = "-"
+FRAME_SECONDS = 0.03
+
+
+class UtteranceSegmenter:
+    """
+    Streaming energy-based VAD.
+
+    Audio is fed in arbitrary chunks; an utterance ends once `silence_seconds`
+    of frames below `threshold` RMS follow speech.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        threshold: float = 0.01,
+        silence_seconds: float = 0.8,
+        min_speech_seconds: float = 0.2,
+        max_utterance_seconds: float = 30.0,
+    ):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.frame_size = int(FRAME_SECONDS * sample_rate)
+        self.silence_frames = int(silence_seconds / FRAME_SECONDS)
+        self.min_speech_frames = max(1, int(min_speech_seconds / FRAME_SECONDS))
+        self.max_frames = int(max_utterance_seconds / FRAME_SECONDS)
+
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frames: List[np.ndarray] = []
+        self._speech_frames = 0
+        self._trailing_silence = 0
+        self._position = 0  # samples consumed so far
+        self._start = 0  # sample offset of the current utterance
+
+    def feed(self, chunk: np.ndarray) -> List[Tuple[float, np.ndarray]]:
+        """Feed samples, returning any (offset_seconds, audio) utterances completed."""
+        completed = []
+        data = np.concatenate([self._pending, chunk]) if len(self._pending) else chunk
+        usable = len(data) - len(data) % self.frame_size
+        self._pending = data[usable:]
+
+        for i in range(0, usable, self.frame_size):
+            frame = data[i : i + self.frame_size]
+            is_speech = float(np.sqrt(np.mean(frame * frame))) >= self.threshold
+
+            if not self._frames:
+                if is_speech:
+                    self._start = self._position
+                    self._frames.append(frame)
+                    self._speech_frames = 1
+                    self._trailing_silence = 0
+            else:
+                self._frames.append(frame)
+                if is_speech:
+                    self._speech_frames += 1
+                    self._trailing_silence = 0
+                else:
+                    self._trailing_silence += 1
+
+                if (
+                    self._trailing_silence >= self.silence_frames
+                    or len(self._frames) >= self.max_frames
+                ):
+                    utterance = self._finish()
+                    if utterance is not None:
+                        completed.append(utterance)
+
+            self._position += self.frame_size
+        return completed
+
+    def flush(self) -> List[Tuple[float, np.ndarray]]:
+        """Return the utterance still in progress at the end of the stream."""
+        if len(self._pending) and self._frames:
+            self._frames.append(self._pending)
+        self._position += len(self._pending)
+        self._pending = np.zeros(0, dtype=np.float32)
+        utterance = self._finish()
+        return [utterance] if utterance is not None else []
+
+    def _finish(self) -> Optional[Tuple[float, np.ndarray]]:
+        frames, speech_frames = self._frames, self._speech_frames
+        self._frames, self._speech_frames, self._trailing_silence = [], 0, 0
+        if not frames or speech_frames < self.min_speech_frames:
+            return None
+        return self._start / self.sample_rate, np.concatenate(frames)
+
+
+def wav_paths(source: str) -> List[str]:
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*.wav")))
+    if os.path.isfile(source):
+        return [source]
+    raise FileNotFoundError(f"Audio source {source} does not exist")
+
+
+def read_pcm_stream(
+    stream: BinaryIO, sample_rate: int, chunk_seconds: float = 0.5
+) -> Iterator[np.ndarray]:
+    """Read raw little-endian 16-bit mono PCM from a binary stream in chunks."""
+    chunk_bytes = int(sample_rate * chunk_seconds) * 2
+    leftover = b""
+    while True:
+        data = stream.read(chunk_bytes)
+        if not data:
+            break
+        data = leftover + data
+        usable = len(data) - len(data) % 2
+        leftover = data[usable:]
+        yield resample(pcm16_to_float32(data[:usable]), sample_rate)
+
+
+def iter_utterances(
+    source: str,
+    pcm_sample_rate: int = SAMPLE_RATE,
+    segmenter_options: Optional[Dict] = None,
+    stdin: Optional[BinaryIO] = None,
+) -> Iterator[Tuple[str, float, np.ndarray]]:
+    """Yield (origin, offset_seconds, audio) for every utterance in the source."""
+    segmenter_options = segmenter_options or {}
+
+    if source == STDIN_SOURCE:
+        stream = stdin or sys.stdin.buffer
+        segmenter = UtteranceSegmenter(**segmenter_options)
+        for chunk in read_pcm_stream(stream, pcm_sample_rate):
+            for offset, audio in segmenter.feed(chunk):
+                yield "stdin", offset, audio
+        for offset, audio in segmenter.flush():
+            yield "stdin", offset, audio
+        return
+
+    for path in wav_paths(source):
+        segmenter = UtteranceSegmenter(**segmenter_options)
+        utterances = segmenter.feed(load_wav(path)) + segmenter.flush()
+        for offset, audio in utterances:
+            yield path, offset, audio
+
+
+class WhisperTranscriber:
+    """Full transcription with a faster-whisper STT profile, loaded on first use."""
+
+    def __init__(self, profile: Dict):
+        self.profile = profile
+        self._pipeline = None
+        self._options = {}
+
+    def _load(self):
+        if self._pipeline is None:
+            from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+            model = WhisperModel(
+                self.profile["model"],
+                device="cpu",
+                compute_type=self.profile["compute_type"],
+                cpu_threads=self.profile.get("cpu_threads", 0),
+            )
+            if self.profile.get("batch_size", 0) > 0:
+                self._pipeline = BatchedInferencePipeline(model=model)
+                self._options = {"batch_size": self.profile["batch_size"]}
+            else:
+                self._pipeline = model
+        return self._pipeline
+
+    def __call__(self, audio: np.ndarray) -> str:
+        segments, _ = self._load().transcribe(
+            audio,
+            language="en",
+            beam_size=self.profile["beam_size"],
+            **self._options,
+        )
+        return " ".join(segment.text for segment in segments).strip()
+
+
+def run_audio_source(
+    source: str,
+    gate: WakeWordGate,
+    transcribe: Callable[[np.ndarray], str],
+    on_text: Callable[[str], object],
+    records_file: str,
+    realtime: bool = True,
+    pcm_sample_rate: int = SAMPLE_RATE,
+    on_record: Optional[Callable[[UtteranceRecord], None]] = None,
+    stdin: Optional[BinaryIO] = None,
+) -> int:
+    """
+    Drive an assistant from a file/stdin source instead of the microphone.
+
+    Each utterance goes through the wake-word gate, the full transcription and
+    on_text, and a timing record is appended to records_file as JSON lines.
+    With realtime=False utterances are processed as fast as possible.
+    Returns the number of utterances processed.
+    """
+    count = 0
+    current_origin = None
+    file_start = time.monotonic()
+    utterances = iter_utterances(source, pcm_sample_rate, stdin=stdin)
+
+    for index, (origin, offset, audio) in enumerate(utterances):
+        duration = len(audio) / SAMPLE_RATE
+
+        # Offsets are relative to the start of each file, so the pacing
+        # clock restarts whenever the next file begins playing
+        if origin != current_origin:
+            current_origin = origin
+            file_start = time.monotonic()
+
+        # Pace file input like a live microphone: an utterance is only
+        # available once it has been fully "spoken"
+        if realtime and source != STDIN_SOURCE:
+            wait = offset + duration - (time.monotonic() - file_start)
+            if wait > 0:
+                time.sleep(wait)
+
+        begin_utterance()
+        start = time.perf_counter()
+        with span("wake_check"):
+            detected = gate.check(audio)
+        gate_seconds = time.perf_counter() - start
+
+        text = None
+        stt_seconds = 0.0
+        processing_seconds = 0.0
+        if detected:
+            start = time.perf_counter()
+            with span("stt"):
+                text = transcribe(audio)
+            stt_seconds = time.perf_counter() - start
+            gate.stats.record_transcription(duration, stt_seconds)
+
+            start = time.perf_counter()
+            on_text(text)
+            processing_seconds = time.perf_counter() - start
+
+        record = UtteranceRecord(
+            source=origin,
+            index=index,
+            offset_seconds=round(offset, 3),
+            duration_seconds=round(duration, 3),
+            wake_word_detected=detected,
+            text=text,
+            gate_seconds=gate_seconds,
+            stt_seconds=stt_seconds,
+            processing_seconds=processing_seconds,
+            stt_rtf=stt_seconds / duration if duration else 0.0,
+        )
+        with open(records_file, "a") as f:
+            f.write(record.model_dump_json() + "\n")
+        count += 1
+        if on_record:
+            on_record(record)
+
+    return count
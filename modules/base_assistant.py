@@ -1,22 +1,21 @@
 from typing import List, Dict, Optional
 import logging
-from playwright.sync_api import sync_playwright
 import json
 from modules.api_interaction import call_api
 from modules.memory import Memory
+from modules.recall import Recall
+from modules.conversation import GeminiContentsView, MessagesView, Turn, transcript
 import os
 from modules.deepseek import get_deepseek_response, get_gemini_response, get_mistral_response
 from modules.ollama import conversational_prompt as ollama_conversational_prompt
 from modules.utils import build_file_name_session
-from RealtimeTTS import TextToAudioStream, SystemEngine
-from elevenlabs import play
-from elevenlabs.client import ElevenLabs
-import pyttsx3
 from modules.prompts import get_api_json_prompt, get_queue_task_prompt
 import time
 from modules.execute_python import execute # Changed import
 from modules.assistant_config import get_config
 from modules.data_types import Task
+from modules.echo_gate import EchoGate
+from modules.tracing import span
 
 def browse_web(
     url: str,
@@ -29,6 +28,8 @@ def browse_web(
     """
     Launches a browser, navigates to a given URL, searches for a given query, and returns the search results.
     """
+    from playwright.sync_api import sync_playwright
+
     try:
         with sync_playwright() as p:
             browser = p.chromium.launch()
@@ -68,44 +69,61 @@ class PlainAssistant:
     def __init__(self, logger: logging.Logger, session_id: str):
         self.logger = logger
         self.session_id = session_id
-        self.conversation_history = []
 
-        self.memory = Memory()
+        self.memory = Memory(session_id=session_id)
+        # Prompts carry only the most relevant earlier exchanges, not all of them
+        self.recall = Recall(self.memory)
         self.tasks: List[Task] = []
+        # Knows when/what we are speaking so our own voice can be ignored
+        self.echo_gate = EchoGate.from_config("base_assistant")
         # Get voice configuration
         self.voice_type = get_config("base_assistant.voice")
         self.elevenlabs_voice = get_config("base_assistant.elevenlabs_voice")
         self.brain = get_config("base_assistant.brain")
 
-        # Initialize appropriate TTS engine
+        # Initialize appropriate TTS engine; each backend is only imported
+        # when it is the one configured
         if self.voice_type == "local":
+            import pyttsx3
+
             self.logger.info("🔊 Initializing local TTS engine")
             self.engine = pyttsx3.init()
             self.engine.setProperty("rate", 150)  # Speed of speech
             self.engine.setProperty("volume", 1.0)  # Volume level
         elif self.voice_type == "realtime-tts":
+            from RealtimeTTS import SystemEngine, TextToAudioStream
+
             self.logger.info("🔊 Initializing RealtimeTTS engine")
             self.engine = SystemEngine()
             self.stream = TextToAudioStream(
                 self.engine, frames_per_buffer=256, playout_chunk_size=1024
             )
         elif self.voice_type == "elevenlabs":
+            from elevenlabs.client import ElevenLabs
+
             self.logger.info("🔊 Initializing ElevenLabs TTS engine")
             self.elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVEN_API_KEY"))
         else:
             raise ValueError(f"Unsupported voice type: {self.voice_type}")
 
-    def process_text(self, text: str) -> str:
+    def process_text(self, text: str, captured_at: Optional[float] = None) -> str:
         """Process text input and generate response"""
+        # Drop our own speech before any LLM or command work starts
+        if self.echo_gate.is_echo(text, captured_at):
+            self.logger.info("🤖 Ignoring own speech input")
+            return ""
+
         # Removed duplicate try block and simplified task handling
         if text.lower().startswith("queue task"):
             command = text.split(" ", 1)[1]
-            result = execute(f"python commands/template_empty.py queue-task {command}") # Changed to execute
+            with span("command_exec"):
+                result = execute(f"python commands/template_empty.py queue-task {command}") # Changed to execute
             self.logger.info(f"🤖 {result}")
             return result
         if text.lower().startswith("remove task"):
             command = text.split(" ", 1)[1]
-            result = execute(f"python commands/template_empty.py remove-task {command}") # Changed to execute
+            with span("command_exec"):
+                result = execute(f"python commands/template_empty.py remove-task {command}") # Changed to execute
             self.logger.info(f"🤖 {result}")
             return result
 
@@ -130,41 +148,32 @@ class PlainAssistant:
                 self.logger.error(f"❌ Error calling API: {str(e)}")
                 return f"An error occurred while calling the API: {str(e)}"
 
-        # Check if text matches our last response
-        if (
-            self.conversation_history
-            and text.strip().lower()
-            in self.conversation_history[-1]["content"].lower()
-        ):
-            self.logger.info("🤖 Ignoring own speech input")
-            return ""
-
-        # Add user message to conversation history
-        self.conversation_history.append({"role": "user", "content": text})
+        # Relevant earlier exchanges; each backend gets them in its own shape
+        with span("prompt_build"):
+            turns = self.recall.context_turns(text)
 
         # Generate response using configured brain
         self.logger.info(f"🤖 Processing text with {self.brain}...")
-        if self.brain.startswith("ollama:"):
-            model_no_prefix = ":".join(self.brain.split(":")[1:])
-            response = ollama_conversational_prompt(
-                self.conversation_history, model=model_no_prefix
-            )
-        elif self.brain == "deepseek":
-             response = get_deepseek_response(self.conversation_history)
-        elif self.brain == "gemini":
-            response = get_gemini_response(self.conversation_history)
-        elif self.brain == "mistral":
-            response = get_mistral_response(self.conversation_history)
-        else:
-           raise ValueError(f"Unsupported brain: {self.brain}")
+        with span("llm", model=self.brain):
+            if self.brain.startswith("ollama:"):
+                model_no_prefix = ":".join(self.brain.split(":")[1:])
+                response = ollama_conversational_prompt(
+                    MessagesView(turns, text), model=model_no_prefix
+                )
+            elif self.brain == "deepseek":
+                response = get_deepseek_response(transcript(turns, text))
+            elif self.brain == "gemini":
+                response = get_gemini_response(list(GeminiContentsView(turns, text)))
+            elif self.brain == "mistral":
+                response = get_mistral_response(transcript(turns, text))
+            else:
+                raise ValueError(f"Unsupported brain: {self.brain}")
 
         # Add assistant response to history
         if response is None:
             self.logger.error("❌ Got empty or None response from the model")
             response = "Sorry, I don't know how to respond to that."
 
-        self.conversation_history.append({"role": "assistant", "content": response})
-
         # Add interaction to memory
         self.add_to_memory(text, response)
 
@@ -179,21 +188,31 @@ class PlainAssistant:
             self.logger.info(f"🔊 Speaking: {text}")
 
             if self.voice_type == "local":
-                self.engine.say(text)
-                self.engine.runAndWait()
+                # pyttsx3 synthesizes while it plays
+                with span("playback", voice=self.voice_type), self.echo_gate.speaking(text):
+                    self.engine.say(text)
+                    self.engine.runAndWait()
 
             elif self.voice_type == "realtime-tts":
-                self.stream.feed(text)
-                self.stream.play()
+                with span("tts_synthesis", voice=self.voice_type):
+                    self.stream.feed(text)
+                with span("playback", voice=self.voice_type), self.echo_gate.speaking(text):
+                    self.stream.play()
 
             elif self.voice_type == "elevenlabs":
-                audio = self.elevenlabs_client.generate(
-                    text=text,
-                    voice=self.elevenlabs_voice,
-                    model="eleven_turbo_v2",
-                    stream=False,
-                )
-                play(audio)
+                from elevenlabs import play
+
+                with span("tts_synthesis", voice=self.voice_type):
+                    audio = b"".join(
+                        self.elevenlabs_client.generate(
+                            text=text,
+                            voice=self.elevenlabs_voice,
+                            model="eleven_turbo_v2",
+                            stream=False,
+                        )
+                    )
+                with span("playback", voice=self.voice_type), self.echo_gate.speaking(text):
+                    play(audio)
 
             self.logger.info(f"🔊 Spoken: {text}")
 
@@ -202,10 +221,10 @@ class PlainAssistant:
             raise
 
     def add_to_memory(self, user_input: str, assistant_response: str):
-        """Adds an interaction to the memory."""
-        self.memory.add_interaction(user_input, assistant_response)
+        """Adds an interaction to the memory and the recall index."""
+        self.recall.add(self.memory.add_interaction(user_input, assistant_response))
 
-    def get_conversation_history(self) -> List[Dict[str, str]]:
+    def get_conversation_history(self) -> List[Turn]:
         """Returns the conversation history."""
         return self.memory.get_conversation_history()
 
@@ -0,0 +1,217 @@
+"""
+Compact in-RAM conversation store.
+
+A turn (one user message and the assistant's reply) is a single `Turn`
+record with `__slots__`, so there's no per-turn dict and no second copy of
+the conversation in another layout. Role strings are never stored per turn:
+views over the store produce the message shape each LLM backend expects
+(OpenAI/Ollama role/content dicts, Gemini role/parts contents, or a flat
+transcript for single-prompt APIs) on the fly, referencing the same text
+objects, and share interned role constants.
+"""
+
+import sys
+import tracemalloc
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+USER = sys.intern("user")
+ASSISTANT = sys.intern("assistant")
+MODEL = sys.intern("model")  # Gemini's name for the assistant role
+
+
+class Turn:
+    __slots__ = ("id", "created_at", "user", "assistant")
+
+    def __init__(self, id: int, created_at: str, user: str, assistant: str):
+        self.id = id
+        self.created_at = created_at
+        self.user = user
+        self.assistant = assistant
+
+    def __repr__(self) -> str:
+        return f"Turn(id={self.id}, user={self.user!r}, assistant={self.assistant!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Turn):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+class ConversationStore:
+    """The most recent `maxlen` turns, oldest first (unbounded when maxlen is None)."""
+
+    def __init__(self, turns: Iterable[Turn] = (), maxlen: Optional[int] = None):
+        self._turns = deque(turns, maxlen=maxlen)
+
+    @property
+    def maxlen(self) -> Optional[int]:
+        return self._turns.maxlen
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def __iter__(self) -> Iterator[Turn]:
+        return iter(self._turns)
+
+    def __getitem__(self, index: int) -> Turn:
+        return self._turns[index]
+
+    def append(self, turn: Turn):
+        self._turns.append(turn)
+
+    def recent(self, count: int) -> List[Turn]:
+        """The last `count` turns, oldest first."""
+        if count <= 0:
+            return []
+        return list(islice(reversed(self._turns), count))[::-1]
+
+    def by_id(self, turn_ids: Iterable[int]) -> Dict[int, Turn]:
+        wanted = set(turn_ids)
+        return {turn.id: turn for turn in self._turns if turn.id in wanted}
+
+    def messages(self, prompt: Optional[str] = None) -> "MessagesView":
+        return MessagesView(self._turns, prompt)
+
+
+# -----------------------------------------------------
+# Backend views
+# -----------------------------------------------------
+class MessagesView(Sequence):
+    """
+    OpenAI/Ollama chat messages over a sequence of turns, optionally followed
+    by a new user prompt. Messages are built when accessed, not stored.
+    """
+
+    def __init__(self, turns: Sequence[Turn], prompt: Optional[str] = None):
+        self.turns = turns
+        self.prompt = prompt
+
+    def __len__(self) -> int:
+        return 2 * len(self.turns) + (self.prompt is not None)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index == 2 * len(self.turns):
+            return self._message(USER, self.prompt)
+        turn = self.turns[index // 2]
+        if index % 2:
+            return self._message(ASSISTANT, turn.assistant)
+        return self._message(USER, turn.user)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for turn in self.turns:
+            yield self._message(USER, turn.user)
+            yield self._message(ASSISTANT, turn.assistant)
+        if self.prompt is not None:
+            yield self._message(USER, self.prompt)
+
+    def _message(self, role: str, text: str) -> Dict:
+        return {"role": role, "content": text}
+
+
+class GeminiContentsView(MessagesView):
+    """Gemini `contents`: role user/model with the text in `parts`."""
+
+    def _message(self, role: str, text: str) -> Dict:
+        return {"role": MODEL if role is ASSISTANT else role, "parts": [text]}
+
+
+def transcript(turns: Iterable[Turn], prompt: Optional[str] = None) -> str:
+    """Flat text for backends that take a single prompt string."""
+    lines = []
+    for turn in turns:
+        lines.append(f"{USER}: {turn.user}")
+        lines.append(f"{ASSISTANT}: {turn.assistant}")
+    if prompt is not None:
+        lines.append(f"{USER}: {prompt}")
+    return "\n".join(lines)
+
+
+# -----------------------------------------------------
+# Footprint measurement
+# -----------------------------------------------------
+def _traced_bytes(build) -> int:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def _sample_texts(turns: int):
+    for i in range(turns):
+        yield f"question number {i} about the firewall", f"answer number {i} from the assistant"
+
+
+def legacy_layout_bytes(turns: int = 10_000) -> int:
+    """
+    The previous layout: PlainAssistant's role/content dict list plus
+    Memory's user/assistant dict list, both referencing the same strings.
+    """
+
+    def build():
+        history, interactions = [], []
+        for user, assistant in _sample_texts(turns):
+            history.append({"role": "user", "content": user})
+            history.append({"role": "assistant", "content": assistant})
+            interactions.append({"user": user, "assistant": assistant})
+        return history, interactions
+
+    return _traced_bytes(build)
+
+
+class _DictTurn:
+    """Turn without __slots__, to measure what the slots save."""
+
+    def __init__(self, id: int, created_at: str, user: str, assistant: str):
+        self.id = id
+        self.created_at = created_at
+        self.user = user
+        self.assistant = assistant
+
+
+def store_layout_bytes(turns: int = 10_000, slots: bool = True) -> int:
+    """The same turns in one ConversationStore of Turn records (with their timestamps)."""
+    record = Turn if slots else _DictTurn
+
+    def build():
+        store = ConversationStore()
+        for i, (user, assistant) in enumerate(_sample_texts(turns)):
+            store.append(record(i, f"2025-01-01T00:00:00.{i:06d}", user, assistant))
+        return store
+
+    return _traced_bytes(build)
+
+
+def footprint_report(turns: int = 10_000) -> Dict[str, int]:
+    """Traced bytes for `turns` turns in each layout."""
+    return {
+        "turns": turns,
+        "legacy": legacy_layout_bytes(turns),
+        "store_without_slots": store_layout_bytes(turns, slots=False),
+        "store": store_layout_bytes(turns),
+    }
+
+
+def format_footprint(result: Dict[str, int]) -> str:
+    legacy = result["legacy"]
+    lines = [f"{result['turns']:,} turns:"]
+    for name, label in (
+        ("legacy", "role/content + interaction dicts"),
+        ("store_without_slots", "ConversationStore, Turn without __slots__"),
+        ("store", "ConversationStore, Turn with __slots__"),
+    ):
+        size = result[name]
+        lines.append(f"  {label:<42} {size / 1024:>9,.0f} KiB ({size / legacy:.0%} of legacy)")
+    return "\n".join(lines)
@@ -12,3 +12,16 @@ class Task(BaseModel):
     priority: int
     delay: int
     task_id: Optional[str] = Field(default=None)
+
+
+class UtteranceRecord(BaseModel):
+    source: str
+    index: int
+    offset_seconds: float
+    duration_seconds: float
+    wake_word_detected: bool
+    text: Optional[str] = Field(default=None)
+    gate_seconds: float
+    stt_seconds: float
+    processing_seconds: float
+    stt_rtf: float
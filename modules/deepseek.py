@@ -1,9 +1,8 @@
-from openai import OpenAI, AzureOpenAI
 import os
 import json
 from dotenv import load_dotenv
 from typing import List, Dict
-import google.generativeai as genai
+from modules.tracing import mark
 # You might need to import a specific client for Mistral if not using the OpenAI compatible API
 # from mistralai.client import MistralClient
 
@@ -11,11 +10,14 @@ import google.generativeai as genai
 load_dotenv()
 
 # This function will get the appropriate client based on the model name
+# SDKs are imported per provider so only the one in use is loaded
 def get_llm_client(model_name: str):
     if "deepseek" in model_name:
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
             raise Exception("DEEPSEEK_API_KEY not found in environment variables")
+        from openai import OpenAI
+
         return OpenAI(
             api_key=api_key, base_url="https://api.deepseek.com/beta"
         )
@@ -24,6 +26,8 @@ def get_llm_client(model_name: str):
         azure_endpoint = os.getenv("AZURE_ENDPOINT")
         if not api_key or not azure_endpoint:
              raise Exception("AZURE_API_KEY or AZURE_ENDPOINT not found in environment variables")
+        from openai import AzureOpenAI
+
         return AzureOpenAI(
                 api_key = api_key,
                 api_version = os.getenv("AZURE_API_VERSION"), # Ensure AZURE_API_VERSION is also in .env
@@ -33,6 +37,8 @@ def get_llm_client(model_name: str):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise Exception("GEMINI_API_KEY not found in environment variables")
+        import google.generativeai as genai
+
         # Configure genai globally if not already, though ideally this would be part of client getting if possible
         genai.configure(api_key=api_key)
         return genai
@@ -42,6 +48,8 @@ def get_llm_client(model_name: str):
             raise Exception("MISTRAL_API_KEY not found in environment variables")
         # Assuming Mistral might use an OpenAI compatible API for chat completions
         # If not, you'll need to use the specific Mistral client library
+        from openai import OpenAI
+
         return OpenAI(api_key=api_key, base_url="https://api.mistral.ai/v1") # Example base_url for Mistral
     # Add other models here as needed
     else:
@@ -58,16 +66,38 @@ def get_llm_client(model_name: str):
 DEFAULT_MODEL = "deepseek-chat" # Consider making this configurable
 
 
+def collect_stream(chunks) -> str:
+    """Join streamed text chunks, marking time-to-first-token on the active trace span."""
+    parts = []
+    for text in chunks:
+        if text:
+            mark("first_token")
+            parts.append(text)
+    return "".join(parts)
+
+
+def _openai_stream_text(stream):
+    for chunk in stream:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content
+
+
+def _gemini_stream_text(stream):
+    for chunk in stream:
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            yield chunk.candidates[0].content.parts[0].text
+
+
 def get_deepseek_response(prompt: str, model: str = "deepseek-chat") -> str:
     """
     Send a prompt to a Deepseek model and get response.
     """
     try:
         client = get_llm_client(model)
-        response = client.chat.completions.create(
-            model=model, messages=[{"role": "user", "content": prompt}]
+        stream = client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}], stream=True
         )
-        return response.choices[0].message.content
+        return collect_stream(_openai_stream_text(stream))
     except Exception as e:
         raise Exception(f"Error in Deepseek prompt: {str(e)}")
 
@@ -83,11 +113,8 @@ def get_gemini_response(prompt: str, model: str = "gemini-pro") -> str:
         # For Gemini, we get the genai module and then the model
         genai_module = get_llm_client(model)
         gemini_model_instance = genai_module.GenerativeModel(model)
-        response = gemini_model_instance.generate_content(prompt)
-        if response.candidates:
-            return response.candidates[0].content.parts[0].text
-        else:
-            return ""
+        stream = gemini_model_instance.generate_content(prompt, stream=True)
+        return collect_stream(_gemini_stream_text(stream))
     except Exception as e:
         raise Exception(f"Error in Gemini prompt: {str(e)}")
 
@@ -99,10 +126,10 @@ def get_mistral_response(prompt: str, model: str = "mistral-tiny") -> str:
         client = get_llm_client(model)
         # Assuming Mistral uses a similar chat completions API to OpenAI
         # If not, replace with the correct Mistral API call
-        response = client.chat.completions.create(
-            model=model, messages=[{"role": "user", "content": prompt}]
+        stream = client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}], stream=True
         )
-        return response.choices[0].message.content
+        return collect_stream(_openai_stream_text(stream))
     except Exception as e:
         raise Exception(f"Error in Mistral prompt: {str(e)}")
 
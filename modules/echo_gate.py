@@ -0,0 +1,134 @@
+"""
+Playback-aware echo suppression.
+
+The assistant knows when it is speaking and what it is saying. Anything the
+microphone captures while it speaks, or within a short tail afterwards, is
+compared against the spoken text and dropped before any LLM or command work
+when it looks like the assistant hearing itself.
+"""
+
+import difflib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from modules.assistant_config import get_config
+
+DEFAULT_ECHO_GATE_CONFIG = {
+    "tail_seconds": 1.5,
+    "threshold": 0.6,
+    "mode": "match",  # match: drop fuzzy matches in the window, suppress: drop everything
+}
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def echo_similarity(heard: str, spoken: str) -> float:
+    """
+    Fraction of the heard words that appear, in order, in the spoken text.
+
+    Echoes are usually a fragment of what was said, so this measures how much
+    of the heard text is covered by the spoken text rather than overall equality.
+    """
+    heard_words = _words(heard)
+    spoken_words = _words(spoken)
+    if not heard_words or not spoken_words:
+        return 0.0
+    matcher = difflib.SequenceMatcher(None, heard_words, spoken_words, autojunk=False)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    return matched / len(heard_words)
+
+
+class EchoGate:
+    def __init__(
+        self,
+        tail_seconds: float = 1.5,
+        threshold: float = 0.6,
+        mode: str = "match",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if mode not in ("match", "suppress"):
+            raise ValueError(f"Unsupported echo gate mode: {mode}")
+        self.tail_seconds = tail_seconds
+        self.threshold = threshold
+        self.mode = mode
+        self.clock = clock
+        self.suppressed = 0
+
+        self._lock = threading.Lock()
+        self._speaking_text: Optional[str] = None
+        self._speaking_since: Optional[float] = None
+        self._last_text: Optional[str] = None
+        self._last_start: Optional[float] = None
+        self._last_end: Optional[float] = None
+        self._capture_started: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, section: str) -> "EchoGate":
+        """Build a gate from `<section>.echo_gate` in assistant_config.yml."""
+        gate_config = dict(DEFAULT_ECHO_GATE_CONFIG)
+        try:
+            gate_config.update(get_config(f"{section}.echo_gate") or {})
+        except KeyError:
+            pass
+        return cls(
+            tail_seconds=float(gate_config["tail_seconds"]),
+            threshold=float(gate_config["threshold"]),
+            mode=gate_config["mode"],
+        )
+
+    @contextmanager
+    def speaking(self, text: str):
+        """Mark the assistant as speaking `text` for the duration of the block."""
+        with self._lock:
+            self._speaking_text = text
+            self._speaking_since = self.clock()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._last_text = self._speaking_text
+                self._last_start = self._speaking_since
+                self._last_end = self.clock()
+                self._speaking_text = None
+                self._speaking_since = None
+
+    def mark_capture(self):
+        """Recorder callback (on_recording_start): remember when capture began."""
+        with self._lock:
+            self._capture_started = self.clock()
+
+    def _window_text(self, captured_at: float) -> Optional[str]:
+        """Spoken text whose playback window (plus tail) covers captured_at."""
+        if self._speaking_text is not None:
+            return self._speaking_text
+        if self._last_end is None:
+            return None
+        if self._last_start <= captured_at <= self._last_end + self.tail_seconds:
+            return self._last_text
+        # Capture started before playback but ended during/after it
+        if captured_at < self._last_start and self.clock() <= self._last_end + self.tail_seconds:
+            return self._last_text
+        return None
+
+    def is_echo(self, text: str, captured_at: Optional[float] = None) -> bool:
+        """Return True when text should be dropped as the assistant's own speech."""
+        with self._lock:
+            if captured_at is None:
+                captured_at = self._capture_started
+                self._capture_started = None
+            if captured_at is None:
+                captured_at = self.clock()
+
+            spoken = self._window_text(captured_at)
+            if spoken is None:
+                return False
+
+            echo = self.mode == "suppress" or echo_similarity(text, spoken) >= self.threshold
+            if echo:
+                self.suppressed += 1
+            return echo
@@ -1,16 +1,283 @@
+"""
+Persistent assistant memory.
+
+Turns and user preferences live in an SQLite store, so an always-on assistant
+keeps its memory across restarts. Only the most recent turns are held in RAM,
+in a ring buffer, so memory stays bounded however long a session runs. Writes
+are queued and committed in batches by a background thread; add_interaction
+and set_user_preference don't wait on the disk, except that every
+MEMORY_ID_BLOCK turns a block of ids is reserved in the store, so several
+Memory instances (or processes) can share one database.
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Union
+
+from modules.conversation import ConversationStore, Turn
+from modules.utils import build_file_path
+
+MEMORY_DB = "memory.db"
+MEMORY_BUFFER_TURNS = 200
+MEMORY_BATCH_SIZE = 100
+MEMORY_FLUSH_SECONDS = 0.5
+MEMORY_QUEUE_MAX = 10000
+MEMORY_ID_BLOCK = 1000
+MEMORY_SCHEMA_VERSION = 2
+
+MEMORY_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS turns (
+        id INTEGER PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        session_id TEXT,
+        user TEXT NOT NULL,
+        assistant TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_turns_created_at ON turns (created_at)",
+    """CREATE TABLE IF NOT EXISTS preferences (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at TEXT NOT NULL
+    ) WITHOUT ROWID""",
+    # Next unreserved turn id; each instance takes ids in blocks from here
+    """CREATE TABLE IF NOT EXISTS id_blocks (
+        name TEXT PRIMARY KEY,
+        next_id INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+]
+
+WRITE_SQL = {
+    "turn": "INSERT INTO turns (id, created_at, session_id, user, assistant) VALUES (?, ?, ?, ?, ?)",
+    "preference": "INSERT INTO preferences (key, value, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _timestamp(value: Union[datetime, str]) -> str:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
 class Memory:
-    def __init__(self):
-        self.conversation_history = []
-        self.user_preferences = {}
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        session_id: Optional[str] = None,
+        buffer_size: int = MEMORY_BUFFER_TURNS,
+        batch_size: int = MEMORY_BATCH_SIZE,
+        flush_seconds: float = MEMORY_FLUSH_SECONDS,
+    ):
+        self.path = path or build_file_path(MEMORY_DB)
+        self.session_id = session_id
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+
+        self._lock = threading.Lock()
+        self._reader = self._connect(check_same_thread=False)
+        with self._reader:
+            for statement in MEMORY_SCHEMA:
+                self._reader.execute(statement)
+            self._reader.execute(f"PRAGMA user_version = {MEMORY_SCHEMA_VERSION}")
+
+        # Restarts only read the newest turns and the (small) preference table
+        recent = self._reader.execute(
+            "SELECT id, created_at, user, assistant FROM turns "
+            "ORDER BY created_at DESC, id DESC LIMIT ?",
+            (buffer_size,),
+        ).fetchall()
+        self.conversation_history = ConversationStore(
+            (Turn(*row) for row in reversed(recent)), maxlen=buffer_size
+        )
+        # Ids are assigned here rather than by the (asynchronous) insert so
+        # callers such as the recall index can refer to a turn right away
+        self._next_id = self._block_end = 0
+        self.user_preferences = dict(
+            self._reader.execute("SELECT key, value FROM preferences")
+        )
 
-    def add_interaction(self, user_input: str, assistant_response: str):
-        self.conversation_history.append({"user": user_input, "assistant": assistant_response})
+        self._queue = queue.Queue(maxsize=MEMORY_QUEUE_MAX)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
 
-    def get_conversation_history(self):
-        return self.conversation_history
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    # -----------------------------------------------------
+    # Public API
+    # -----------------------------------------------------
+    def add_interaction(self, user_input: str, assistant_response: str) -> Turn:
+        """Record a turn and return it (with its id already assigned)."""
+        if self._next_id >= self._block_end:
+            self._reserve_ids()
+        turn = Turn(self._next_id, datetime.now().isoformat(), user_input, assistant_response)
+        self._next_id += 1
+        self.conversation_history.append(turn)
+        self._queue.put(
+            ("turn", (turn.id, turn.created_at, self.session_id, turn.user, turn.assistant))
+        )
+        return turn
+
+    def get_conversation_history(self) -> List[Turn]:
+        """The most recent turns (up to buffer_size), oldest first."""
+        return list(self.conversation_history)
 
     def set_user_preference(self, key: str, value: str):
         self.user_preferences[key] = value
+        self._queue.put(("preference", (key, value, datetime.now().isoformat())))
 
     def get_user_preference(self, key: str):
-        return self.user_preferences.get(key)
\ No newline at end of file
+        return self.user_preferences.get(key)
+
+    def history(
+        self,
+        since: Union[datetime, str, None] = None,
+        until: Union[datetime, str, None] = None,
+        limit: Optional[int] = None,
+    ) -> List[Turn]:
+        """All stored turns with since <= created_at < until, oldest first."""
+        self.flush()
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(_timestamp(until))
+        sql = "SELECT id, created_at, user, assistant FROM turns"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._reader.execute(sql, params).fetchall()
+        return [Turn(*row) for row in rows]
+
+    def get_turns(self, turn_ids: List[int]) -> List[Turn]:
+        """Turns by id, in the order given; recent ones come from the ring buffer."""
+        found = self.conversation_history.by_id(turn_ids)
+        missing = [turn_id for turn_id in turn_ids if turn_id not in found]
+        if missing:
+            self.flush()
+            placeholders = ", ".join("?" * len(missing))
+            with self._lock:
+                rows = self._reader.execute(
+                    "SELECT id, created_at, user, assistant FROM turns "
+                    f"WHERE id IN ({placeholders})",
+                    missing,
+                ).fetchall()
+            found.update((row[0], Turn(*row)) for row in rows)
+        return [found[turn_id] for turn_id in turn_ids if turn_id in found]
+
+    def count_turns(self) -> int:
+        """Number of stored turns, including ones still queued."""
+        self.flush()
+        with self._lock:
+            return self._reader.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    def iter_turns(self, after_id: int = 0, batch_size: int = 5000):
+        """Yield every stored turn with id > after_id, reading in id-ordered pages."""
+        self.flush()
+        while True:
+            with self._lock:
+                rows = self._reader.execute(
+                    "SELECT id, created_at, user, assistant FROM turns "
+                    "WHERE id > ? ORDER BY id LIMIT ?",
+                    (after_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield Turn(*row)
+            after_id = rows[-1][0]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far is committed."""
+        if not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self):
+        """Commit pending writes and stop the writer thread."""
+        atexit.unregister(self.close)
+        if self._writer.is_alive():
+            self._queue.put(("stop", None))
+            self._writer.join()
+        with self._lock:
+            self._reader.close()
+
+    def _reserve_ids(self):
+        """Take the next MEMORY_ID_BLOCK ids; the UPDATE is atomic across connections."""
+        with self._lock, self._reader:
+            self._reader.execute(
+                "INSERT OR IGNORE INTO id_blocks (name, next_id) VALUES ('turns', 1)"
+            )
+            # MAX(id) covers rows written before id_blocks existed
+            end = self._reader.execute(
+                "UPDATE id_blocks SET next_id = "
+                "MAX(next_id, (SELECT COALESCE(MAX(id), 0) + 1 FROM turns)) + ? "
+                "WHERE name = 'turns' RETURNING next_id",
+                (MEMORY_ID_BLOCK,),
+            ).fetchone()[0]
+        self._next_id, self._block_end = end - MEMORY_ID_BLOCK, end
+
+    # -----------------------------------------------------
+    # Background writer
+    # -----------------------------------------------------
+    def _next_batch(self) -> list:
+        """Block for one item, then gather more until batch_size or flush_seconds."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        # A flush or stop request ends the batch so it is answered right away
+        while len(batch) < self.batch_size and batch[-1][0] in ("turn", "preference"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        conn = self._connect()
+        running = True
+        while running:
+            batch = self._next_batch()
+            items = [(kind, payload) for kind, payload in batch if kind in WRITE_SQL]
+            try:
+                with conn:
+                    for kind in WRITE_SQL:
+                        rows = [payload for item_kind, payload in items if item_kind == kind]
+                        if rows:
+                            conn.executemany(WRITE_SQL[kind], rows)
+            except sqlite3.Error:
+                # Retry one by one so a bad row doesn't take the rest of the batch with it
+                for kind, payload in items:
+                    try:
+                        with conn:
+                            conn.execute(WRITE_SQL[kind], payload)
+                    except sqlite3.Error as e:
+                        logger.error(f"❌ Memory {kind} write failed: {e}")
+
+            for kind, payload in batch:
+                if kind == "flush":
+                    payload.set()
+                elif kind == "stop":
+                    running = False
+        conn.close()
@@ -1,5 +1,5 @@
-from ollama import chat
 from typing import List, Dict
+from modules.tracing import mark
 
 
 def conversational_prompt(
@@ -18,15 +18,19 @@ def conversational_prompt(
     Returns:
         str: The model's response
     """
+    from ollama import chat
+
     try:
         # Add system prompt as first message
         full_messages = [{"role": "system", "content": system_prompt}, *messages]
 
-        response = chat(
-            model=model,
-            messages=full_messages,
-        )
-        return response.message.content
+        # Stream so the time-to-first-token can be traced
+        parts = []
+        for chunk in chat(model=model, messages=full_messages, stream=True):
+            if chunk.message.content:
+                mark("first_token")
+                parts.append(chunk.message.content)
+        return "".join(parts)
 
     except Exception as e:
         raise Exception(f"Error in conversational prompt: {str(e)}")
@@ -0,0 +1,264 @@
+"""
+Relevant-memory recall over past interactions.
+
+Every stored turn is embedded into a fixed-size vector and kept in a NumPy
+matrix. At prompt time the user's text is embedded the same way and the k
+turns with the highest cosine similarity are injected instead of the whole
+history. The default embedder is a hashing vectorizer over words and word
+pairs, so nothing has to be downloaded; any callable mapping a list of texts
+to an (n, dim) array can be plugged in instead.
+
+The matrix is saved next to the memory store, so a restart only embeds the
+turns added since the last save.
+"""
+
+import atexit
+import os
+import re
+import time
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from modules.conversation import Turn
+from modules.memory import Memory
+from modules.utils import percentile
+
+RECALL_DIM = 256
+RECALL_TOP_K = 3
+RECALL_MIN_SCORE = 0.2
+RECALL_RECENT_TURNS = 1
+RECALL_BATCH_SIZE = 5000
+
+# An embedder turns a batch of texts into an (n, dim) float32 array.
+Embedder = Callable[[List[str]], np.ndarray]
+
+
+def tokens(text: str) -> List[str]:
+    """Words plus adjacent word pairs, so some word order survives hashing."""
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def turn_text(turn: Turn) -> str:
+    return f"{turn.user}\n{turn.assistant}"
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of tokens into `dim` buckets.
+
+    crc32 is used instead of hash() because Python salts str hashes per
+    process, which would invalidate saved vectors on every restart.
+    """
+
+    def __init__(self, dim: int = RECALL_DIM):
+        self.dim = dim
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokens(text):
+                h = zlib.crc32(token.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return normalize_rows(vectors)
+
+
+class VectorIndex:
+    """
+    Unit-length vectors in a preallocated matrix with top-k cosine search.
+
+    The matrix doubles when full, so appends are amortised O(1) and never
+    copy the whole index per turn.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    @property
+    def max_id(self) -> int:
+        return int(self._ids[: self._size].max()) if self._size else 0
+
+    def add(self, ids: List[int], vectors: np.ndarray):
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        needed = self._size + len(vectors)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[: self._size] = self._vectors[: self._size]
+            grown_ids = np.zeros(capacity, dtype=np.int64)
+            grown_ids[: self._size] = self._ids[: self._size]
+            self._vectors, self._ids = grown, grown_ids
+        self._vectors[self._size : needed] = vectors
+        self._ids[self._size : needed] = ids
+        self._size = needed
+
+    def search(self, query: np.ndarray, k: int = RECALL_TOP_K) -> List[Tuple[int, float]]:
+        """(id, cosine similarity) of the k closest vectors, best first."""
+        if not self._size or k <= 0:
+            return []
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, self.dim))[0]
+        scores = self._vectors[: self._size] @ query
+        k = min(k, self._size)
+        # argpartition finds the top k in O(n); only those k are sorted
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(self._ids[i]), float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        tmp_path = f"{path}.part.npz"
+        np.savez(tmp_path, vectors=self._vectors[: self._size], ids=self._ids[: self._size])
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorIndex":
+        with np.load(path) as data:
+            vectors, ids = data["vectors"], data["ids"]
+        index = cls(vectors.shape[1], capacity=max(1024, len(vectors)))
+        index._vectors[: len(vectors)] = vectors
+        index._ids[: len(ids)] = ids
+        index._size = len(vectors)
+        return index
+
+
+class Recall:
+    """Keeps a VectorIndex in step with a Memory and picks turns for the prompt."""
+
+    def __init__(
+        self,
+        memory: Memory,
+        embedder: Optional[Embedder] = None,
+        k: int = RECALL_TOP_K,
+        min_score: float = RECALL_MIN_SCORE,
+        path: Optional[str] = None,
+    ):
+        self.memory = memory
+        self.embedder = embedder or HashingEmbedder()
+        self.k = k
+        self.min_score = min_score
+        self.path = path or f"{memory.path}.recall.npz"
+
+        dim = self.embedder(["probe"]).shape[1]
+        self.index = None
+        if os.path.exists(self.path):
+            try:
+                self.index = VectorIndex.load(self.path)
+            except (OSError, ValueError, KeyError):
+                self.index = None
+        if self.index is None or self.index.dim != dim:
+            self.index = VectorIndex(dim)
+        self.sync()
+        atexit.register(self.save)
+
+    def sync(self) -> int:
+        """Embed stored turns missing from the index; returns how many were added."""
+        added = self._add_all(self.memory.iter_turns(after_id=self.index.max_id))
+        # Memory instances sharing the store take ids in blocks, so another
+        # one may have written turns below max_id; only then is everything scanned
+        if self.memory.count_turns() > len(self.index):
+            known = set(self.index.ids.tolist())
+            added += self._add_all(t for t in self.memory.iter_turns() if t.id not in known)
+        return added
+
+    def _add_all(self, turns: Iterable[Turn]) -> int:
+        added = 0
+        batch = []
+        for turn in turns:
+            batch.append(turn)
+            if len(batch) >= RECALL_BATCH_SIZE:
+                added += self._add(batch)
+                batch = []
+        if batch:
+            added += self._add(batch)
+        return added
+
+    def _add(self, turns: List[Turn]) -> int:
+        self.index.add([t.id for t in turns], self.embedder([turn_text(t) for t in turns]))
+        return len(turns)
+
+    def add(self, turn: Turn):
+        self._add([turn])
+
+    def relevant(self, text: str, k: Optional[int] = None, exclude: Tuple[int, ...] = ()) -> List[Turn]:
+        """The k stored turns most similar to text, best first."""
+        k = self.k if k is None else k
+        hits = self.index.search(self.embedder([text])[0], k + len(exclude))
+        ids = [i for i, score in hits if score >= self.min_score and i not in exclude][:k]
+        return self.memory.get_turns(ids)
+
+    def context_turns(self, text: str, recent: int = RECALL_RECENT_TURNS) -> List[Turn]:
+        """
+        Turns for a prompt about text: the k most relevant earlier exchanges
+        plus the last `recent` ones (so follow-up questions keep their
+        context), oldest first.
+        """
+        latest = self.memory.conversation_history.recent(recent)
+        recalled = self.relevant(text, exclude=tuple(t.id for t in latest))
+        return sorted(recalled + latest, key=lambda t: t.id)
+
+    def save(self):
+        self.index.save(self.path)
+
+    def close(self):
+        """Save the index; it is also saved at exit if close is never called."""
+        atexit.unregister(self.save)
+        self.save()
+
+
+# -----------------------------------------------------
+# Benchmark
+# -----------------------------------------------------
+def benchmark_search(
+    turns: int, dim: int = RECALL_DIM, k: int = RECALL_TOP_K, queries: int = 50, seed: int = 0
+) -> Dict:
+    """
+    Search latency over an index of `turns` random unit vectors.
+
+    Random vectors stand in for embedded turns: search cost only depends on
+    the matrix shape, and embedding a million texts would dominate the run.
+    """
+    rng = np.random.default_rng(seed)
+    index = VectorIndex(dim, capacity=turns)
+    for start in range(0, turns, RECALL_BATCH_SIZE * 20):
+        count = min(RECALL_BATCH_SIZE * 20, turns - start)
+        index.add(np.arange(start, start + count), rng.standard_normal((count, dim), dtype=np.float32))
+
+    latencies = []
+    for query in rng.standard_normal((queries, dim), dtype=np.float32):
+        start = time.perf_counter()
+        index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "turns": turns,
+        "dim": dim,
+        "k": k,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "index_mb": index._vectors.nbytes / (1024 * 1024),
+    }
+
+
+def format_benchmark(result: Dict) -> str:
+    return (
+        f"{result['turns']:>9,} turns dim={result['dim']} k={result['k']}: "
+        f"p50 {result['p50_ms']:.2f}ms p95 {result['p95_ms']:.2f}ms "
+        f"index {result['index_mb']:.0f}MB"
+    )
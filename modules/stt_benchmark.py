@@ -0,0 +1,197 @@
+"""
+Benchmark faster-whisper STT profiles over recorded WAV fixtures.
+
+A fixture directory holds `<name>.wav` files with a `<name>.txt` reference
+transcript next to each. Every profile in the grid runs in a fresh child
+process so that its peak RSS is measured on its own.
+"""
+
+import glob
+import itertools
+import os
+import re
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+from modules.audio import SAMPLE_RATE, load_wav
+from modules.utils import percentile
+
+
+def normalize_transcript(text: str) -> List[str]:
+    """Lowercase and strip punctuation so WER only counts word differences."""
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_edit_distance(reference: List[str], hypothesis: List[str]) -> int:
+    """Levenshtein distance over words (substitutions, insertions, deletions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1]
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref_words = normalize_transcript(reference)
+    hyp_words = normalize_transcript(hypothesis)
+    if not ref_words:
+        return 0.0 if not hyp_words else 1.0
+    return word_edit_distance(ref_words, hyp_words) / len(ref_words)
+
+
+def find_fixtures(directory: str) -> List[Tuple[str, str]]:
+    """Return (wav_path, reference_text) pairs for every WAV with a transcript."""
+    fixtures = []
+    for wav_path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        transcript_path = os.path.splitext(wav_path)[0] + ".txt"
+        if not os.path.exists(transcript_path):
+            continue
+        with open(transcript_path, "r") as f:
+            fixtures.append((wav_path, f.read().strip()))
+    return fixtures
+
+
+def build_grid(
+    models: List[str],
+    beam_sizes: List[int],
+    compute_types: List[str],
+    cpu_threads: List[int],
+    batch_sizes: List[int],
+) -> List[Dict]:
+    return [
+        {
+            "model": model,
+            "beam_size": beam_size,
+            "compute_type": compute_type,
+            "cpu_threads": threads,
+            "batch_size": batch_size,
+        }
+        for model, beam_size, compute_type, threads, batch_size in itertools.product(
+            models, beam_sizes, compute_types, cpu_threads, batch_sizes
+        )
+    ]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def run_profile(profile: Dict, fixtures: List[Tuple[str, str]]) -> Dict:
+    """Transcribe every fixture with one profile. Meant to run in a child process."""
+    from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+    load_start = time.perf_counter()
+    model = WhisperModel(
+        profile["model"],
+        device="cpu",
+        compute_type=profile["compute_type"],
+        cpu_threads=profile["cpu_threads"],
+    )
+    # RealtimeSTT switches to the batched pipeline when batch_size > 0
+    if profile["batch_size"] > 0:
+        pipeline = BatchedInferencePipeline(model=model)
+        options = {"batch_size": profile["batch_size"]}
+    else:
+        pipeline = model
+        options = {}
+    load_seconds = time.perf_counter() - load_start
+
+    def transcribe(audio):
+        segments, _ = pipeline.transcribe(
+            audio, language="en", beam_size=profile["beam_size"], **options
+        )
+        return " ".join(segment.text for segment in segments).strip()
+
+    audios = [(load_wav(path), reference) for path, reference in fixtures]
+
+    # Warm-up pass so the first fixture doesn't pay for lazy initialisation
+    transcribe(audios[0][0])
+
+    latencies = []
+    audio_seconds = 0.0
+    edits = 0
+    reference_words = 0
+    for audio, reference in audios:
+        start = time.perf_counter()
+        hypothesis = transcribe(audio)
+        latencies.append(time.perf_counter() - start)
+        audio_seconds += len(audio) / SAMPLE_RATE
+
+        ref_words = normalize_transcript(reference)
+        edits += word_edit_distance(ref_words, normalize_transcript(hypothesis))
+        reference_words += len(ref_words)
+
+    return {
+        **profile,
+        "files": len(audios),
+        "load_seconds": load_seconds,
+        "mean_latency": sum(latencies) / len(latencies),
+        "p95_latency": percentile(latencies, 95),
+        "rtf": sum(latencies) / audio_seconds if audio_seconds else 0.0,
+        "wer": edits / reference_words if reference_words else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(
+    fixtures: List[Tuple[str, str]], grid: List[Dict], on_result=None
+) -> List[Dict]:
+    """Run every profile in its own spawned process and collect the results."""
+    results = []
+    for profile in grid:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            try:
+                result = pool.submit(run_profile, profile, fixtures).result()
+            except Exception as e:
+                result = {**profile, "error": str(e)}
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return results
+
+
+def select_best_profile(
+    results: List[Dict], wer_tolerance: float = 0.02, max_rtf: Optional[float] = None
+) -> Optional[Dict]:
+    """
+    Pick the fastest profile whose WER is within wer_tolerance of the most
+    accurate profile (and, optionally, fast enough to keep up in real time).
+    """
+    candidates = [r for r in results if "error" not in r]
+    if max_rtf is not None:
+        candidates = [r for r in candidates if r["rtf"] <= max_rtf]
+    if not candidates:
+        return None
+
+    best_wer = min(r["wer"] for r in candidates)
+    accurate = [r for r in candidates if r["wer"] <= best_wer + wer_tolerance]
+    return min(accurate, key=lambda r: (r["mean_latency"], r["peak_rss_mb"]))
+
+
+def format_result(result: Dict) -> str:
+    name = (
+        f"{result['model']:<16} beam={result['beam_size']:<2} "
+        f"{result['compute_type']:<8} threads={result['cpu_threads']:<2} "
+        f"batch={result['batch_size']:<3}"
+    )
+    if "error" in result:
+        return f"{name} ❌ {result['error']}"
+    return (
+        f"{name} rtf={result['rtf']:.3f} latency={result['mean_latency']:.2f}s "
+        f"(p95 {result['p95_latency']:.2f}s) wer={result['wer']:.3f} "
+        f"rss={result['peak_rss_mb']:.0f}MB"
+    )
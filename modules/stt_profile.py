@@ -0,0 +1,50 @@
+import os
+from typing import Dict
+
+from modules.assistant_config import get_config, set_config
+
+# The values awaken() used to hard-code, kept as the fallback profile
+DEFAULT_STT_PROFILE = {
+    "model": "tiny.en",
+    "beam_size": 8,
+    "batch_size": 25,
+    "compute_type": "float32",
+    "cpu_threads": 0,  # 0 = let CTranslate2 decide
+    "post_speech_silence_duration": 1.5,
+}
+
+
+def get_stt_profile(section: str) -> Dict:
+    """Load `<section>.stt_profile` from assistant_config.yml merged over the defaults."""
+    profile = dict(DEFAULT_STT_PROFILE)
+    try:
+        profile.update(get_config(f"{section}.stt_profile") or {})
+    except KeyError:
+        pass
+    return profile
+
+
+def save_stt_profile(section: str, profile: Dict):
+    """Write a (benchmarked) profile back into assistant_config.yml."""
+    merged = get_stt_profile(section)
+    merged.update({key: profile[key] for key in DEFAULT_STT_PROFILE if key in profile})
+    set_config(f"{section}.stt_profile", merged)
+
+
+def recorder_options(profile: Dict) -> Dict:
+    """
+    Map a profile onto AudioToTextRecorder keyword arguments.
+
+    RealtimeSTT does not expose a thread count, so cpu_threads is applied via
+    OMP_NUM_THREADS, which CTranslate2 reads when the transcription worker starts.
+    """
+    if profile.get("cpu_threads"):
+        os.environ["OMP_NUM_THREADS"] = str(profile["cpu_threads"])
+
+    return {
+        "model": profile["model"],
+        "beam_size": profile["beam_size"],
+        "batch_size": profile["batch_size"],
+        "compute_type": profile["compute_type"],
+        "post_speech_silence_duration": profile["post_speech_silence_duration"],
+    }
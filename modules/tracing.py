@@ -0,0 +1,230 @@
+"""
+Lightweight per-utterance latency tracing.
+
+Spans are timed with `span("stage")` context managers and appended as JSON
+lines to output/<session_id>/trace.jsonl. Every span carries the id of the
+utterance being processed on the current thread, so a voice turn can be
+reconstructed as a waterfall afterwards (see `report`).
+
+Stages used across the assistants: stt, wake_check, prompt_build, llm,
+command_exec, scratchpad_write, tts_synthesis, playback. LLM spans record a
+`first_token` event (time-to-first-token) when the response is streamed.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from modules.utils import OUTPUT_DIR, build_file_name_session, percentile
+
+TRACE_FILE = "trace.jsonl"
+
+
+class Span:
+    def __init__(self, stage: str, attrs: Dict):
+        self.stage = stage
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.events: Dict[str, float] = {}
+
+    def mark(self, event: str):
+        """Record an event (e.g. first_token) as ms since the span started, once."""
+        if event not in self.events:
+            self.events[event] = (time.perf_counter() - self.start) * 1000
+
+
+class Tracer:
+    def __init__(self, session_id: str, path: Optional[str] = None):
+        self.session_id = session_id
+        self.path = path or build_file_name_session(TRACE_FILE, session_id)
+        self._file = open(self.path, "a", buffering=1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._utterance_count = 0
+
+    def begin_utterance(self) -> str:
+        """Start a new voice turn on this thread; following spans belong to it."""
+        with self._lock:
+            self._utterance_count += 1
+            utterance_id = f"u{self._utterance_count:04d}"
+        self._local.utterance_id = utterance_id
+        self._local.utterance_start = time.perf_counter()
+        return utterance_id
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_span(self) -> Optional[Span]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        current = Span(stage, attrs)
+        stack = self._stack()
+        stack.append(current)
+        try:
+            yield current
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            utterance_start = getattr(self._local, "utterance_start", None)
+            self._write(
+                {
+                    "session_id": self.session_id,
+                    "utterance_id": getattr(self._local, "utterance_id", None),
+                    "stage": stage,
+                    "ts": time.time(),
+                    "offset_ms": (
+                        (current.start - utterance_start) * 1000
+                        if utterance_start is not None
+                        else None
+                    ),
+                    "duration_ms": (end - current.start) * 1000,
+                    "depth": len(stack),
+                    "events": current.events,
+                    "attrs": current.attrs,
+                }
+            )
+
+    def _write(self, record: Dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class NullTracer:
+    """Used when no session is tracing, so instrumented code never has to check."""
+
+    session_id = None
+
+    def begin_utterance(self) -> Optional[str]:
+        return None
+
+    def current_span(self) -> Optional[Span]:
+        return None
+
+    @contextmanager
+    def span(self, stage: str, **attrs):
+        yield Span(stage, attrs)
+
+    def close(self):
+        pass
+
+
+_tracer = NullTracer()
+
+
+def set_tracer(tracer) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def span(stage: str, **attrs):
+    """Time a stage with the active tracer."""
+    return _tracer.span(stage, **attrs)
+
+
+def mark(event: str):
+    """Mark an event on the innermost open span of this thread, if any."""
+    current = _tracer.current_span()
+    if current is not None:
+        current.mark(event)
+
+
+def begin_utterance() -> Optional[str]:
+    return _tracer.begin_utterance()
+
+
+# -----------------------------------------------------
+# Reporting
+# -----------------------------------------------------
+def trace_path(session: str) -> str:
+    """Accept a session id, a session directory or a trace file path."""
+    if os.path.isfile(session):
+        return session
+    if os.path.isdir(session):
+        return os.path.join(session, TRACE_FILE)
+    return os.path.join(OUTPUT_DIR, session, TRACE_FILE)
+
+
+def load_trace(path: str) -> List[Dict]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def stage_stats(spans: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """Per-stage count/p50/p95 in ms; time-to-first-token is reported as llm.ttft."""
+    durations = defaultdict(list)
+    for s in spans:
+        durations[s["stage"]].append(s["duration_ms"])
+        if "first_token" in s.get("events", {}):
+            durations[f"{s['stage']}.ttft"].append(s["events"]["first_token"])
+
+    return {
+        stage: {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+        }
+        for stage, values in durations.items()
+    }
+
+
+def render_stats(stats: Dict[str, Dict[str, float]]) -> str:
+    lines = [f"{'stage':<20} {'count':>6} {'p50 ms':>10} {'p95 ms':>10}"]
+    for stage in sorted(stats):
+        row = stats[stage]
+        lines.append(f"{stage:<20} {row['count']:>6} {row['p50']:>10.1f} {row['p95']:>10.1f}")
+    return "\n".join(lines)
+
+
+def render_waterfall(spans: List[Dict], utterance_id: str, width: int = 50) -> str:
+    """Draw one utterance's spans as bars on a shared time axis."""
+    turn = [s for s in spans if s["utterance_id"] == utterance_id and s["offset_ms"] is not None]
+    if not turn:
+        return f"No spans recorded for utterance {utterance_id}"
+
+    turn.sort(key=lambda s: s["offset_ms"])
+    total = max(s["offset_ms"] + s["duration_ms"] for s in turn) or 1.0
+    scale = width / total
+
+    lines = [f"Utterance {utterance_id} ({total:.0f} ms)"]
+    for s in turn:
+        start = int(s["offset_ms"] * scale)
+        length = max(1, int(s["duration_ms"] * scale))
+        bar = " " * start + "█" * length
+        label = "  " * s.get("depth", 0) + s["stage"]
+        ttft = s.get("events", {}).get("first_token")
+        suffix = f" ttft {ttft:.0f}ms" if ttft is not None else ""
+        lines.append(
+            f"{label:<22} {s['offset_ms']:>8.0f} +{s['duration_ms']:>7.0f}ms |{bar:<{width}}|{suffix}"
+        )
+    return "\n".join(lines)
+
+
+def build_report(session: str, utterance_id: Optional[str] = None) -> str:
+    """Stage percentiles for the session plus a waterfall (latest utterance by default)."""
+    spans = load_trace(trace_path(session))
+    utterances = [s["utterance_id"] for s in spans if s["utterance_id"]]
+    if utterance_id is None and utterances:
+        utterance_id = utterances[-1]
+
+    sections = [render_stats(stage_stats(spans))]
+    if utterance_id:
+        sections.append(render_waterfall(spans, utterance_id))
+    return "\n\n".join(sections)
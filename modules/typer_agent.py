@@ -4,14 +4,13 @@ import logging
 from datetime import datetime
 from modules.assistant_config import get_config
 from modules.utils import (
-    build_file_name_session,
     create_session_logger_id,
     setup_logging,
 )
 from modules.deepseek import get_deepseek_response, get_gemini_response, get_mistral_response
 from modules.execute_python import execute_uv_python, execute
-from elevenlabs import play
-from elevenlabs.client import ElevenLabs
+from modules.echo_gate import EchoGate
+from modules.tracing import span
 import time
 
 
@@ -19,10 +18,12 @@ class TyperAgent:
     def __init__(self, logger: logging.Logger, session_id: str):
         self.logger = logger
         self.session_id = session_id
-        self.log_file = build_file_name_session("session.log", session_id)
+        from elevenlabs.client import ElevenLabs
+
         self.elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVEN_API_KEY"))
         self.previous_successful_requests = []
         self.previous_responses = []
+        self.echo_gate = EchoGate.from_config("typer_assistant")
 
     def _validate_markdown(self, file_path: str) -> bool:
         """Validate that file is markdown and has expected structure"""
@@ -112,14 +113,10 @@ class TyperAgent:
             )
 
             # Log the filled prompt template to file only (not stdout)
-            with open(self.log_file, "a") as log:
-                log.write("
-📝 Filled prompt template:
-")
-                log.write(formatted_prompt)
-                log.write("
-
-")
+            self.logger.info(
+                f"📝 Filled prompt template:\n{formatted_prompt}\n",
+                extra={"skip_stdout": True},
+            )
 
             return formatted_prompt
 
@@ -178,9 +175,10 @@ class TyperAgent:
         """Process text input and handle based on execution mode"""
         try:
             # Build fresh prompt with current state
-            formatted_prompt = self.build_prompt(
-                typer_file, scratchpad, context_files, text
-            )
+            with span("prompt_build"):
+                formatted_prompt = self.build_prompt(
+                    typer_file, scratchpad, context_files, text
+                )
 
             # Generate command using DeepSeek
             # Get model from xml file
@@ -191,7 +189,8 @@ class TyperAgent:
             )
             self.logger.info(f"Using model {model_name}")
 
-            command = self.get_response_for_typer_prompt(formatted_prompt, typer_file, model_name)
+            with span("llm", model=model_name, purpose="command"):
+                command = self.get_response_for_typer_prompt(formatted_prompt, typer_file, model_name)
 
             if command == "Command not found":
                 return "Command not found"
@@ -205,53 +204,35 @@ class TyperAgent:
 
             if mode == "default":
                 result = (
-                    f"
-## {assistant_name} Generated Command ({timestamp})
-
-"
-                    f"> Request: {text}
-
-"
-                    f"```bash
-{command_with_prefix}
-```"
+                    f"\n## {assistant_name} Generated Command ({timestamp})\n\n"
+                    f"> Request: {text}\n\n"
+                    f"```bash\n{command_with_prefix}\n```"
                 )
-                with open(scratchpad, "a") as f:
+                with span("scratchpad_write"), open(scratchpad, "a") as f:
                     f.write(result)
                 self.think_speak(f"Command generated")
                 return result
 
             elif mode == "execute":
                 self.logger.info(f"⚡ Executing command: `{command_with_prefix}`")
-                output = execute(command)
+                with span("command_exec"):
+                    output = execute(command)
 
                 result = (
-                    f"
-
-## {assistant_name} Executed Command ({timestamp})
-
-"
-                    f"> Request: {text}
-
-"
-                    f"**{assistant_name}'s Command:** 
-```bash
-{command_with_prefix}
-```
-
-"
-                    f"**Output:** 
-```
-{output}```"
+                    f"\n\n## {assistant_name} Executed Command ({timestamp})\n\n"
+                    f"> Request: {text}\n\n"
+                    f"**{assistant_name}'s Command:** \n```bash\n{command_with_prefix}\n```\n\n"
+                    f"**Output:** \n```\n{output}```"
                 )
-                with open(scratchpad, "a") as f:
+                with span("scratchpad_write"), open(scratchpad, "a") as f:
                     f.write(result)
                 self.think_speak(f"Command generated and executed")
                 return output
 
             elif mode == "execute-no-scratch":
                 self.logger.info(f"⚡ Executing command: `{command_with_prefix}`")
-                output = execute(command)
+                with span("command_exec"):
+                    output = execute(command)
                 self.think_speak(f"Command generated and executed")
                 return output
 
@@ -281,7 +262,8 @@ class TyperAgent:
         
         # Replaced prefix_prompt with get_gemini_response
         # The prompt formatting for different models should be handled within the respective get_*_response functions
-        response = get_gemini_response(prompt=response_prompt)
+        with span("llm", model="gemini", purpose="response"):
+            response = get_gemini_response(prompt=response_prompt)
 
         self.logger.info(f"🤖 Response: '{response}'")
         self.speak(response)
@@ -296,13 +278,17 @@ class TyperAgent:
         # model="eleven_multilingual_v2"
         voice = get_config("typer_assistant.elevenlabs_voice")
 
-        audio_generator = self.elevenlabs_client.generate(
-            text=text,
-            voice=voice,
-            model=model,
-            stream=False,
-        )
-        audio_bytes = b"".join(list(audio_generator))
+        with span("tts_synthesis", model=model):
+            audio_generator = self.elevenlabs_client.generate(
+                text=text,
+                voice=voice,
+                model=model,
+                stream=False,
+            )
+            audio_bytes = b"".join(list(audio_generator))
         duration = time.time() - start_time
         self.logger.info(f"Model {model} completed tts in {duration:.2f} seconds")
-        play(audio_bytes)
+        from elevenlabs import play
+
+        with span("playback"), self.echo_gate.speaking(text):
+            play(audio_bytes)
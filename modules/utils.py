@@ -47,18 +47,129 @@ def dict_item_diff_by_set(
     return list(current_set - previous_set)
 
 
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
 def create_session_logger_id() -> str:
     return (
         datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
     )
 
 
+import atexit
+import gzip
 import logging
+import queue
+import shutil
 import sys
-
-
-def setup_logging(session_id: str):
-    """Configure logging with session-specific log file and stdout"""
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_QUEUE_SIZE = 10000
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_SECONDS = 24 * 60 * 60
+LOG_BACKUP_COUNT = 5
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue that never blocks the caller.
+
+    When the listener falls behind and the queue is full, the record is
+    dropped and counted instead, so logging can't stall the STT/TTS threads.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+def gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class SessionFileHandler(RotatingFileHandler):
+    """
+    Rotates when the file exceeds max_bytes or every rotate_seconds,
+    whichever comes first. Rotated files are gzipped (session.log.1.gz ...).
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = LOG_MAX_BYTES,
+        rotate_seconds: float = LOG_ROTATE_SECONDS,
+        backup_count: int = LOG_BACKUP_COUNT,
+    ):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count)
+        self.rotate_seconds = rotate_seconds
+        self.rollover_at = time.time() + rotate_seconds
+        self.namer = lambda name: name + ".gz"
+        self.rotator = gzip_rotator
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rotate_seconds and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.rotate_seconds
+
+
+_listener = None
+_queue_handler = None
+
+
+def stop_logging():
+    """Drain the log queue, stop the listener and report any dropped records."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    if _queue_handler.dropped:
+        record = logging.makeLogRecord(
+            {
+                "name": "main",
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"{_queue_handler.dropped} log records dropped (queue full)",
+            }
+        )
+        for handler in _listener.handlers:
+            handler.handle(record)
+    for handler in _listener.handlers:
+        handler.close()
+    atexit.unregister(stop_logging)
+    _listener = _queue_handler = None
+
+
+def setup_logging(session_id: str, queue_size: int = LOG_QUEUE_SIZE):
+    """
+    Configure logging with a session-specific log file and stdout.
+
+    Log calls only put the record on a bounded queue; a listener thread does
+    the file and terminal I/O, so the voice hot path never waits on either.
+    """
+    global _listener, _queue_handler
+    stop_logging()
     log_file = build_file_name_session("session.log", session_id)
     
     # Create a new logger specific to our application
@@ -79,16 +190,12 @@ def setup_logging(session_id: str):
         }
         
         def format(self, record):
-            # Skip stdout for messages with skip_stdout flag
-            if hasattr(record, 'skip_stdout') and record.skip_stdout:
-                return ""
-                
             emoji = self.EMOJI_MAP.get(record.levelno, "📝")
             self._style._fmt = f"{emoji} %(asctime)s - %(levelname)s - %(message)s"
             return super().format(record)
     
-    # Create file handler
-    file_handler = logging.FileHandler(log_file)
+    # Create rotating, compressing file handler
+    file_handler = SessionFileHandler(log_file)
     file_handler.setFormatter(EmojiFormatter())
     
     # Create stdout handler with filter
@@ -99,9 +206,14 @@ def setup_logging(session_id: str):
     # Add filter to skip messages with skip_stdout flag
     stdout_handler.addFilter(lambda record: not getattr(record, 'skip_stdout', False))
     
-    # Add both handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(stdout_handler)
+    # Both handlers run on the listener thread
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _listener = QueueListener(
+        _queue_handler.queue, file_handler, stdout_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+    logger.addHandler(_queue_handler)
     
     return logger
 
@@ -0,0 +1,237 @@
+"""
+Cheap first-stage wake-word gate.
+
+The assistants used to transcribe every utterance with the full faster-whisper
+profile and only afterwards check whether the assistant was addressed. The gate
+decodes short windows at the start and end of the utterance with a tiny greedy
+model and only lets the full transcription run when the assistant name is heard.
+"""
+
+import difflib
+import re
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from modules.assistant_config import get_config
+from modules.tracing import begin_utterance, span
+
+SAMPLE_RATE = 16000
+
+# A detector turns a short float32 16kHz window into (partial) text.
+Detector = Callable[[np.ndarray], str]
+
+DEFAULT_GATE_CONFIG = {
+    "enabled": True,
+    "model": "tiny.en",
+    "compute_type": "int8",
+    "cpu_threads": 1,
+    "window_seconds": 2.0,
+    "threshold": 0.8,
+}
+
+
+def name_in_text(name: str, text: str, threshold: float = 0.8) -> bool:
+    """
+    Fuzzy check whether the assistant name appears in text.
+
+    Tiny models often mangle short names ("Ada" -> "Aida", "a da"), so single
+    words and adjacent word pairs are compared with a similarity ratio.
+    """
+    target = name.lower().strip()
+    words = re.findall(r"[a-z0-9']+", text.lower())
+
+    candidates = words + [a + b for a, b in zip(words, words[1:])]
+    for candidate in candidates:
+        if candidate == target:
+            return True
+        if difflib.SequenceMatcher(None, candidate, target).ratio() >= threshold:
+            return True
+    return False
+
+
+class WhisperDetector:
+    """Greedy partial decode with a small faster-whisper model, loaded on first use."""
+
+    def __init__(
+        self,
+        model: str = "tiny.en",
+        compute_type: str = "int8",
+        cpu_threads: int = 1,
+        max_new_tokens: int = 16,
+    ):
+        self.model_name = model
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.max_new_tokens = max_new_tokens
+        self._model = None
+
+    def _load(self):
+        if self._model is None:
+            from faster_whisper import WhisperModel
+
+            self._model = WhisperModel(
+                self.model_name,
+                device="cpu",
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+            )
+        return self._model
+
+    def __call__(self, audio: np.ndarray) -> str:
+        segments, _ = self._load().transcribe(
+            audio,
+            language="en",
+            beam_size=1,
+            temperature=0.0,
+            without_timestamps=True,
+            condition_on_previous_text=False,
+            max_new_tokens=self.max_new_tokens,
+        )
+        return " ".join(segment.text for segment in segments)
+
+
+class GateStats:
+    """Counters used to estimate how much transcription work the gate saved."""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.utterances = 0
+        self.fired = 0
+        self.rejected = 0
+        self.gate_seconds = 0.0
+        self.rejected_audio_seconds = 0.0
+        self.transcribe_seconds = 0.0
+        self.transcribed_audio_seconds = 0.0
+
+    def record_gate(self, fired: bool, audio_seconds: float, seconds: float):
+        self.utterances += 1
+        self.gate_seconds += seconds
+        if fired:
+            self.fired += 1
+        else:
+            self.rejected += 1
+            self.rejected_audio_seconds += audio_seconds
+
+    def record_transcription(self, audio_seconds: float, seconds: float):
+        self.transcribed_audio_seconds += audio_seconds
+        self.transcribe_seconds += seconds
+
+    def transcription_cost_per_audio_second(self) -> Optional[float]:
+        if self.transcribed_audio_seconds <= 0:
+            return None
+        return self.transcribe_seconds / self.transcribed_audio_seconds
+
+    def estimated_saved_seconds(self) -> float:
+        """Full transcription time avoided on rejected audio, minus time spent gating."""
+        cost = self.transcription_cost_per_audio_second()
+        if cost is None:
+            return 0.0
+        return self.rejected_audio_seconds * cost - self.gate_seconds
+
+    def saved_seconds_per_hour(self, now: Optional[float] = None) -> float:
+        elapsed = (now if now is not None else time.monotonic()) - self.started_at
+        if elapsed <= 0:
+            return 0.0
+        return self.estimated_saved_seconds() * 3600.0 / elapsed
+
+    def summary(self) -> str:
+        return (
+            f"Wake gate: {self.utterances} utterances, {self.fired} fired, "
+            f"{self.rejected} rejected, gate {self.gate_seconds:.2f}s, "
+            f"est. saved {self.estimated_saved_seconds():.2f}s "
+            f"({self.saved_seconds_per_hour():.1f}s/hour)"
+        )
+
+
+class WakeWordGate:
+    """Runs a cheap detector on short windows before the full transcription."""
+
+    def __init__(
+        self,
+        assistant_name: str,
+        detector: Optional[Detector] = None,
+        window_seconds: float = 2.0,
+        threshold: float = 0.8,
+        enabled: bool = True,
+        sample_rate: int = SAMPLE_RATE,
+    ):
+        self.assistant_name = assistant_name
+        self.detector = detector or WhisperDetector()
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.stats = GateStats()
+
+    @classmethod
+    def from_config(cls, section: str) -> "WakeWordGate":
+        """Build a gate from `<section>.wake_word_gate` in assistant_config.yml."""
+        gate_config = dict(DEFAULT_GATE_CONFIG)
+        try:
+            gate_config.update(get_config(f"{section}.wake_word_gate") or {})
+        except KeyError:
+            pass
+
+        detector = WhisperDetector(
+            model=gate_config["model"],
+            compute_type=gate_config["compute_type"],
+            cpu_threads=gate_config["cpu_threads"],
+        )
+        return cls(
+            get_config(f"{section}.assistant_name"),
+            detector=detector,
+            window_seconds=float(gate_config["window_seconds"]),
+            threshold=float(gate_config["threshold"]),
+            enabled=bool(gate_config["enabled"]),
+        )
+
+    def windows(self, audio: np.ndarray) -> List[np.ndarray]:
+        """Return the head window and, for longer utterances, the tail window."""
+        size = int(self.window_seconds * self.sample_rate)
+        if len(audio) <= size:
+            return [audio]
+        return [audio[:size], audio[-size:]]
+
+    def check(self, audio: np.ndarray) -> bool:
+        """Return True when the assistant name is (probably) in the audio."""
+        audio_seconds = len(audio) / self.sample_rate
+        if not self.enabled:
+            self.stats.record_gate(True, audio_seconds, 0.0)
+            return True
+
+        start = time.perf_counter()
+        fired = any(
+            name_in_text(self.assistant_name, self.detector(window), self.threshold)
+            for window in self.windows(audio)
+        )
+        self.stats.record_gate(fired, audio_seconds, time.perf_counter() - start)
+        return fired
+
+
+def gated_text(recorder, gate: WakeWordGate) -> Optional[str]:
+    """
+    Wait for the next utterance on an AudioToTextRecorder and gate it.
+
+    Returns the full transcription, or None when the gate rejected the audio
+    and no transcription was run.
+    """
+    recorder.wait_audio()
+    audio = recorder.audio
+    if audio is None or len(audio) == 0:
+        return None
+
+    begin_utterance()
+    with span("wake_check"):
+        fired = gate.check(audio)
+    if not fired:
+        return None
+
+    start = time.perf_counter()
+    with span("stt"):
+        text = recorder.transcribe()
+    gate.stats.record_transcription(
+        len(audio) / gate.sample_rate, time.perf_counter() - start
+    )
+    return text
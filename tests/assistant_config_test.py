@@ -0,0 +1,70 @@
+import pytest
+import yaml
+from modules.assistant_config import get_config, set_config
+from modules.stt_profile import DEFAULT_STT_PROFILE, save_stt_profile
+
+CONFIG = """\
+typer_assistant:
+  assistant_name: Ada
+  brain: deepseek-v3 # deepseek-v3, gemini-pro
+  stt_profile: # written by benchmark-stt
+    model: tiny.en
+    beam_size: 8
+    cpu_threads: 0 # 0 = CTranslate2 default
+  echo_gate:
+    threshold: 0.6
+base_assistant:
+  assistant_name: Ada
+  # the local model
+  brain: ollama:phi4
+"""
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    (tmp_path / "assistant_config.yml").write_text(CONFIG)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_save_stt_profile_rewrites_only_its_section(config_dir):
+    """Test saving a profile keeps comments, key order and the other sections"""
+    save_stt_profile("typer_assistant", {"model": "base.en", "beam_size": 1, "cpu_threads": 4})
+
+    text = (config_dir / "assistant_config.yml").read_text()
+    assert "  brain: deepseek-v3 # deepseek-v3, gemini-pro\n" in text
+    assert "  stt_profile: # written by benchmark-stt\n" in text
+    assert "    cpu_threads: 4 # 0 = CTranslate2 default\n" in text
+    assert text.index("stt_profile") < text.index("echo_gate") < text.index("base_assistant")
+    assert text.split("base_assistant:\n")[1] == CONFIG.split("base_assistant:\n")[1]
+
+    profile = get_config("typer_assistant.stt_profile")
+    assert profile == {**DEFAULT_STT_PROFILE, "model": "base.en", "beam_size": 1, "cpu_threads": 4}
+    assert get_config("typer_assistant.echo_gate.threshold") == 0.6
+
+
+def test_save_stt_profile_creates_missing_section(config_dir):
+    """Test a section without a profile gets one appended to it"""
+    save_stt_profile("base_assistant", {"beam_size": 5})
+
+    assert get_config("base_assistant.stt_profile") == {**DEFAULT_STT_PROFILE, "beam_size": 5}
+    assert get_config("base_assistant.brain") == "ollama:phi4"
+    assert "  # the local model\n" in (config_dir / "assistant_config.yml").read_text()
+
+
+def test_set_config_scalars_and_new_paths(config_dir):
+    """Test scalar updates keep inline comments and new nested paths are created"""
+    set_config("typer_assistant.brain", "gemini-pro")
+    set_config("new_assistant.wake_word_gate.enabled", False)
+
+    text = (config_dir / "assistant_config.yml").read_text()
+    assert "  brain: gemini-pro # deepseek-v3, gemini-pro\n" in text
+    config = yaml.safe_load(text)
+    assert config["new_assistant"] == {"wake_word_gate": {"enabled": False}}
+    assert config["typer_assistant"]["stt_profile"]["beam_size"] == 8
+
+
+def test_set_config_missing_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        set_config("typer_assistant.brain", "gemini-pro")
@@ -0,0 +1,95 @@
+import io
+import json
+
+import numpy as np
+from modules.audio import SAMPLE_RATE, write_wav
+from modules.audio_source import UtteranceSegmenter, iter_utterances, run_audio_source
+from modules.wake_word import WakeWordGate
+
+
+def speech_with_pauses(*bursts_seconds, pause_seconds=1.0):
+    """Build audio with loud bursts separated by silence"""
+    parts = [np.zeros(int(pause_seconds * SAMPLE_RATE), dtype=np.float32)]
+    for seconds in bursts_seconds:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        parts.append((0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32))
+        parts.append(np.zeros(int(pause_seconds * SAMPLE_RATE), dtype=np.float32))
+    return np.concatenate(parts)
+
+
+def test_segmenter_splits_on_silence_across_chunks():
+    """Test utterances are found regardless of how audio is chunked"""
+    audio = speech_with_pauses(0.5, 1.0)
+    segmenter = UtteranceSegmenter()
+
+    utterances = []
+    for i in range(0, len(audio), 1234):
+        utterances += segmenter.feed(audio[i : i + 1234])
+    utterances += segmenter.flush()
+
+    assert len(utterances) == 2
+    assert abs(utterances[0][0] - 1.0) < 0.05
+    assert abs(utterances[1][0] - 2.5) < 0.05
+
+
+def test_iter_utterances_from_stdin_pcm():
+    """Test raw 16-bit PCM on stdin is segmented like a WAV file"""
+    audio = speech_with_pauses(0.5, 0.5, 0.5)
+    pcm = (audio * 32767).astype("<i2").tobytes()
+
+    utterances = list(iter_utterances("-", stdin=io.BytesIO(pcm)))
+    assert [origin for origin, _, _ in utterances] == ["stdin"] * 3
+
+
+def test_run_audio_source_directory_fast(tmp_path):
+    """Test a directory of WAVs produces one timing record per utterance"""
+    write_wav(str(tmp_path / "a.wav"), speech_with_pauses(0.5))
+    write_wav(str(tmp_path / "b.wav"), speech_with_pauses(0.5, 0.5))
+    records_file = tmp_path / "utterances.jsonl"
+
+    heard = []
+    detections = iter([True, False, True])
+    gate = WakeWordGate("Ada", detector=lambda audio: "ada" if next(detections) else "")
+
+    count = run_audio_source(
+        str(tmp_path),
+        gate,
+        transcribe=lambda audio: "Ada, ping the server",
+        on_text=heard.append,
+        records_file=str(records_file),
+        realtime=False,
+    )
+
+    records = [json.loads(line) for line in records_file.read_text().splitlines()]
+    assert count == 3
+    assert heard == ["Ada, ping the server", "Ada, ping the server"]
+    assert [r["wake_word_detected"] for r in records] == [True, False, True]
+    assert records[1]["text"] is None
+    assert records[0]["source"].endswith("a.wav")
+
+
+def test_run_audio_source_paces_each_file(tmp_path, monkeypatch):
+    """Test realtime pacing restarts at every file instead of only covering the first"""
+    write_wav(str(tmp_path / "a.wav"), speech_with_pauses(0.5))
+    write_wav(str(tmp_path / "b.wav"), speech_with_pauses(0.5))
+
+    # A fake clock that only moves when run_audio_source sleeps
+    clock = [0.0]
+    monkeypatch.setattr("modules.audio_source.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr("modules.audio_source.time.sleep", lambda s: clock.__setitem__(0, clock[0] + s))
+
+    ready_at = []
+    run_audio_source(
+        str(tmp_path),
+        WakeWordGate("Ada", detector=lambda audio: ""),
+        transcribe=lambda audio: "",
+        on_text=lambda text: None,
+        records_file=str(tmp_path / "utterances.jsonl"),
+        on_record=lambda record: ready_at.append(
+            (clock[0], record.offset_seconds + record.duration_seconds)
+        ),
+    )
+
+    (first, first_end), (second, second_end) = ready_at
+    assert abs(first - first_end) < 0.01
+    assert abs(second - (first + second_end)) < 0.01
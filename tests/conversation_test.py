@@ -0,0 +1,70 @@
+import pytest
+from modules.conversation import (
+    ASSISTANT,
+    ConversationStore,
+    GeminiContentsView,
+    MessagesView,
+    Turn,
+    footprint_report,
+    format_footprint,
+    legacy_layout_bytes,
+    store_layout_bytes,
+    transcript,
+)
+
+
+@pytest.fixture
+def store():
+    store = ConversationStore(maxlen=3)
+    for i in range(5):
+        store.append(Turn(i, f"2025-01-01T00:00:0{i}", f"q{i}", f"a{i}"))
+    return store
+
+
+def test_turns_are_slotted_and_store_is_bounded(store):
+    """Test Turn has no per-instance dict and the store keeps only maxlen turns"""
+    assert not hasattr(store[0], "__dict__")
+    assert [turn.id for turn in store] == [2, 3, 4]
+    assert [turn.id for turn in store.recent(2)] == [3, 4]
+    assert store.recent(0) == []
+    assert sorted(store.by_id([4, 2, 99])) == [2, 4]
+
+
+def test_messages_view_shares_text_and_interned_roles(store):
+    """Test the OpenAI/Ollama view builds messages on access from the stored strings"""
+    view = store.messages("next question")
+    assert len(view) == 7
+    assert list(view)[:2] == [
+        {"role": "user", "content": "q2"},
+        {"role": "assistant", "content": "a2"},
+    ]
+    assert view[-1] == {"role": "user", "content": "next question"}
+    assert view[3]["content"] is store[1].assistant
+    assert view[1]["role"] is ASSISTANT
+    assert view[5:] == [view[5], view[6]]
+    with pytest.raises(IndexError):
+        view[7]
+
+
+def test_gemini_view_and_transcript(store):
+    """Test the Gemini and single-prompt shapes of the same turns"""
+    contents = list(GeminiContentsView(store.recent(1), "hi"))
+    assert contents == [
+        {"role": "user", "parts": ["q4"]},
+        {"role": "model", "parts": ["a4"]},
+        {"role": "user", "parts": ["hi"]},
+    ]
+    assert transcript(store.recent(1), "hi") == "user: q4\nassistant: a4\nuser: hi"
+    assert list(MessagesView([])) == []
+
+
+def test_store_layout_is_smaller_than_legacy_layout():
+    """Test one Turn per exchange uses well under the two dict-list layout"""
+    assert store_layout_bytes(2000) < 0.6 * legacy_layout_bytes(2000)
+
+
+def test_footprint_report_compares_slots():
+    """Test the reproducible footprint report covers each layout"""
+    result = footprint_report(2000)
+    assert result["store"] < result["store_without_slots"] < result["legacy"]
+    assert "with __slots__" in format_footprint(result)
@@ -0,0 +1,67 @@
+import pytest
+from modules.echo_gate import EchoGate, echo_similarity
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_echo_similarity_fragment():
+    """Test fragments of the spoken text score high and unrelated text low"""
+    spoken = "Sure Dan, I have listed all the users that are viewers."
+    assert echo_similarity("all the users that are viewers", spoken) == 1.0
+    assert echo_similarity("Ada, ping the server", spoken) < 0.3
+
+
+def test_echo_in_window_is_suppressed():
+    """Test matching input captured during playback or the tail is dropped"""
+    clock = FakeClock()
+    gate = EchoGate(tail_seconds=1.5, clock=clock)
+
+    with gate.speaking("Command generated and executed"):
+        clock.now += 2.0
+        assert gate.is_echo("command generated")
+
+    clock.now += 1.0
+    assert gate.is_echo("generated and executed")
+    assert gate.suppressed == 2
+
+
+def test_real_input_is_not_suppressed():
+    """Test new requests in the window and echoes after the tail pass through"""
+    clock = FakeClock()
+    gate = EchoGate(tail_seconds=1.5, clock=clock)
+
+    with gate.speaking("Command generated and executed"):
+        clock.now += 2.0
+
+    assert not gate.is_echo("Ada, list the tasks")
+    clock.now += 5.0
+    assert not gate.is_echo("command generated and executed")
+
+
+def test_capture_start_is_used():
+    """Test the recorder's capture start decides whether input is in the window"""
+    clock = FakeClock()
+    gate = EchoGate(tail_seconds=1.0, clock=clock)
+
+    with gate.speaking("Hello Dan"):
+        clock.now += 1.0
+        gate.mark_capture()
+    clock.now += 10.0  # transcription finished long after playback
+    assert gate.is_echo("hello dan")
+
+
+def test_suppress_mode_and_invalid_mode():
+    """Test suppress mode drops everything in the window"""
+    clock = FakeClock()
+    gate = EchoGate(mode="suppress", clock=clock)
+    with gate.speaking("Hello Dan"):
+        assert gate.is_echo("something else entirely")
+
+    with pytest.raises(ValueError):
+        EchoGate(mode="loud")
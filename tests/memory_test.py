@@ -0,0 +1,128 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+from modules.memory import Memory
+
+
+@pytest.fixture
+def memory_path(tmp_path):
+    return str(tmp_path / "memory.db")
+
+
+def test_memory_survives_restart(memory_path):
+    """Test turns and preferences are reloaded by a new Memory on the same store"""
+    memory = Memory(memory_path, session_id="s1")
+    for i in range(5):
+        memory.add_interaction(f"question {i}", f"answer {i}")
+    memory.set_user_preference("units", "metric")
+    memory.set_user_preference("units", "imperial")
+    memory.close()
+
+    restarted = Memory(memory_path, buffer_size=3)
+    history = restarted.get_conversation_history()
+    assert [turn.user for turn in history] == ["question 2", "question 3", "question 4"]
+    assert restarted.get_user_preference("units") == "imperial"
+    assert restarted.get_user_preference("missing") is None
+    restarted.close()
+
+
+def test_ring_buffer_is_bounded_but_store_keeps_everything(memory_path):
+    """Test only buffer_size turns stay in RAM while all of them are stored"""
+    memory = Memory(memory_path, buffer_size=10)
+    for i in range(250):
+        memory.add_interaction(f"q{i}", f"a{i}")
+
+    assert len(memory.conversation_history) == 10
+    assert memory.get_conversation_history()[-1].assistant == "a249"
+    assert len(memory.history()) == 250
+    memory.close()
+
+
+def test_writes_are_batched(memory_path):
+    """Test queued turns are committed together rather than one transaction each"""
+    memory = Memory(memory_path, batch_size=1000, flush_seconds=5.0)
+    start = time.perf_counter()
+    for i in range(500):
+        memory.add_interaction(f"q{i}", f"a{i}")
+    assert time.perf_counter() - start < 1.0
+
+    # Nothing is committed until the batch closes
+    other = sqlite3.connect(memory_path)
+    assert other.execute("SELECT COUNT(*) FROM turns").fetchone()[0] == 0
+    assert memory.flush(timeout=5)
+    assert other.execute("SELECT COUNT(*) FROM turns").fetchone()[0] == 500
+    other.close()
+    memory.close()
+
+
+def test_history_time_range_uses_index(memory_path):
+    """Test time-ranged queries return the window and are served by the index"""
+    memory = Memory(memory_path)
+    memory.add_interaction("before", "x")
+    time.sleep(0.01)
+    since = datetime.now()
+    memory.add_interaction("inside", "y")
+    time.sleep(0.01)
+    until = datetime.now()
+    memory.add_interaction("after", "z")
+
+    assert [turn.user for turn in memory.history(since, until)] == ["inside"]
+    assert [turn.user for turn in memory.history(since=since)] == ["inside", "after"]
+    assert [turn.user for turn in memory.history(limit=1)] == ["before"]
+
+    plan = memory._reader.execute(
+        "EXPLAIN QUERY PLAN SELECT user FROM turns WHERE created_at >= ? AND created_at < ?",
+        (since.isoformat(), until.isoformat()),
+    ).fetchall()
+    assert "idx_turns_created_at" in str(plan)
+    memory.close()
+
+
+def test_two_instances_share_one_store(memory_path):
+    """Test interleaved writers on one database get distinct ids and lose nothing"""
+    first = Memory(memory_path, session_id="s1")
+    second = Memory(memory_path, session_id="s2")
+    turns = []
+    for i in range(20):
+        turns.append(first.add_interaction(f"first {i}", "a"))
+        turns.append(second.add_interaction(f"second {i}", "b"))
+    first.set_user_preference("units", "metric")
+    second.set_user_preference("voice", "local")
+    first.close()
+    second.close()
+
+    assert len({turn.id for turn in turns}) == 40
+    restarted = Memory(memory_path)
+    assert len(restarted.history()) == 40
+    assert restarted.get_user_preference("units") == "metric"
+    assert restarted.get_user_preference("voice") == "local"
+    # The newest turns by time, not by id block
+    assert [turn.user for turn in restarted.get_conversation_history()[-2:]] == ["first 19", "second 19"]
+    restarted.close()
+
+
+def test_failed_turn_does_not_drop_the_rest_of_its_batch(memory_path):
+    """Test a row that can't be written is skipped and the batch's other writes land"""
+    memory = Memory(memory_path, batch_size=1000, flush_seconds=5.0)
+    memory.add_interaction("before", "x")
+    # Take the id the next turn will get, as a buggy writer might
+    other = sqlite3.connect(memory_path)
+    other.execute(
+        "INSERT INTO turns (id, created_at, user, assistant) VALUES (?, 'now', 'other', 'o')",
+        (memory._next_id,),
+    )
+    other.commit()
+    other.close()
+
+    memory.add_interaction("clash", "y")
+    memory.set_user_preference("units", "metric")
+    memory.add_interaction("after", "z")
+    assert memory.flush(timeout=5)
+
+    assert sorted(turn.user for turn in memory.history()) == ["after", "before", "other"]
+    memory.close()
+    restarted = Memory(memory_path)
+    assert restarted.get_user_preference("units") == "metric"
+    restarted.close()
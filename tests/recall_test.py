@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from modules.memory import Memory
+from modules.recall import HashingEmbedder, Recall, VectorIndex, benchmark_search
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = Memory(str(tmp_path / "memory.db"))
+    yield memory
+    memory.close()
+
+
+def add_turns(memory, recall=None):
+    turns = [
+        ("what's the weather in Paris", "Sunny and 22 degrees in Paris."),
+        ("list the firewall rules", "There are 12 rules on the WAN interface."),
+        ("play some jazz music", "Playing a jazz playlist."),
+        ("block traffic from the guest network", "Added a block rule for the guest VLAN."),
+    ]
+    for user, assistant in turns:
+        turn = memory.add_interaction(user, assistant)
+        if recall:
+            recall.add(turn)
+
+
+def test_hashing_embedder_is_stable_and_normalized():
+    """Test vectors are unit length, deterministic and closer for related text"""
+    embed = HashingEmbedder(dim=64)
+    vectors = embed(["firewall rules on wan", "firewall rules on wan", "jazz music", ""])
+    assert vectors.shape == (4, 64) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert not vectors[3].any()
+
+    query = embed(["show the wan firewall rules"])[0]
+    assert query @ vectors[0] > query @ vectors[2]
+
+
+def test_vector_index_appends_and_returns_top_k():
+    """Test incremental appends grow the matrix and search ranks by cosine"""
+    index = VectorIndex(dim=3, capacity=2)
+    index.add([10, 11], [[1, 0, 0], [0, 1, 0]])
+    index.add([12], [[1, 1, 0]])
+    assert len(index) == 3 and index.max_id == 12
+
+    hits = index.search(np.array([1.0, 0.2, 0.0]), k=2)
+    assert [i for i, _ in hits] == [10, 12]
+    assert hits[0][1] > hits[1][1]
+    assert len(index.search(np.array([0.0, 0.0, 1.0]), k=10)) == 3
+
+
+def test_recall_injects_relevant_turns(memory):
+    """Test the prompt gets the most relevant and the latest exchange, not everything"""
+    recall = Recall(memory, k=1)
+    add_turns(memory, recall)
+
+    turns = recall.context_turns("how many firewall rules are there")
+    assert [turn.user for turn in turns] == [
+        "list the firewall rules",
+        "block traffic from the guest network",
+    ]
+    assert recall.relevant("jazz", k=1)[0].user == "play some jazz music"
+    recall.close()
+
+
+def test_recall_index_is_saved_and_synced(memory, tmp_path):
+    """Test a restart loads the saved matrix and only embeds newer turns"""
+    add_turns(memory)
+    recall = Recall(memory)
+    assert len(recall.index) == 4
+    recall.close()
+
+    memory.add_interaction("what's the weather in Rome", "Cloudy in Rome.")
+    restarted = Recall(memory)
+    assert len(restarted.index) == 5
+    assert restarted.sync() == 0
+    assert restarted.relevant("weather in Rome", k=1)[0].assistant == "Cloudy in Rome."
+    restarted.close()
+
+
+def test_benchmark_search_reports_latency():
+    """Test the benchmark measures search over an index of the requested size"""
+    result = benchmark_search(2000, dim=32, k=3, queries=5)
+    assert result["turns"] == 2000
+    assert 0 < result["p50_ms"] <= result["p95_ms"]
+
+
+def test_recall_sync_finds_turns_below_max_id(tmp_path):
+    """Test turns another Memory wrote with lower ids are indexed on sync"""
+    path = str(tmp_path / "memory.db")
+    first = Memory(path)
+    second = Memory(path)
+    first.add_interaction("first", "a")
+    second.add_interaction("second", "b")
+    first.flush()
+    recall = Recall(second)
+    assert len(recall.index) == 2
+    first.add_interaction("the jazz playlist", "Playing jazz.")
+    first.flush()
+
+    assert recall.sync() == 1
+    assert recall.relevant("jazz", k=1)[0].user == "the jazz playlist"
+    recall.close()
+    first.close()
+    second.close()
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# Extra import time a cheap command may spend on top of importing typer itself
+STARTUP_BUDGET_MS = 300
+
+# Dependencies that must only be imported by the commands that use them
+HEAVY_MODULES = {
+    "RealtimeSTT",
+    "RealtimeTTS",
+    "faster_whisper",
+    "elevenlabs",
+    "pyttsx3",
+    "playwright",
+    "openai",
+    "google.generativeai",
+    "ollama",
+    "numpy",
+}
+
+
+def import_profile(args, cwd=REPO_ROOT):
+    """Run python -X importtime and return (stdout, top-level import ms, modules imported)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):  # nested imports are already in their parent
+            total_us += int(cumulative)
+    return result.stdout, total_us / 1000, modules
+
+
+@pytest.fixture(scope="module")
+def typer_baseline_ms():
+    return min(import_profile(["-c", "import typer"])[1] for _ in range(2))
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        (["main_typer_assistant.py", "ping"], "pong"),
+        (["main_typer_assistant.py", "config", "typer_assistant.assistant_name"], "Config value"),
+        (["main_base_assistant.py", "ping"], "pong"),
+    ],
+)
+def test_assistant_commands_start_within_budget(args, expected, typer_baseline_ms):
+    """Test cheap assistant commands skip the heavy imports and stay within budget"""
+    runs = [import_profile(args) for _ in range(2)]
+    stdout, _, modules = runs[0]
+    assert expected in stdout
+    assert not modules & HEAVY_MODULES
+    assert min(ms for _, ms, _ in runs) <= typer_baseline_ms + STARTUP_BUDGET_MS
+
+
+@pytest.mark.parametrize("args", [["ping-server"], ["ping-server", "--wait"]])
+def test_template_commands_start_within_budget(args, tmp_path, typer_baseline_ms):
+    """Test simple template commands import no parsers and never open the database"""
+    template = os.path.abspath(os.path.join(REPO_ROOT, "commands", "template.py"))
+    runs = [import_profile([template, *args], cwd=tmp_path) for _ in range(2)]
+    stdout, _, modules = runs[0]
+    assert "Server pinged" in stdout
+    assert not modules & (HEAVY_MODULES | {"yaml", "difflib"})
+    assert not os.listdir(tmp_path)
+    assert min(ms for _, ms, _ in runs) <= typer_baseline_ms + STARTUP_BUDGET_MS
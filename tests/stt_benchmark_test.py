@@ -0,0 +1,50 @@
+import numpy as np
+from modules.audio import load_wav, write_wav
+from modules.stt_benchmark import (
+    build_grid,
+    find_fixtures,
+    select_best_profile,
+    word_error_rate,
+)
+
+
+def test_word_error_rate():
+    """Test WER ignores case and punctuation and counts word edits"""
+    assert word_error_rate("Ada, ping the server.", "ada ping the server") == 0.0
+    assert word_error_rate("ada ping the server", "ada pink the server") == 0.25
+    assert word_error_rate("ada ping", "ada ping the server") == 1.0
+
+
+def test_build_grid():
+    """Test the grid is the full cross product of options"""
+    grid = build_grid(["tiny.en", "base.en"], [1, 5], ["int8"], [1, 2], [0])
+    assert len(grid) == 8
+    assert {"model": "tiny.en", "beam_size": 5, "compute_type": "int8", "cpu_threads": 2, "batch_size": 0} in grid
+
+
+def test_select_best_profile():
+    """Test the fastest profile within the WER tolerance wins"""
+    results = [
+        {"model": "small.en", "wer": 0.05, "mean_latency": 1.5, "rtf": 0.3, "peak_rss_mb": 900},
+        {"model": "base.en", "wer": 0.06, "mean_latency": 0.6, "rtf": 0.1, "peak_rss_mb": 400},
+        {"model": "tiny.en", "wer": 0.20, "mean_latency": 0.2, "rtf": 0.05, "peak_rss_mb": 200},
+        {"model": "broken", "error": "boom"},
+    ]
+    assert select_best_profile(results, wer_tolerance=0.02)["model"] == "base.en"
+    assert select_best_profile(results, wer_tolerance=0.5)["model"] == "tiny.en"
+    assert select_best_profile(results, max_rtf=0.01) is None
+
+
+def test_find_fixtures_and_load_wav(tmp_path):
+    """Test WAV fixtures are paired with transcripts and load as 16kHz float32"""
+    tone = np.sin(np.linspace(0, 100, 8000)).astype(np.float32) * 0.5
+    write_wav(str(tmp_path / "hello.wav"), tone, sample_rate=8000)
+    (tmp_path / "hello.txt").write_text("Hello Ada\n")
+    write_wav(str(tmp_path / "orphan.wav"), tone)
+
+    fixtures = find_fixtures(str(tmp_path))
+    assert fixtures == [(str(tmp_path / "hello.wav"), "Hello Ada")]
+
+    audio = load_wav(fixtures[0][0])
+    assert audio.dtype == np.float32
+    assert len(audio) == 16000
@@ -0,0 +1,955 @@
+import importlib.util
+import json
+import os
+import sqlite3
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "commands", "template.py")
+
+runner = CliRunner(mix_stderr=False)
+
+
+@pytest.fixture
+def template(tmp_path, monkeypatch):
+    """Load commands/template.py with its database in a temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("TEMPLATE_DB_DEBUG", raising=False)
+    spec = importlib.util.spec_from_file_location("template", TEMPLATE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    module.close_all_connections()
+
+
+def test_connection_is_tuned_and_reused_per_thread(template):
+    """Test pragmas are applied and each thread reuses one connection"""
+    conn = template.get_connection()
+    assert template.get_connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == template.DB_BUSY_TIMEOUT_MS
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(template.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_connections_are_rolled_back_and_closed_at_shutdown(template):
+    """Test a failed command's transaction is rolled back and worker connections are closed"""
+    conn = template.get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    conn.execute("DELETE FROM users")
+    assert conn.in_transaction
+
+    # The next command on this thread doesn't inherit the half-done write
+    assert template.get_connection() is conn
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == count
+
+    opened = []
+    thread = threading.Thread(target=lambda: opened.append(template.get_connection()))
+    thread.start()
+    thread.join()
+    template.close_all_connections()
+    for closed in (conn, opened[0]):
+        with pytest.raises(sqlite3.ProgrammingError):
+            closed.execute("SELECT 1")
+    assert not template._all_connections
+
+
+def test_db_debug_reports_query_timings(template):
+    """Test --db-debug prints statement timings to stderr"""
+    result = runner.invoke(template.app, ["--db-debug", "list-users", "--role", "admin"])
+    assert result.exit_code == 0
+    assert "[db] opened" in result.stderr
+    assert "ms  SELECT id, username, role, created_at FROM users" in result.stderr
+
+
+def test_schema_bootstrap_is_versioned(template):
+    """Test a current schema costs one pragma read and seeding uses SEED_ROWS"""
+    conn = template.get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == template.SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == template.SEED_ROWS
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    template.create_db_if_not_exists()
+    conn.set_trace_callback(None)
+    assert statements == ["PRAGMA user_version"]
+
+
+def test_database_is_created_on_first_use(template):
+    """Test importing the module and running non-DB commands leaves no database"""
+    template.ping_server()
+    assert not os.path.exists(template.DB_NAME)
+    template.list_users("viewer", "username", 5, None, "text")
+    assert os.path.exists(template.DB_NAME)
+
+
+def test_schema_bootstrap_upgrades_legacy_database(template, tmp_path, monkeypatch):
+    """Test an unversioned database keeps its rows and fresh ones honour seed_rows"""
+    conn = template.get_connection()
+    conn.execute("PRAGMA user_version = 0")
+    template.create_db_if_not_exists(seed_rows=5)
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == template.SEED_ROWS
+
+    monkeypatch.setattr(template, "DB_NAME", str(tmp_path / "fresh.db"))
+    template.create_db_if_not_exists(seed_rows=1000)
+    fresh = template.get_connection()
+    assert fresh.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 1000
+
+
+def test_filter_records_full_text_search(template):
+    """Test FTS matches, phrase/prefix queries, trigger sync and keyset pages"""
+    for name in ["alpha one", "alpha two", "alphabet soup", "beta"]:
+        template.create_user(username=name, role="viewer")
+
+    assert "SQL error" not in template.filter_records("users", 'alpha OR "', 10, None)
+    assert "Found 3 records" in template.filter_records("users", "alpha*", 10, None)
+    assert "Found 1 records" in template.filter_records("users", '"alpha two"', 10, None)
+
+    first = template.filter_records("users", "alpha*", 2, None)
+    assert "Found 2 records" in first
+    cursor = first.rsplit("--after ", 1)[1]
+    second = template.filter_records("users", "alpha*", 2, cursor)
+    assert "Found 1 records" in second
+    assert "Next page" not in second
+
+    conn = template.get_connection()
+    conn.execute("UPDATE users SET username = 'gamma' WHERE username = 'beta'")
+    conn.commit()
+    assert "Found 0 records" in template.filter_records("users", "beta", 10, None)
+    assert "Found 1 records" in template.filter_records("users", "gamma", 10, None)
+
+
+def test_filter_records_like_fallback(template, monkeypatch):
+    """Test substring matching is used when there is no FTS index"""
+    monkeypatch.setattr(template, "has_fts_index", lambda cur, table: False)
+    result = template.filter_records("logs", "entry number 1", 3, None)
+    assert "Found 3 records" in result
+    assert "Next page: --after" in result
+    assert "not recognized" in template.filter_records("secrets", "x", 3, None)
+
+
+def test_generate_report_formats(template, tmp_path):
+    """Test json, ndjson and gzipped csv reports contain every row"""
+    import csv
+    import gzip
+    import json
+
+    summary = template.generate_report("logs", str(tmp_path / "r.json"), "json", False, 7, False)
+    report = json.loads((tmp_path / "r.json").read_text())
+    assert summary["row_count"] == report["row_count"] == template.SEED_ROWS
+    assert len(report["data"]) == template.SEED_ROWS
+    assert report["columns"] == ["id", "message", "level", "created_at"]
+
+    template.generate_report("logs", str(tmp_path / "r.ndjson"), "ndjson", False, 7, False)
+    lines = (tmp_path / "r.ndjson").read_text().splitlines()
+    assert json.loads(lines[0])["message"] == "Log entry number 0"
+
+    summary = template.generate_report("users", str(tmp_path / "r.csv"), "csv", True, 7, False)
+    assert summary["output"].endswith(".csv.gz")
+    with gzip.open(summary["output"], "rt", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["id", "username", "role", "created_at"]
+    assert len(rows) == template.SEED_ROWS + 1
+
+
+def test_generate_report_empty_and_unknown_table(template, tmp_path):
+    """Test empty tables give valid JSON and unknown tables are rejected"""
+    import json
+
+    with template.get_connection() as conn:
+        conn.execute("DELETE FROM tasks")
+    template.generate_report("tasks", str(tmp_path / "t.json"), "json", False, 10, False)
+    assert json.loads((tmp_path / "t.json").read_text())["data"] == []
+    assert "not found" in template.generate_report("nope; DROP TABLE users", "x", "json", False, 10, False)
+
+
+def test_backup_incremental_and_restore(template, tmp_path, monkeypatch):
+    """Test incremental backups store only changed segments and restore verifies"""
+    import glob
+    import json
+
+    monkeypatch.setattr(template, "BACKUP_SEGMENT_PAGES", 1)
+    backups = str(tmp_path / "backups")
+    conn = template.get_connection()
+
+    assert "Full backup completed" in template.backup_data(backups, True)
+    conn.execute("INSERT INTO logs (message, level, created_at) VALUES ('new', 'INFO', 'now')")
+    conn.commit()
+    assert "Incremental backup completed" in template.backup_data(backups, False)
+
+    manifests = sorted(glob.glob(f"{backups}/*.manifest.json"))
+    full, incremental = [json.load(open(m)) for m in manifests]
+    # A full backup is self-contained; an incremental one reuses its segments
+    assert len({entry["pack"] for entry in full["segments"]}) == 1
+    assert 0 < incremental["segments_written"] < len(incremental["segments"])
+    assert len({entry["pack"] for entry in incremental["segments"]}) == 2
+
+    conn.execute("DELETE FROM logs")
+    conn.commit()
+    assert "Data restored" in template.restore_data(manifests[1], True)
+    assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == template.SEED_ROWS + 1
+
+
+def test_restore_rejects_corrupt_backup(template, tmp_path):
+    """Test a corrupted pack is detected and the live database is left alone"""
+    import glob
+
+    backups = str(tmp_path / "backups")
+    template.backup_data(backups, True)
+    pack = glob.glob(f"{backups}/*.pack")[0]
+    with open(pack, "r+b") as f:
+        f.seek(20)
+        f.write(b"garbage")
+
+    conn = template.get_connection()
+    conn.execute("DELETE FROM users WHERE id = 1")
+    conn.commit()
+    result = template.restore_data(glob.glob(f"{backups}/*.manifest.json")[0], True)
+    assert "failed, live data unchanged" in result
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == template.SEED_ROWS - 1
+
+
+def _write_log(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            level = "ERROR" if i % 10 == 0 else "INFO"
+            f.write(f"2025-01-11 13:{i // 60:02d}:{i % 60:02d} [{level}] event {i}\n")
+
+
+def test_summarize_logs_head_tail_and_filters(template, tmp_path):
+    """Test head/tail selection, level and time filters on a streamed log"""
+    log = str(tmp_path / "app.log")
+    _write_log(log, 300)
+
+    head = template.summarize_logs(log, 3, False, None, None, None, False, False)
+    assert head.splitlines()[1:] == [
+        f"2025-01-11 13:00:0{i} [{'ERROR' if i == 0 else 'INFO'}] event {i}" for i in range(3)
+    ]
+
+    tail = template.summarize_logs(log, 2, True, None, None, None, False, False)
+    assert [line.split()[-1] for line in tail.splitlines()[1:]] == ["298", "299"]
+
+    errors = template.summarize_logs(log, 2, True, "error", None, None, False, False)
+    assert [line.split()[-1] for line in errors.splitlines()[1:]] == ["280", "290"]
+
+    window = template.summarize_logs(
+        log, 100, False, None, "2025-01-11T13:01:00", "2025-01-11T13:01:05", False, False
+    )
+    assert [line.split()[-1] for line in window.splitlines()[1:]] == [str(60 + i) for i in range(5)]
+
+    # Offsets are converted to the local time the log timestamps are in
+    from datetime import datetime
+
+    since = datetime(2025, 1, 11, 13, 4, 58).astimezone().isoformat()
+    assert since[-6] in "+-"
+    late = template.summarize_logs(log, 100, False, None, since, None, False, False)
+    assert [line.split()[-1] for line in late.splitlines()[1:]] == ["298", "299"]
+
+
+def test_summarize_logs_stats_and_syslog(template, tmp_path):
+    """Test per-level/per-minute counts and syslog timestamps"""
+    log = str(tmp_path / "app.log")
+    _write_log(log, 120)
+    result = template.summarize_logs(log, 5, True, None, None, None, True, False)
+    assert "Matched 120 lines. Levels: ERROR=12, INFO=108" in result
+    assert "2025-01-11 13:00  ERROR=6 INFO=54" in result
+    assert result.splitlines()[5].endswith("event 119")
+
+    syslog = tmp_path / "system.log"
+    syslog.write_text(
+        "Jan  5 12:00:01 fw kernel: warning: link down\n"
+        "Jan  5 12:00:02 fw sshd[42]: error: auth failed\n"
+    )
+    assert template.parse_log_time("Jan  5 12:00:01 fw kernel").strftime("%m-%d %H:%M:%S") == "01-05 12:00:01"
+    result = template.summarize_logs(str(syslog), 10, False, "WARN", None, None, False, False)
+    assert "link down" in result and "auth failed" not in result
+
+
+def test_reverse_lines_and_follow(template, tmp_path):
+    """Test reverse mmap iteration and following appended lines"""
+    log = tmp_path / "app.log"
+    log.write_text("one\ntwo\nthree")
+    assert list(template.reverse_lines(str(log))) == ["three", "two", "one"]
+
+    emitted = []
+    position = log.stat().st_size
+    with open(log, "a") as f:
+        f.write("\n[ERROR] four\n[INFO] five\n[ERROR] partial")
+    template.follow_file(
+        str(log), position, template.LogFilter(levels=["ERROR"]), emitted.append,
+        poll_interval=0, stop=lambda: len(emitted) > 0,
+    )
+    assert emitted == ["[ERROR] four"]
+
+
+def test_compare_files_matches_unified_diff(template, tmp_path):
+    """Test the windowed diff reproduces difflib's output with file line numbers"""
+    import difflib
+
+    lines_a = [f"rule {i} pass in quick\n" for i in range(2000)]
+    lines_b = list(lines_a)
+    lines_b[10] = "rule 10 block in\n"
+    del lines_b[900:903]
+    lines_b.insert(1500, "rule new pass out\n")
+    a, b = tmp_path / "a.conf", tmp_path / "b.conf"
+    a.write_text("".join(lines_a))
+    b.write_text("".join(lines_b))
+
+    expected = "".join(difflib.unified_diff(lines_a, lines_b, fromfile=str(a), tofile=str(b)))
+    assert template.compare_files(str(a), str(b), False, False, 0) == expected
+    assert "@@ -1501,6 +1498,7 @@" in expected
+
+    truncated = template.compare_files(str(a), str(b), False, False, 5)
+    assert truncated.endswith("... diff truncated after 5 lines")
+    assert template.compare_files(str(a), str(b), True, False, 0).splitlines()[2:4] == [
+        "-rule 10 pass in quick",
+        "+rule 10 block in",
+    ]
+
+
+def test_block_lines_finds_windows_by_bisect(template):
+    """Test any line window is cut from the right blocks"""
+    lines = [f"line {i}\n" for i in range(500)]
+    data = "".join(lines).encode()
+    blocks = template.line_blocks(data)
+    starts = [block[3] for block in blocks]
+    for first, last in [(0, 1), (0, 500), (37, 38), (120, 260), (499, 500), (498, 510), (500, 510)]:
+        assert template.block_lines(data, blocks, first, last, starts) == lines[first:last]
+
+
+def test_compare_files_identical_summary_and_binary(template, tmp_path):
+    """Test the identical short-circuit, byte summary and binary detection"""
+    a, b = tmp_path / "a.bin", tmp_path / "b.bin"
+    a.write_bytes(b"x" * 5000)
+    b.write_bytes(b"x" * 5000)
+    assert template.compare_files(str(a), str(b), False, False, 0) == ""
+
+    b.write_bytes(b"x" * 4000 + b"y" + b"x" * 999)
+    summary = template.compare_files(str(a), str(b), False, True, 0)
+    assert "First difference at byte 4000" in summary
+
+    b.write_bytes(b"\0\1\2" + b"x" * 10)
+    assert template.compare_files(str(a), str(b), False, False, 0).startswith("Binary files differ.")
+
+
+def test_caesar_cipher_roundtrip(template, tmp_path):
+    """Test the translate-table Caesar cipher on text and through the commands"""
+    assert template.caesar_cipher_encrypt("Hello, xyz!") == "Khoor, abc!"
+    assert template.caesar_cipher_decrypt("Khoor, abc!") == "Hello, xyz!"
+
+    source = tmp_path / "plain.txt"
+    source.write_text("firewall rules\n" * 1000)
+    encrypted, decrypted = str(tmp_path / "enc.bin"), str(tmp_path / "dec.txt")
+    assert "MB/s" in template.encrypt_data(str(source), encrypted, "caesar", None)
+    assert open(encrypted).read().startswith("iluhzdoo uxohv")
+    template.decrypt_data(encrypted, "ignored", decrypted)
+    assert open(decrypted).read() == source.read_text()
+
+
+def test_aes_stream_roundtrip_and_tampering(template, tmp_path):
+    """Test chunked AES-GCM detects wrong keys, tampering and truncation"""
+    import io
+
+    pytest.importorskip("cryptography")
+    data = os.urandom(10_000)
+    sealed = io.BytesIO()
+    template.aes_encrypt_stream(io.BytesIO(data), sealed, "secret", chunk_size=1024)
+    blob = sealed.getvalue()
+
+    plain = io.BytesIO()
+    assert template.aes_decrypt_stream(io.BytesIO(blob), plain, "secret") == len(data)
+    assert plain.getvalue() == data
+
+    header = len(template.AES_MAGIC) + template.AES_SALT_BYTES + template.AES_NONCE_PREFIX_BYTES + 4
+    tampered = bytearray(blob)
+    tampered[header + 5] ^= 1
+    for bad_blob, key in [
+        (blob, "wrong"),
+        (bytes(tampered), "secret"),
+        (blob[: header + 2 * (1024 + template.AES_TAG_BYTES)], "secret"),
+    ]:
+        with pytest.raises(ValueError):
+            template.aes_decrypt_stream(io.BytesIO(bad_blob), io.BytesIO(), key)
+
+    source = tmp_path / "plain.bin"
+    source.write_bytes(data)
+    encrypted, decrypted = str(tmp_path / "enc.bin"), str(tmp_path / "dec.bin")
+    assert "needs --key" in template.encrypt_data(str(source), encrypted, "AES", None)
+    template.encrypt_data(str(source), encrypted, "AES", "secret")
+    assert "Decryption failed" in template.decrypt_data(encrypted, "wrong", decrypted)
+    assert not os.path.exists(decrypted) and not os.path.exists(decrypted + ".part")
+    assert "decrypted (aes)" in template.decrypt_data(encrypted, "secret", decrypted)
+    assert open(decrypted, "rb").read() == data
+
+
+def test_list_users_keyset_pages(template):
+    """Test paging through users with --after visits every row once, in order"""
+    seen = []
+    after = None
+    while True:
+        page = template.list_users(None, "role", 7, after, "text")
+        seen += [line for line in page.splitlines() if line.startswith("- ")]
+        if "Next page: --after " not in page:
+            break
+        after = page.rsplit("--after ", 1)[1].strip()
+    assert len(seen) == len(set(seen)) == template.SEED_ROWS
+    roles = [line.split("Role: ")[1].split(",")[0] for line in seen]
+    assert roles == sorted(roles)
+
+    assert "Invalid sort field" in template.list_users(None, "id; DROP TABLE users", 5, None, "text")
+    assert "Invalid cursor" in template.list_tasks(True, "priority", 5, "high:1", "text", False)
+
+
+def test_list_tasks_json_and_ndjson(template):
+    """Test the json and ndjson formats carry rows and the next cursor"""
+    import json
+
+    page = json.loads(template.list_tasks(True, "priority", 4, None, "json", False))
+    assert len(page["tasks"]) == 4
+    priorities = [t["priority"] for t in page["tasks"]]
+    assert priorities == sorted(priorities)
+    assert page["next_cursor"] == f"{priorities[-1]}:{page['tasks'][-1]['id']}"
+
+    lines = template.list_tasks(True, "priority", 4, page["next_cursor"], "ndjson", False).splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert len(rows) == 5 and "next_cursor" in rows[-1]
+    assert not {r["id"] for r in rows[:4]} & {t["id"] for t in page["tasks"]}
+
+    empty = json.loads(template.list_users("nobody", "username", 10, None, "json"))
+    assert empty == {"users": [], "next_cursor": None}
+
+
+def test_scheduler_claims_by_priority_and_records_runs(template):
+    """Test due tasks run lowest priority value first and delayed tasks wait"""
+    conn = template.get_connection()
+    conn.execute("UPDATE tasks SET status = 'complete'")
+    conn.commit()
+
+    template.queue_task("ping-server", 5, 0)
+    template.queue_task("ping-server --wait", 1, 0)
+    template.queue_task("ping-server", 1, 3600)
+    template.queue_task("no-such-command", 3, 0)
+
+    first = template.claim_task("w1")
+    assert first["task_name"] == "ping-server --wait" and first["attempts"] == 1
+    ok, detail = template.run_task_command(first["task_name"], 30)
+    assert ok and "Waited for a response" in detail
+    assert template.finish_task(first, "w1", ok, detail) == "complete"
+    conn.execute("UPDATE tasks SET status = 'pending' WHERE status = 'in-progress'")
+    conn.commit()
+
+    result = template.run_scheduler(2, 0.1, True, 30, 1)
+    assert "processed 2 tasks (1 complete, 1 failed" in result
+
+    stats = template.task_queue_stats()
+    assert stats["delayed"] == 1 and stats["due"] == 0
+    assert stats["failed"] == 1 and stats["finished_last_minute"] == 3
+
+    failed = conn.execute("SELECT id FROM tasks WHERE status = 'failed'").fetchone()[0]
+    detail = json.loads(template.inspect_task(str(failed), True))
+    assert detail["attempts"] == 1 and "No such command" in detail["error"]
+    assert [e["status"] for e in detail["events"]] == ["pending", "in-progress", "failed"]
+
+
+def test_expired_task_lease_is_reclaimed_and_removable(template):
+    """Test a crashed worker's task is claimed again after its lease and can be removed"""
+    conn = template.get_connection()
+    with conn:
+        conn.execute("UPDATE tasks SET status = 'complete'")
+    template.queue_task("ping-server", 1, 0)
+
+    crashed = template.claim_task("w1", 30)
+    assert template.claim_task("w2", 30) is None
+    assert "cannot be removed" in template.remove_task(str(crashed["id"]), True)
+
+    with conn:
+        conn.execute("UPDATE tasks SET lease_until = '2000-01-01T00:00:00' WHERE id = ?", (crashed["id"],))
+    reclaimed = template.claim_task("w2", 30)
+    assert reclaimed["id"] == crashed["id"] and reclaimed["attempts"] == 2
+
+    # The first worker comes back too late and its outcome is discarded
+    assert template.finish_task(crashed, "w1", True, "") == "lost"
+    assert template.finish_task(reclaimed, "w2", True, "") == "complete"
+
+    template.queue_task("ping-server", 1, 0)
+    stuck = template.claim_task("w3", 0)
+    assert f"Task {stuck['id']} removed." in template.remove_task(str(stuck["id"]), True)
+
+
+def test_scheduler_skips_seeded_rows_and_survives_database_errors(template, monkeypatch):
+    """Test sample tasks are never run and a busy database doesn't stop a worker"""
+    assert template.claim_task("w1") is None
+    assert "processed 0 tasks" in template.run_scheduler(1, 0, True, 30, 1)
+
+    template.queue_task("ping-server", 1, 0)
+    claim_task = template.claim_task
+    calls = []
+
+    def flaky_claim(worker, lease_seconds):
+        calls.append(worker)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim_task(worker, lease_seconds)
+
+    monkeypatch.setattr(template, "claim_task", flaky_claim)
+    result = template.run_scheduler(1, 0, True, 30, 1)
+    assert "processed 1 tasks (1 complete" in result and len(calls) == 3
+
+
+def test_claim_task_is_exclusive_across_threads(template):
+    """Test concurrent workers never claim the same task twice"""
+    conn = template.get_connection()
+    conn.execute("UPDATE tasks SET status = 'complete'")
+    conn.commit()
+    for i in range(40):
+        template.queue_task(f"ping-server {i}", i % 3, 0)
+
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(name):
+        while True:
+            task = template.claim_task(name)
+            if task is None:
+                break
+            with lock:
+                claimed.append(task["id"])
+        template.close_connection()
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == len(set(claimed)) == 40
+
+
+def test_migrate_database_with_mapping_and_dry_run(template, tmp_path):
+    """Test mapped tables/columns are copied, FTS tables skipped and indexes replayed"""
+    import sqlite3
+
+    mapping = tmp_path / "mapping.yml"
+    mapping.write_text(
+        "tables:\n"
+        "  users:\n"
+        "    target: accounts\n"
+        "    columns:\n"
+        "      username: login\n"
+        "      created_at: null\n"
+        "  logs: null\n"
+    )
+    new_db = str(tmp_path / "new.db")
+    template.get_connection()
+
+    plan = template.migrate_database(template.DB_NAME, new_db, True, str(mapping), 10)
+    assert f"users -> accounts: {template.SEED_ROWS} rows" in plan
+    assert "renames username->login" in plan and "logs" not in plan
+    assert not os.path.exists(new_db)
+
+    result = template.migrate_database(template.DB_NAME, new_db, False, str(mapping), 10)
+    assert "Database migrated" in result
+
+    dst = sqlite3.connect(new_db)
+    tables = {name for (name,) in dst.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"accounts", "tasks", "task_events"} <= tables
+    assert not {"logs", "users_fts", "users_fts_data"} & tables
+    assert [c[1] for c in dst.execute("PRAGMA table_info(accounts)")] == ["id", "login", "role"]
+    assert dst.execute("SELECT login FROM accounts WHERE id = 1").fetchone()[0] == "user_0"
+    indexes = {name for (name,) in dst.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_tasks_due" in indexes
+
+    bad = tmp_path / "bad.yml"
+    bad.write_text("tables:\n  users:\n    columns:\n      nope: x\n")
+    assert "unknown columns" in template.migrate_database(template.DB_NAME, str(tmp_path / "x.db"), False, str(bad), 10)
+
+
+def test_migrate_database_resumes_from_checkpoint(template, tmp_path):
+    """Test an interrupted copy resumes without duplicating or losing rows"""
+    import sqlite3
+
+    conn = template.get_connection()
+    template.seed_table(conn.cursor(), "logs", 500)
+    conn.commit()
+    total = conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+    new_db = str(tmp_path / "new.db")
+
+    template.migrate_database(template.DB_NAME, new_db, False, None, 100)
+    dst = sqlite3.connect(new_db)
+    # Pretend the run died after two batches of logs
+    dst.execute("DELETE FROM logs WHERE id > 200")
+    dst.execute(
+        f"UPDATE {template.MIGRATE_CHECKPOINT_TABLE} SET last_rowid = 200, rows_copied = 200, done = 0 "
+        "WHERE source_table = 'logs'"
+    )
+    dst.commit()
+
+    plan = template.migrate_database(template.DB_NAME, new_db, True, None, 100)
+    assert f"logs -> logs: {total} rows, {total - 200} to copy" in plan
+    result = template.migrate_database(template.DB_NAME, new_db, False, None, 100)
+    assert f"Database migrated from {template.DB_NAME} to {new_db}: {total - 200} rows" in result
+    assert dst.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM logs").fetchone() == (total, total)
+
+
+def test_import_users_csv_with_rejects(template, tmp_path):
+    """Test CSV import batches rows, rejects bad ones and keeps indexes/FTS in sync"""
+    source = tmp_path / "users.csv"
+    rows = ["username,role"] + [f"bulk_{i},editor" for i in range(250)] + [",admin"]
+    source.write_text("\n".join(rows) + "\n")
+    # As installed by the result cache
+    with template.get_connection() as conn:
+        template.install_version_triggers(conn.cursor())
+    version = "SELECT version FROM table_versions WHERE table_name = 'users'"
+    before = template.get_connection().execute(version).fetchone()[0]
+
+    result = template.import_users(str(source), None, 100, None, True)
+    assert "Imported 250 users" in result and "1 rows rejected" in result
+    rejected = [json.loads(line) for line in open(f"{source}.errors.ndjson")]
+    assert rejected[0]["line"] == 252 and "username" in rejected[0]["error"]
+
+    conn = template.get_connection()
+    indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'users'")}
+    assert {"idx_users_username", "idx_users_role_username", "users_fts_ai", "users_version_insert"} <= indexes
+    # The version triggers were off during the load: one bump for all 250 rows
+    assert conn.execute(version).fetchone()[0] == before + 1
+    assert "bulk_249" in template.filter_records("users", "bulk_249", 5, None)
+    template.create_user(username="after_import", role="viewer")
+    assert "after_import" in template.filter_records("users", "after_import", 5, None)
+
+
+def test_import_tasks_and_logs_ndjson(template, tmp_path):
+    """Test NDJSON import with type checks and defaults"""
+    tasks = tmp_path / "tasks.ndjson"
+    tasks.write_text(
+        '{"task_name": "ping-server", "priority": 2}\n'
+        '{"task_name": "bad", "priority": "high"}\n'
+        "not json\n"
+    )
+    result = template.import_tasks(str(tasks), None, 10, str(tmp_path / "rejects.ndjson"), True)
+    assert "Imported 1 tasks" in result and "2 rows rejected" in result
+    row = template.get_connection().execute(
+        "SELECT priority, status, run_at IS NOT NULL FROM tasks WHERE task_name = 'ping-server'"
+    ).fetchone()
+    assert row == (2, "pending", 1)
+
+    logs = tmp_path / "logs.jsonl"
+    logs.write_text("".join(json.dumps({"message": f"m{i}", "level": "WARN"}) + "\n" for i in range(30)))
+    assert "Imported 30 logs" in template.import_logs(str(logs), "ndjson", 7, None, False)
+
+
+def test_result_cache_hits_and_invalidation(template, monkeypatch):
+    """Test cached reads replay output until a tracked table changes"""
+    conn = template.get_connection()
+    triggers = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_version_%'"
+    assert conn.execute(triggers).fetchone()[0] == 0
+
+    monkeypatch.setattr(template, "CACHE_ENABLED", True)
+    first = template.list_users("viewer", "username", 50, None, "text")
+    assert conn.execute(triggers).fetchone()[0] == 3 * len(template.CACHE_TRACKED_TABLES)
+
+    # A hit is served without writing to the database
+    changes = conn.total_changes
+    assert template.list_users("viewer", "username", 50, None, "text") == first
+    assert conn.total_changes == changes
+    assert "1 hits, 1 misses" in template.cache_stats(False)
+
+    # A write from another connection advances data_version and the counters
+    other = template.open_connection(template.DB_NAME)
+    other.execute(
+        "INSERT INTO users (username, role, created_at) VALUES ('zz_new', 'viewer', 'now')"
+    )
+    other.commit()
+    other.close()
+    assert "zz_new" in template.list_users("viewer", "username", 50, None, "text")
+
+    # Writes to an unrelated table leave the entry valid
+    task_id = template.queue_task("ping-server", 1, 0).rsplit(" ", 1)[1].rstrip(".")
+    template.list_users("viewer", "username", 50, None, "text")
+    assert "2 hits, 2 misses" in template.cache_stats(False)
+
+    template.inspect_task(task_id, False)
+    template.remove_task(task_id, True)
+    assert "No task found" in template.inspect_task(task_id, False)
+
+
+def test_result_cache_tees_stdout_and_evicts(template, monkeypatch):
+    """Test a cache hit through the CLI prints the same output, and the cap holds"""
+    first = runner.invoke(template.app, ["--cache", "list-tasks", "--limit", "3"])
+    second = runner.invoke(template.app, ["--cache", "list-tasks", "--limit", "3"])
+    assert first.exit_code == second.exit_code == 0
+    assert first.stdout == second.stdout and first.stdout.startswith("Tasks:")
+    assert "1 hits, 1 misses" in template.cache_stats(False)
+
+    monkeypatch.setattr(template, "CACHE_MAX_ENTRIES", 2)
+    for limit in (1, 2, 4):
+        template.list_tasks(False, "priority", limit, None, "text", False)
+    assert "2/2 entries" in template.cache_stats(False)
+    assert "0 hits, 0 misses" in template.cache_stats(True)
+
+
+class RangeServer:
+    """Local stand-in for a file server: HEAD, Range requests and injected faults"""
+
+    def __init__(self, payload: bytes):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.payload = payload
+        self.fail_next = 0  # respond 503 to this many GETs
+        self.drop_next = 0  # cut this many GETs off half way
+        self.etag = None  # sent with HEAD and checked against If-Range
+        self.ranges = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(server.payload)))
+                self.send_header("Accept-Ranges", "bytes")
+                if server.etag:
+                    self.send_header("ETag", server.etag)
+                self.end_headers()
+
+            def do_GET(self):
+                if server.fail_next:
+                    server.fail_next -= 1
+                    self.send_error(503)
+                    return
+                header = self.headers.get("Range")
+                server.ranges.append(header)
+                if_range = self.headers.get("If-Range")
+                if if_range is not None and if_range != server.etag:
+                    header = None  # changed since: send the whole file
+                start, end = 0, len(server.payload) - 1
+                if header:
+                    first, last = header[len("bytes="):].split("-")
+                    start, end = int(first), int(last) if last else end
+                body = server.payload[start : end + 1]
+                self.send_response(206 if header else 200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if server.drop_next:
+                    server.drop_next -= 1
+                    self.wfile.write(body[: len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/data.bin"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def range_server():
+    server = RangeServer(os.urandom(300_000))
+    yield server
+    server.close()
+
+
+def test_download_file_streams_and_verifies(template, tmp_path, range_server, monkeypatch):
+    """Test a plain download, checksum verification and retry on 503"""
+    import hashlib
+
+    monkeypatch.setattr(template, "DOWNLOAD_BACKOFF_SECONDS", 0)
+    digest = hashlib.sha256(range_server.payload).hexdigest()
+    range_server.fail_next = 2
+
+    result = template.download_file(range_server.url, str(tmp_path), 3, digest, 1, 5)
+    assert "2 retries" in result and "MB/s" in result
+    assert (tmp_path / "data.bin").read_bytes() == range_server.payload
+
+    bad = template.download_file(range_server.url, str(tmp_path / "bad.bin"), 0, "0" * 64, 1, 5)
+    assert "checksum mismatch" in bad
+    assert not (tmp_path / "bad.bin").exists() and not (tmp_path / "bad.bin.part").exists()
+
+
+def test_download_file_resumes_with_range(template, tmp_path, range_server, monkeypatch):
+    """Test a dropped connection and an existing .part file resume with Range"""
+    monkeypatch.setattr(template, "DOWNLOAD_BACKOFF_SECONDS", 0)
+    target = tmp_path / "data.bin"
+    (tmp_path / "data.bin.part").write_bytes(range_server.payload[:1000])
+    range_server.drop_next = 1
+
+    result = template.download_file(range_server.url, str(target), 2, None, 1, 5)
+    assert "1 retries" in result
+    assert target.read_bytes() == range_server.payload
+    assert range_server.ranges[0] == "bytes=1000-"
+    assert range_server.ranges[1].startswith("bytes=") and range_server.ranges[1] != "bytes=1000-"
+
+
+def test_download_file_restarts_when_the_file_changed(template, tmp_path, range_server, monkeypatch):
+    """Test a resume sends If-Range and starts over if the server's file changed"""
+    monkeypatch.setattr(template, "DOWNLOAD_BACKOFF_SECONDS", 0)
+    target = tmp_path / "data.bin"
+    part = tmp_path / "data.bin.part"
+    state = tmp_path / "data.bin.part.json"
+    range_server.etag = '"v1"'
+
+    range_server.drop_next = 1
+    assert "failed" in template.download_file(range_server.url, str(target), 0, None, 1, 5)
+    assert json.loads(state.read_text()) == {"validator": '"v1"'}
+    assert part.stat().st_size == 150_000
+
+    # Changed between the HEAD and the GET: If-Range makes the server send
+    # the whole new file, which replaces the partial one
+    range_server.payload = os.urandom(200_000)
+    range_server.etag = '"v2"'
+    monkeypatch.setattr(template, "probe_download", lambda url, timeout: (300_000, True, '"v1"'))
+    template.download_file(range_server.url, str(target), 0, None, 1, 5)
+    assert range_server.ranges[-1] == "bytes=150000-"
+    assert target.read_bytes() == range_server.payload
+    assert not state.exists()
+    monkeypatch.undo()
+
+    # Changed since the partial download: the stale part isn't resumed at all
+    monkeypatch.setattr(template, "DOWNLOAD_BACKOFF_SECONDS", 0)
+    range_server.drop_next = 1
+    template.download_file(range_server.url, str(target), 0, None, 1, 5)
+    range_server.payload = os.urandom(100_000)
+    range_server.etag = '"v3"'
+    template.download_file(range_server.url, str(target), 0, None, 1, 5)
+    assert range_server.ranges[-1] is None
+    assert target.read_bytes() == range_server.payload
+
+
+def test_download_file_parallel_ranges(template, tmp_path, range_server, monkeypatch):
+    """Test large files are fetched as concurrent ranges and reassembled"""
+    monkeypatch.setattr(template, "DOWNLOAD_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(template, "DOWNLOAD_MIN_PARALLEL_BYTES", 1)
+    range_server.drop_next = 1
+
+    result = template.download_file(range_server.url, str(tmp_path), 2, None, 4, 5)
+    assert "File downloaded" in result
+    assert (tmp_path / "data.bin").read_bytes() == range_server.payload
+    assert len([r for r in range_server.ranges if r.endswith("-74999") or r.endswith("-299999")]) >= 2
+    assert not (tmp_path / "data.bin.part.json").exists()
+
+
+class UploadServer:
+    """Local stand-in for the chunked upload endpoint used by HttpTransport"""
+
+    def __init__(self):
+        import hashlib
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.sessions = {}
+        self.files = {}
+        self.fail_next_puts = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, data=None):
+                body = json.dumps(data).encode() if data is not None else b""
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def do_POST(self):
+                parts = self.path.strip("/").split("/")
+                payload = json.loads(self._body())
+                if parts == ["uploads"]:
+                    session = f"s{len(server.sessions) + 1}"
+                    server.sessions[session] = {"name": payload["name"], "parts": {}}
+                    self._reply(200, {"session": session})
+                elif len(parts) == 3 and parts[2] == "complete":
+                    stored = server.sessions[parts[1]]
+                    data = b"".join(stored["parts"][p["index"]] for p in payload["parts"])
+                    server.files[stored["name"]] = data
+                    self._reply(200, {"location": f"/files/{stored['name']}"})
+                else:
+                    self._reply(404)
+
+            def do_GET(self):
+                session = self.path.strip("/").split("/")[1]
+                if session not in server.sessions:
+                    self._reply(404)
+                    return
+                self._reply(200, {"parts": sorted(server.sessions[session]["parts"])})
+
+            def do_PUT(self):
+                _, session, _, index = self.path.strip("/").split("/")
+                data = self._body()
+                if server.fail_next_puts:
+                    server.fail_next_puts -= 1
+                    self._reply(503)
+                    return
+                if hashlib.sha256(data).hexdigest() != self.headers["X-Part-SHA256"]:
+                    self._reply(400)
+                    return
+                server.sessions[session]["parts"][int(index)] = data
+                self._reply(200)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_upload_file_http_parts_and_retries(template, tmp_path, monkeypatch):
+    """Test a chunked upload through the HTTP transport with a retried part"""
+    monkeypatch.setattr(template, "DOWNLOAD_BACKOFF_SECONDS", 0)
+    server = UploadServer()
+    try:
+        source = tmp_path / "backup.pack"
+        source.write_bytes(os.urandom(50_000))
+        server.fail_next_puts = 1
+
+        result = template.upload_file(str(source), server.url, True, 8192, 3, 2)
+        assert "7 parts, 0 already uploaded" in result and "1 retries" in result
+        assert server.files["backup.pack"] == source.read_bytes()
+        assert not os.path.exists(str(source) + template.UPLOAD_STATE_SUFFIX)
+    finally:
+        server.close()
+
+    insecure = template.upload_file(str(source), "http://example.com/up", True, 8192, 1, 0)
+    assert "needs an https://" in insecure
+
+
+def test_upload_file_resumes_interrupted_session(template, tmp_path, monkeypatch):
+    """Test an interrupted directory upload only resends the missing parts"""
+    destination = tmp_path / "offsite"
+    destination.mkdir()
+    source = tmp_path / "backup.pack"
+    source.write_bytes(os.urandom(40_000))
+
+    real_upload_part = template.DirectoryTransport.upload_part
+
+    def failing_upload_part(self, session, index, data, sha256):
+        if index >= 3:
+            raise RuntimeError("link down")
+        real_upload_part(self, session, index, data, sha256)
+
+    monkeypatch.setattr(template.DirectoryTransport, "upload_part", failing_upload_part)
+    failed = template.upload_file(str(source), str(destination), True, 4096, 1, 0)
+    assert "link down" in failed and "resume" in failed
+
+    monkeypatch.setattr(template.DirectoryTransport, "upload_part", real_upload_part)
+    result = template.upload_file(str(source), str(destination), True, 4096, 2, 0)
+    assert "10 parts, 3 already uploaded" in result
+    assert (destination / "backup.pack").read_bytes() == source.read_bytes()
+    assert not (destination / ".uploads").exists() or not os.listdir(destination / ".uploads")
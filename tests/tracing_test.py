@@ -0,0 +1,75 @@
+import time
+
+from modules.tracing import (
+    NullTracer,
+    Tracer,
+    build_report,
+    load_trace,
+    mark,
+    render_waterfall,
+    set_tracer,
+    span,
+    stage_stats,
+)
+
+
+def test_spans_are_written_per_utterance(tmp_path):
+    """Test spans carry the utterance id, offsets and first-token events"""
+    trace_file = tmp_path / "trace.jsonl"
+    tracer = Tracer("session", path=str(trace_file))
+    set_tracer(tracer)
+    try:
+        tracer.begin_utterance()
+        with span("stt"):
+            time.sleep(0.01)
+        with span("llm", model="fake"):
+            mark("first_token")
+            mark("first_token")  # only the first mark counts
+        tracer.begin_utterance()
+        with span("stt"):
+            pass
+    finally:
+        set_tracer(NullTracer())
+        tracer.close()
+
+    spans = load_trace(str(trace_file))
+    assert [(s["utterance_id"], s["stage"]) for s in spans] == [
+        ("u0001", "stt"),
+        ("u0001", "llm"),
+        ("u0002", "stt"),
+    ]
+    assert spans[0]["duration_ms"] >= 10
+    assert spans[1]["offset_ms"] >= spans[0]["duration_ms"]
+    assert "first_token" in spans[1]["events"]
+    assert spans[1]["attrs"] == {"model": "fake"}
+
+
+def test_stage_stats_percentiles():
+    """Test p50/p95 are computed per stage and ttft is reported separately"""
+    spans = [
+        {"stage": "stt", "duration_ms": float(ms), "events": {}} for ms in range(1, 101)
+    ] + [{"stage": "llm", "duration_ms": 900.0, "events": {"first_token": 250.0}}]
+
+    stats = stage_stats(spans)
+    assert stats["stt"]["count"] == 100
+    assert stats["stt"]["p50"] in (50.0, 51.0)
+    assert stats["stt"]["p95"] == 95.0
+    assert stats["llm.ttft"]["p50"] == 250.0
+
+
+def test_report_and_waterfall(tmp_path):
+    """Test the report renders stats and the latest utterance waterfall"""
+    trace_file = tmp_path / "trace.jsonl"
+    tracer = Tracer("session", path=str(trace_file))
+    tracer.begin_utterance()
+    with tracer.span("stt"):
+        pass
+    with tracer.span("playback"):
+        pass
+    tracer.close()
+
+    report = build_report(str(trace_file))
+    assert "p95 ms" in report
+    assert "Utterance u0001" in report
+    assert "playback" in report
+    assert "No spans" in render_waterfall(load_trace(str(trace_file)), "u0099")
@@ -0,0 +1,84 @@
+import gzip
+import logging
+import os
+import queue
+
+import pytest
+from modules import utils
+from modules.utils import DroppingQueueHandler, SessionFileHandler
+
+
+def make_record(message: str) -> logging.LogRecord:
+    return logging.makeLogRecord({"name": "test", "levelno": logging.INFO, "msg": message})
+
+
+@pytest.fixture
+def session_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    utils.stop_logging()
+
+
+def test_setup_logging_writes_through_listener(session_dir, capsys):
+    """Test records reach the session log and stdout via the queue listener"""
+    logger = utils.setup_logging("s1")
+    assert [type(h) for h in logger.handlers] == [DroppingQueueHandler]
+    logger.info("hello from the hot path")
+    logger.info("file only", extra={"skip_stdout": True})
+    utils.stop_logging()
+
+    log_file = session_dir / utils.OUTPUT_DIR / "s1" / "session.log"
+    assert "hello from the hot path" in log_file.read_text()
+    assert "file only" in log_file.read_text()
+    out = capsys.readouterr().out
+    assert "hello from the hot path" in out
+    assert "file only" not in out
+
+
+def test_full_queue_drops_instead_of_blocking():
+    """Test a full queue counts dropped records and never blocks the caller"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(make_record(f"m{i}"))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_file_handler_rotates_by_size_and_compresses(tmp_path):
+    """Test size rotation gzips old files and keeps backup_count of them"""
+    path = str(tmp_path / "session.log")
+    handler = SessionFileHandler(path, max_bytes=200, backup_count=2)
+    for i in range(100):
+        handler.handle(make_record(f"line {i:03d} " + "x" * 20))
+    handler.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["session.log", "session.log.1.gz", "session.log.2.gz"]
+    with gzip.open(path + ".1.gz", "rt") as f:
+        rotated = f.read()
+    assert rotated and "line" in rotated
+    assert os.path.getsize(path) <= 200
+
+
+def test_file_handler_rotates_by_time(tmp_path):
+    """Test the file rotates once rotate_seconds have passed, even when small"""
+    path = str(tmp_path / "session.log")
+    handler = SessionFileHandler(path, max_bytes=0, rotate_seconds=3600)
+    handler.handle(make_record("before"))
+    handler.rollover_at = 0
+    handler.handle(make_record("after"))
+    handler.close()
+
+    with gzip.open(path + ".1.gz", "rt") as f:
+        assert f.read().strip() == "before"
+    with open(path) as f:
+        assert f.read().strip() == "after"
+    assert handler.rollover_at > 0
+
+
+def test_percentile_nearest_rank():
+    """Test the shared percentile helper used by tracing and the benchmarks"""
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert utils.percentile(values, 50) == 3.0
+    assert utils.percentile(values, 95) == 5.0
+    assert utils.percentile(values, 0) == 1.0
+    assert utils.percentile([], 95) == 0.0
@@ -0,0 +1,82 @@
+import numpy as np
+from modules.wake_word import WakeWordGate, gated_text, name_in_text
+
+
+class FakeRecorder:
+    def __init__(self, audio, text):
+        self.audio = None
+        self._next_audio = audio
+        self._text = text
+        self.transcribe_calls = 0
+
+    def wait_audio(self):
+        self.audio = self._next_audio
+
+    def transcribe(self):
+        self.transcribe_calls += 1
+        return self._text
+
+
+def test_name_in_text_fuzzy():
+    """Test exact and mangled assistant names are matched"""
+    assert name_in_text("Ada", "Hello Ada, ping the server")
+    assert name_in_text("Ada", "hello aida ping the server")
+    assert name_in_text("Ada", "hey a da list users")
+    assert not name_in_text("Ada", "what time is it")
+
+
+def test_gate_windows_head_and_tail():
+    """Test long utterances are checked at the start and end only"""
+    gate = WakeWordGate("Ada", detector=lambda audio: "", window_seconds=1.0)
+
+    short = np.zeros(8000, dtype=np.float32)
+    long = np.zeros(16000 * 5, dtype=np.float32)
+
+    assert len(gate.windows(short)) == 1
+    windows = gate.windows(long)
+    assert [len(w) for w in windows] == [16000, 16000]
+
+
+def test_gated_text_skips_transcription_when_rejected():
+    """Test the full transcription only runs when the gate fires"""
+    audio = np.zeros(16000 * 3, dtype=np.float32)
+    gate = WakeWordGate("Ada", detector=lambda audio: "just talking")
+    recorder = FakeRecorder(audio, "just talking to someone else")
+
+    assert gated_text(recorder, gate) is None
+    assert recorder.transcribe_calls == 0
+    assert gate.stats.rejected == 1
+    assert gate.stats.rejected_audio_seconds == 3.0
+
+
+def test_gated_text_transcribes_when_fired():
+    """Test a detected name hands the full transcription through"""
+    audio = np.zeros(16000 * 2, dtype=np.float32)
+    gate = WakeWordGate("Ada", detector=lambda audio: "Ada list")
+    recorder = FakeRecorder(audio, "Ada, list users that are viewers.")
+
+    assert gated_text(recorder, gate) == "Ada, list users that are viewers."
+    assert recorder.transcribe_calls == 1
+    assert gate.stats.fired == 1
+
+
+def test_gate_stats_saved_per_hour():
+    """Test saved time is estimated from the measured transcription cost"""
+    gate = WakeWordGate("Ada", detector=lambda audio: "")
+    stats = gate.stats
+    stats.record_transcription(audio_seconds=10.0, seconds=2.0)
+    stats.record_gate(False, audio_seconds=30.0, seconds=1.0)
+
+    # 30s of rejected audio at 0.2s per audio second, minus 1s of gating
+    assert abs(stats.estimated_saved_seconds() - 5.0) < 1e-9
+    assert abs(stats.saved_seconds_per_hour(now=stats.started_at + 1800) - 10.0) < 1e-9
+
+
+def test_disabled_gate_always_fires():
+    """Test a disabled gate never calls the detector"""
+
+    def detector(audio):
+        raise AssertionError("detector should not run")
+
+    gate = WakeWordGate("Ada", detector=detector, enabled=False)
+    assert gate.check(np.zeros(1600, dtype=np.float32))